@@ -0,0 +1,99 @@
+"""比較 JSON 與 binary codec 編碼 lobby 常見封包的成本與大小
+
+每個封包各以兩種 codec 執行 Packet.to_bytes 與 Packet.decode，回報每次的
+微秒數與線上的 byte 數 (含 4-byte header)。有 schema 的封包 (登入、房間、
+START_GAME 等) 完全不帶 key；遊戲列表這類沒有 schema 的回覆使用沒有 type 與
+空白的 JSON，省下的比例較小。
+
+Usage:
+    python3 -m benchmarks.bench_codec [--rounds N]
+"""
+
+import argparse
+import time
+
+from common.codec import BINARY_CODEC, JSON_CODEC
+from common.Packet.db import DBListGamesPacket, DBListOnlineUsersPacket, DBLoginPacket
+from common.Packet.game import (
+    GetGameDetailPacket,
+    ListGamesPacket,
+    ListRoomsPacket,
+    ListRoomsPacketReply,
+)
+from common.Packet.game_extra import JoinRoomPacket, StartGamePacket
+from common.Packet.user import ListOnlineUsersPacket, LoginPacket
+from common.packet import Packet
+
+
+def game(i: int) -> dict:
+    return {
+        "game_id": str(i),
+        "game_name": f"Game {i}",
+        "game_author": f"dev{i % 7}",
+        "average_rating": round(3 + i % 20 / 10, 1),
+    }
+
+
+PACKETS = [
+    ("LOGIN", LoginPacket("player42", "hunter2")),
+    ("LOGIN reply", DBLoginPacket(True)),
+    ("LIST_ONLINE_USERS", ListOnlineUsersPacket()),
+    ("LIST_ONLINE_USERS reply", DBListOnlineUsersPacket(True, [f"player{i}" for i in range(20)])),
+    ("LIST_ROOMS", ListRoomsPacket()),
+    (
+        "LIST_ROOMS reply",
+        ListRoomsPacketReply(
+            True,
+            [{"room_id": f"room{i}", "game_id": str(i), "players": ["a", "b"], "max_players": 4} for i in range(5)],
+        ),
+    ),
+    ("LIST_GAMES", ListGamesPacket(offset=10, limit=10, sort="rating", fields=["game_name", "game_author"])),
+    (
+        "LIST_GAMES reply",
+        DBListGamesPacket(True, [game(i) for i in range(10)], total=120, next_offset=20, etag="a1b2c3d4.57"),
+    ),
+    ("GET_GAME_DETAIL", GetGameDetailPacket("17", etag="a1b2c3d4.57")),
+    ("JOIN_ROOM", JoinRoomPacket("room3", "player42")),
+    ("START_GAME", StartGamePacket("room3", "17", "140.113.17.13", 10017)),
+]
+
+
+def per_call(fn, rounds: int) -> float:
+    """fn 執行 rounds 次，回傳每次的微秒數"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def measure(packet: Packet, codec, rounds: int):
+    frame = packet.to_bytes(codec)
+    body = memoryview(frame)[4:]
+    assert Packet.decode(body).data == Packet.decode(memoryview(packet.to_bytes())[4:]).data
+    encode = per_call(lambda: packet.to_bytes(codec), rounds)
+    decode = per_call(lambda: Packet.decode(body), rounds)
+    return encode, decode, len(frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20000, help="encodes/decodes per packet and codec")
+    args = parser.parse_args()
+
+    print(f"{'packet':<24} {'codec':<7} {'encode us':>10} {'decode us':>10} {'bytes':>7}")
+    totals = {JSON_CODEC.name: [0, 0, 0], "binary": [0, 0, 0]}
+    for label, packet in PACKETS:
+        for name, codec in ((JSON_CODEC.name, JSON_CODEC), ("binary", BINARY_CODEC)):
+            encode, decode, size = measure(packet, codec, args.rounds)
+            for i, value in enumerate((encode, decode, size)):
+                totals[name][i] += value
+            print(f"{label:<24} {name:<7} {encode:>10.2f} {decode:>10.2f} {size:>7}")
+    print("total (one of each packet):")
+    for name, (encode, decode, size) in totals.items():
+        print(f"  {name:<7} encode {encode:>7.2f} us  decode {decode:>7.2f} us  {size:>6} bytes")
+    json_size, binary_size = totals[JSON_CODEC.name][2], totals["binary"][2]
+    print(f"  binary is {binary_size / json_size:.0%} of the JSON bytes")
+
+
+if __name__ == "__main__":
+    main()
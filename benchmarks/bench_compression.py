@@ -0,0 +1,127 @@
+"""比較不同 zlib level 壓縮 lobby 大型回覆的壓縮率與 CPU 時間
+
+LIST_GAMES、LIST_ROOMS、GET_GAME_DETAIL 的回覆是重複 key 很多的 JSON，壓縮率
+很高。每個回覆以 JSON 與 binary codec 編碼後，用 Compressor 在各個 level 壓縮，
+回報壓縮後 / 壓縮前的大小、每個 frame 壓縮與解壓縮的 CPU 時間。小於
+COMPRESSION_THRESHOLD 的封包 (例如登入回覆) 不會被壓縮，最後一行列出它們。
+
+Usage:
+    python3 -m benchmarks.bench_compression [--games N] [--rounds N]
+"""
+
+import argparse
+import time
+import zlib
+
+from common.codec import BINARY_CODEC, JSON_CODEC
+from common.compression import COMPRESSION_THRESHOLD, CompressionStats, Compressor
+from common.Packet.db import DBGetGameDetailPacket, DBListGamesPacket, DBLoginPacket
+from common.Packet.game import ListRoomsPacketReply
+
+LEVELS = (1, 6, 9)
+
+
+def game(i: int) -> dict:
+    return {
+        "game_id": str(i),
+        "game_name": f"Game {i}",
+        "game_description": f"A {['card', 'board', 'puzzle', 'racing'][i % 4]} game for 2 to 4 players",
+        "game_version": f"1.{i % 5}.0",
+        "game_author": f"dev{i % 7}",
+        "max_players": 2 + i % 3,
+        "download_count": i * 37 % 1000,
+        "game_created_at": f"2025-11-{1 + i % 28:02d}T12:00:00+08:00",
+        "rating_sum": i * 13 % 500,
+        "rating_count": i * 3 % 100,
+        "average_rating": round(3 + i % 20 / 10, 1),
+        "revision": i % 9,
+    }
+
+
+def game_detail(reviews: int) -> dict:
+    info = game(17)
+    info["rating_histogram"] = {"1": 1, "2": 3, "3": 8, "4": 20, "5": 11}
+    info["reviews"] = [
+        {
+            "review_id": f"17:{i}",
+            "game_id": "17",
+            "username": f"player{i}",
+            "rating": 1 + i % 5,
+            "comment": "Fun with friends, the rules are easy to learn" if i % 2 else "Too short",
+            "created_at": f"2025-11-{1 + i % 28:02d}T20:00:00+08:00",
+        }
+        for i in range(reviews)
+    ]
+    info["reviews_cursor"] = reviews
+    info["downloads_by_version"] = {"1.0.0": 120, "1.1.0": 340}
+    info["downloads_by_day"] = {f"2025-11-{d:02d}": d * 3 for d in range(1, 29)}
+    return info
+
+
+def packets(games: int):
+    return [
+        ("LIST_GAMES (page of 10)", DBListGamesPacket(True, [game(i) for i in range(10)], total=games, next_offset=10)),
+        ("LIST_GAMES (all)", DBListGamesPacket(True, [game(i) for i in range(games)], total=games)),
+        (
+            "LIST_ROOMS",
+            ListRoomsPacketReply(
+                True,
+                [
+                    {
+                        "room_id": str(i),
+                        "game_id": str(i % 30),
+                        "game_name": f"Game {i % 30}",
+                        "room_owner": f"player{i}",
+                        "players": [f"player{i}", f"player{i + 1}"],
+                        "max_players": 4,
+                        "is_started": i % 3 == 0,
+                    }
+                    for i in range(30)
+                ],
+            ),
+        ),
+        ("GET_GAME_DETAIL", DBGetGameDetailPacket(True, game_detail(20), etag="7")),
+    ]
+
+
+def per_call(fn, rounds: int) -> float:
+    """fn 執行 rounds 次，回傳每次的 CPU 微秒數"""
+    started = time.thread_time()
+    for _ in range(rounds):
+        fn()
+    return (time.thread_time() - started) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=500, help="games in the unpaged LIST_GAMES reply")
+    parser.add_argument("--rounds", type=int, default=200, help="compressions per packet, codec and level")
+    args = parser.parse_args()
+
+    print(f"{'packet':<24} {'codec':<7} {'bytes':>8} {'level':>5} {'compressed':>10} {'ratio':>6} {'compress us':>12} {'decompress us':>14}")
+    for label, packet in packets(args.games):
+        for name, codec in (("json", JSON_CODEC), ("binary", BINARY_CODEC)):
+            body = codec.encode(packet.type, packet.data)
+            for level in LEVELS:
+                stats = CompressionStats()
+                compressor = Compressor(level, stats=stats)
+                compressed, _ = compressor.compress(packet.type, body)
+                compress = per_call(lambda: compressor.compress(packet.type, body), args.rounds)
+                decompress = per_call(lambda: zlib.decompress(compressed), args.rounds)
+                ratio = stats.metrics()[packet.type]["ratio"]
+                print(
+                    f"{label:<24} {name:<7} {len(body):>8} {level:>5} {len(compressed):>10} "
+                    f"{ratio:>6.2f} {compress:>12.1f} {decompress:>14.1f}"
+                )
+
+    small = DBLoginPacket(True)
+    body = JSON_CODEC.encode(small.type, small.data)
+    _, compressed = Compressor(6).compress(small.type, body)
+    print(
+        f"{small.type} reply: {len(body)} bytes, below the {COMPRESSION_THRESHOLD} byte "
+        f"threshold, compressed: {compressed}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""對執行中的 DatabaseServer 做多連線壓力測試
+
+每個 caller 各自持有一個 DatabaseClient 連線，依 --read-ratio 混合讀取
+(GET_GAME_DETAIL) 與寫入 (GAME_REVIEW)。另外保留一條完全不送資料的
+idle 連線，用來確認它不會擋住其他 caller。
+
+Usage:
+    python3 -m benchmarks.bench_concurrency [--callers N] [--requests N] [--workers N ...]
+"""
+
+import argparse
+import logging
+import random
+import shutil
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+from common.Packet.game import GameReviewPacket, GetGameDetailPacket
+from server.database_server.client import DatabaseClient
+from server.database_server.database_server import DatabaseServer
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run(workers: int, callers: int, requests: int, games: int, read_ratio: float):
+    data_dir = tempfile.mkdtemp(prefix="bench_concurrency_")
+    port = free_port()
+    server = DatabaseServer(port, "127.0.0.1", data_dir=data_dir, workers=workers)
+    logging.getLogger("DatabaseServer").setLevel(logging.WARNING)
+    game_ids = [
+        server.add_game_metadata(f"dev{i % 10}", f"game{i}", "description", "1.0.0")
+        for i in range(games)
+    ]
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    time.sleep(0.2)
+
+    idle = socket.create_connection(("127.0.0.1", port))
+    latencies = [[] for _ in range(callers)]
+    errors = []
+    barrier = threading.Barrier(callers + 1)
+
+    def caller(index: int):
+        rng = random.Random(index)
+        client = DatabaseClient("127.0.0.1", port, pool_size=1, timeout=30)
+        client.get_game(game_ids[0])  # 先建立連線，不計入時間
+        barrier.wait()
+        try:
+            for i in range(requests):
+                game_id = rng.choice(game_ids)
+                if rng.random() < read_ratio:
+                    packet = GetGameDetailPacket(game_id)
+                else:
+                    packet = GameReviewPacket(game_id, i % 5 + 1, "comment", f"user{index}")
+                started = time.perf_counter()
+                client.request(packet)
+                latencies[index].append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    idle.close()
+    server.stop()
+    thread.join()
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+    samples = sorted(x for per_caller in latencies for x in per_caller)
+    return {
+        "throughput": len(samples) / elapsed,
+        "p50_ms": statistics.median(samples) * 1000,
+        "p99_ms": samples[int(len(samples) * 0.99) - 1] * 1000,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=128)
+    parser.add_argument("--requests", type=int, default=50, help="requests per caller")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--read-ratio", type=float, default=0.9)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    print(
+        f"callers={args.callers} requests/caller={args.requests} "
+        f"games={args.games} read_ratio={args.read_ratio}"
+    )
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for workers in args.workers:
+        r = run(workers, args.callers, args.requests, args.games, args.read_ratio)
+        print(
+            f"{workers:>8} {r['throughput']:>10.0f} {r['p50_ms']:>10.2f} "
+            f"{r['p99_ms']:>10.2f} {r['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""比較以 base64 CHUNK 封包與 DataFrame 傳送遊戲檔案的流量與速度
+
+舊的做法把每 4 KiB 的檔案內容 base64 編碼後放進 JSON，傳送端要編碼與
+json.dumps，接收端要 json.loads 與 base64 解碼，線上的資料也多了約 1/3。
+DataFrame 直接送出原始 bytes，接收端把 payload 從 reader 的 buffer 寫入檔案。
+
+兩種做法都透過 loopback TCP，由另一個 thread 送出，接收端以 PacketReader 讀取
+並把內容寫進記憶體中的檔案，同時計算 md5，和 lobby client 下載時相同。
+
+Usage:
+    python3 -m benchmarks.bench_file_transfer [--size BYTES] [--rounds N]
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import os
+import socket
+import threading
+import time
+
+from common.Packet.game_extra import DownloadGameChunkPacket
+from common.packet import DataFrame, PacketReader, DATA_CHUNK_SIZE
+
+LEGACY_CHUNK_SIZE = 4096
+
+
+def connected_pair():
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        sender = socket.create_connection(listener.getsockname())
+        receiver, _ = listener.accept()
+    return sender, receiver
+
+
+def send_legacy(sock: socket.socket, data: bytes, sent: list):
+    for offset in range(0, len(data), LEGACY_CHUNK_SIZE):
+        chunk = data[offset : offset + LEGACY_CHUNK_SIZE]
+        packet = DownloadGameChunkPacket("download_session", base64.b64encode(chunk).decode("utf-8"))
+        payload = packet.to_bytes()
+        sock.sendall(payload)
+        sent[0] += len(payload)
+
+
+def send_frames(sock: socket.socket, data: bytes, sent: list):
+    for offset in range(0, len(data), DATA_CHUNK_SIZE):
+        payload = DataFrame(1, offset, data[offset : offset + DATA_CHUNK_SIZE]).to_bytes()
+        sock.sendall(payload)
+        sent[0] += len(payload)
+
+
+def receive(reader: PacketReader, size: int) -> str:
+    out = io.BytesIO()
+    file_hash = hashlib.md5()
+    received = 0
+    while received < size:
+        packet = reader.read()
+        if packet is None:
+            raise RuntimeError("connection closed early")
+        if isinstance(packet, DataFrame):
+            chunk = packet.payload
+        else:
+            chunk = base64.b64decode(packet.data["chunk_data"])
+        out.write(chunk)
+        file_hash.update(chunk)
+        received += len(chunk)
+    return file_hash.hexdigest()
+
+
+def run(send, data: bytes):
+    """傳送一次 data，回傳 (秒數, 線上的 byte 數)"""
+    sender, receiver = connected_pair()
+    sent = [0]
+    thread = threading.Thread(target=send, args=(sender, data, sent))
+    reader = PacketReader(receiver)
+    started = time.perf_counter()
+    thread.start()
+    checksum = receive(reader, len(data))
+    elapsed = time.perf_counter() - started
+    thread.join()
+    sender.close()
+    receiver.close()
+    if checksum != hashlib.md5(data).hexdigest():
+        raise RuntimeError("checksum mismatch")
+    return elapsed, sent[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=32 * 2**20, help="bytes per file")
+    parser.add_argument("--rounds", type=int, default=3, help="transfers per method, best is reported")
+    args = parser.parse_args()
+
+    data = os.urandom(args.size)
+    print(f"{args.size / 2**20:.1f} MiB file, best of {args.rounds}")
+    results = {}
+    for name, send in (("base64 CHUNK", send_legacy), ("DataFrame", send_frames)):
+        elapsed, wire = min(run(send, data) for _ in range(args.rounds))
+        results[name] = elapsed
+        print(
+            f"  {name:<13} {args.size / elapsed / 2**20:>8.1f} MiB/s  "
+            f"{wire / 2**20:>7.1f} MiB on the wire ({wire / args.size:.3f}x file size)"
+        )
+    print(f"  speedup       {results['base64 CHUNK'] / results['DataFrame']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""比較不同 group commit 設定下，大量同時寫入的吞吐量與延遲
+
+模擬新版本釋出後的評論暴增：--writers 個 thread 同時送出 GAME_REVIEW
+（每則評論寫入評論與遊戲兩筆 record），每次都等到寫入持久化
+(store.sync) 才算完成。max_batch=1 等同每筆寫入各自 fsync 的舊行為。
+
+Usage:
+    python3 -m benchmarks.bench_group_commit [--backend json|sqlite] [--writers N] [--writes N]
+"""
+
+import argparse
+import logging
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from common.Packet.game import GameReviewPacket
+from server.database_server.database_server import DatabaseServer
+
+# (名稱, commit_delay 秒, max_batch)
+CONFIGS = [
+    ("per-record", 0.0, 1),
+    ("group", 0.0, 256),
+    ("group 1ms", 0.001, 256),
+    ("group 5ms", 0.005, 256),
+]
+
+
+def run(backend: str, writers: int, writes: int, commit_delay: float, max_batch: int):
+    data_dir = tempfile.mkdtemp(prefix="bench_group_commit_")
+    try:
+        server = DatabaseServer(
+            backend=backend,
+            data_dir=data_dir,
+            commit_delay=commit_delay,
+            max_batch=max_batch,
+        )
+        logging.getLogger("DatabaseServer").setLevel(logging.WARNING)
+        game_ids = [
+            server.add_game_metadata("dev", f"game{i}", "description", "1.0.0")
+            for i in range(10)
+        ]
+        server.store.sync()
+        before = server.store.commit_metrics()
+
+        latencies = [[] for _ in range(writers)]
+        barrier = threading.Barrier(writers + 1)
+
+        def writer(index: int):
+            barrier.wait()
+            for i in range(writes):
+                started = time.perf_counter()
+                server.handle_game_review(
+                    GameReviewPacket(
+                        game_ids[(index + i) % len(game_ids)], i % 5 + 1, "comment", f"user{index}"
+                    )
+                )
+                server.store.sync()
+                latencies[index].append(time.perf_counter() - started)
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        for t in threads:
+            t.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        after = server.store.commit_metrics()
+        server.close()
+
+        samples = sorted(x for per_writer in latencies for x in per_writer)
+        records = after["records"] - before["records"]
+        syncs = after["syncs"] - before["syncs"]
+        return {
+            "throughput": len(samples) / elapsed,
+            "p50_ms": statistics.median(samples) * 1000,
+            "p99_ms": samples[int(len(samples) * 0.99) - 1] * 1000,
+            "syncs": syncs,
+            "records_per_sync": records / syncs,
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--writers", type=int, default=64)
+    parser.add_argument("--writes", type=int, default=50, help="writes per writer")
+    args = parser.parse_args()
+
+    print(f"backend={args.backend} writers={args.writers} writes/writer={args.writes}")
+    print(
+        f"{'config':<12} {'writes/s':>10} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'syncs':>7} {'rec/sync':>9}"
+    )
+    for name, commit_delay, max_batch in CONFIGS:
+        r = run(args.backend, args.writers, args.writes, commit_delay, max_batch)
+        print(
+            f"{name:<12} {r['throughput']:>10.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+            f"{r['syncs']:>7} {r['records_per_sync']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
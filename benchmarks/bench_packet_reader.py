@@ -0,0 +1,120 @@
+"""比較舊的 recv_all 與 PacketReader 讀取封包的速度
+
+舊的做法每個封包至少呼叫兩次 recv (header 與 body)，並以 `data += chunk`
+組出 body，大封包會反覆複製整段資料。PacketReader 以 recv_into 讀進可重用
+的 buffer，一次 recv 收到的多個封包直接切出來。
+
+所有情境都透過 loopback TCP，由另一個 thread 送出封包：
+- small：大量約 100 byte 的回覆一次送出，接近 lobby 平常的流量
+- large：少量數 MB 的封包，例如沒有分頁的 LIST_GAMES，一次送出
+- trickled：同樣的大封包每次只送 --segment bytes，模擬真實網路上資料分段
+  到達；loopback 上一次送出時 recv 常常一次就收到數 MB，看不出差異
+
+Usage:
+    python3 -m benchmarks.bench_packet_reader [--small N] [--large N] [--large-size BYTES] [--segment BYTES]
+"""
+
+import argparse
+import socket
+import struct
+import threading
+import time
+
+from common.Packet.db import DBGameReviewPacket
+from common.packet import Packet, PacketReader
+
+
+class LegacyReader:
+    """修改前的 Packet.read / recv_all，另外記錄 recv 呼叫次數"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.recv_calls = 0
+
+    def recv_all(self, n: int):
+        data = b""
+        while len(data) < n:
+            self.recv_calls += 1
+            packet = self.sock.recv(n - len(data))
+            if not packet:
+                return None
+            data += packet
+        return data
+
+    def read(self):
+        header_bytes = self.recv_all(4)
+        if not header_bytes:
+            return None
+        body_bytes = self.recv_all(struct.unpack("!I", header_bytes)[0])
+        if not body_bytes:
+            return None
+        return Packet.decode(body_bytes)
+
+
+def connected_pair():
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        sender = socket.create_connection(listener.getsockname())
+        receiver, _ = listener.accept()
+    return sender, receiver
+
+
+def send(sock: socket.socket, payload: bytes, segment: int):
+    if not segment:
+        sock.sendall(payload)
+        return
+    view = memoryview(payload)
+    for offset in range(0, len(payload), segment):
+        sock.sendall(view[offset : offset + segment])
+        # 讓 reader 先把這一段讀走，下一段才分開到達
+        time.sleep(0)
+
+
+def run(make_reader, payload: bytes, count: int, segment: int):
+    """送出 payload，讀回 count 個封包，回傳 (秒數, 每個封包的 recv 次數)"""
+    sender, receiver = connected_pair()
+    thread = threading.Thread(target=send, args=(sender, payload, segment))
+    reader = make_reader(receiver)
+    started = time.perf_counter()
+    thread.start()
+    for _ in range(count):
+        if reader.read() is None:
+            raise RuntimeError("connection closed early")
+    elapsed = time.perf_counter() - started
+    thread.join()
+    sender.close()
+    receiver.close()
+    return elapsed, reader.recv_calls / count
+
+
+def compare(label: str, packet: Packet, count: int, size_label: str, segment: int = 0):
+    payload = packet.to_bytes() * count
+    print(f"{label}: {count} packets of {size_label}")
+    results = {}
+    for name, make_reader in (("recv_all", LegacyReader), ("PacketReader", PacketReader)):
+        elapsed, recvs = run(make_reader, payload, count, segment)
+        results[name] = elapsed
+        print(
+            f"  {name:<13} {count / elapsed:>10.0f} packets/s  "
+            f"{len(payload) / elapsed / 2**20:>8.1f} MiB/s  {recvs:.3f} recv/packet"
+        )
+    print(f"  speedup       {results['recv_all'] / results['PacketReader']:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--small", type=int, default=100000, help="number of small packets")
+    parser.add_argument("--large", type=int, default=10, help="number of large packets")
+    parser.add_argument("--large-size", type=int, default=4 * 2**20, help="bytes per large packet")
+    parser.add_argument("--segment", type=int, default=16384, help="bytes per send when trickled")
+    args = parser.parse_args()
+
+    small = DBGameReviewPacket(True, "Review submitted successfully")
+    compare("small", small, args.small, f"{len(small.to_bytes())} bytes")
+    large = Packet("LIST_GAMES", {"success": True, "games": "x" * args.large_size})
+    size_label = f"{args.large_size / 2**20:.1f} MiB"
+    compare("large", large, args.large, size_label)
+    compare(f"trickled ({args.segment} byte sends)", large, args.large, size_label, args.segment)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""比較 JSON 與 SQLite backend 在 login / list / review 工作量下的表現
+
+Usage:
+    python3 -m benchmarks.bench_storage [--users N] [--games N] [--ops N]
+"""
+
+import argparse
+import logging
+import shutil
+import tempfile
+import time
+
+from common.Packet.game import GameReviewPacket, ListGamesPacket
+from common.Packet.user import LoginPacket, RegisterPacket
+from server.database_server.database_server import DatabaseServer
+
+
+def open_server(backend: str, data_dir: str):
+    server = DatabaseServer(backend=backend, data_dir=data_dir)
+    logging.getLogger("DatabaseServer").setLevel(logging.WARNING)
+    return server
+
+
+def timed(ops: int, fn):
+    started = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    return ops / (time.perf_counter() - started)
+
+
+def run(backend: str, users: int, games: int, ops: int):
+    data_dir = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    try:
+        server = open_server(backend, data_dir)
+        for i in range(users):
+            server.handle_register(RegisterPacket(f"user{i}", "password"))
+        game_ids = [
+            server.add_game_metadata(f"dev{i % 10}", f"game{i}", "description", "1.0.0")
+            for i in range(games)
+        ]
+
+        # 每次寫入都等 store.sync()，量到的是持久化後的延遲
+        def login(i):
+            server.handle_login(LoginPacket(f"user{i % users}", "password"))
+            server.store.sync()
+
+        def list_games(i):
+            server.handle_list_games(ListGamesPacket())
+
+        def review(i):
+            server.handle_game_review(
+                GameReviewPacket(game_ids[i % games], i % 5 + 1, "comment", f"user{i % users}")
+            )
+            server.store.sync()
+
+        results = {
+            "login": timed(ops, login),
+            "list": timed(ops, list_games),
+            "review": timed(ops, review),
+        }
+        server.close()
+
+        started = time.perf_counter()
+        open_server(backend, data_dir).close()
+        results["reopen_ms"] = (time.perf_counter() - started) * 1000
+        return results
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--ops", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"users={args.users} games={args.games} ops={args.ops}")
+    print(f"{'backend':<8} {'login/s':>10} {'list/s':>10} {'review/s':>10} {'reopen ms':>10}")
+    for backend in ("json", "sqlite"):
+        r = run(backend, args.users, args.games, args.ops)
+        print(
+            f"{backend:<8} {r['login']:>10.0f} {r['list']:>10.0f} "
+            f"{r['review']:>10.0f} {r['reopen_ms']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""64 個 thread 同時評論與下載，檢查沒有遺失的更新與不一致的讀取
+
+每個 writer thread 輪流對少數幾個遊戲送出 GAME_REVIEW 與下載，讓
+read-modify-write 集中在同一批資料上；同時有 reader thread 不斷列出
+catalog 與讀取遊戲詳細資料，檢查讀到的評分統計彼此一致。結束後比對
+download_count / rating_count / 評論數是否等於送出的次數，並重新開啟
+資料庫確認持久化的結果也相同。有任何錯誤時 exit code 為 1。
+
+Usage:
+    python3 -m benchmarks.bench_stress [--backend json|sqlite] [--writers N] [--ops N]
+"""
+
+import argparse
+import logging
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from common.Packet.game import GameReviewPacket, GetGameDetailPacket, ListGamesPacket
+from server.database_server.database_server import DatabaseServer
+
+
+def check_game(game: dict, errors: list):
+    """評分統計要和 histogram 一致，否則代表讀到寫到一半的資料"""
+    histogram = game["rating_histogram"]
+    if sum(histogram.values()) != game["rating_count"]:
+        errors.append(f"game {game['game_id']}: histogram does not match rating_count")
+    if sum(int(star) * n for star, n in histogram.items()) != game["rating_sum"]:
+        errors.append(f"game {game['game_id']}: histogram does not match rating_sum")
+    if game["review_seq"] != game["rating_count"]:
+        errors.append(f"game {game['game_id']}: review_seq does not match rating_count")
+
+
+def open_server(backend: str, data_dir: str):
+    server = DatabaseServer(backend=backend, data_dir=data_dir)
+    logging.getLogger("DatabaseServer").setLevel(logging.WARNING)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--writers", type=int, default=64)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200, help="operations per writer")
+    parser.add_argument("--games", type=int, default=4)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="bench_stress_")
+    try:
+        server = open_server(args.backend, data_dir)
+        game_ids = [
+            server.add_game_metadata("dev", f"game{i}", "description", "1.0.0")
+            for i in range(args.games)
+        ]
+
+        expected = {
+            game_id: {"downloads": 0, "reviews": 0, "rating_sum": 0} for game_id in game_ids
+        }
+        expected_lock = threading.Lock()
+        errors = []
+        reads = [0] * args.readers
+        stop = threading.Event()
+        barrier = threading.Barrier(args.writers + args.readers + 1)
+
+        def writer(index: int):
+            done = {game_id: {"downloads": 0, "reviews": 0, "rating_sum": 0} for game_id in game_ids}
+            barrier.wait()
+            for i in range(args.ops):
+                game_id = game_ids[(index + i) % len(game_ids)]
+                if i % 2:
+                    if server.increment_download_count(game_id):
+                        done[game_id]["downloads"] += 1
+                else:
+                    score = (index + i) % 5 + 1
+                    reply = server.handle_game_review(
+                        GameReviewPacket(game_id, score, "comment", f"user{index}")
+                    )
+                    if reply.data["success"]:
+                        done[game_id]["reviews"] += 1
+                        done[game_id]["rating_sum"] += score
+            server.store.sync()
+            with expected_lock:
+                for game_id, counts in done.items():
+                    for field, n in counts.items():
+                        expected[game_id][field] += n
+
+        def reader(index: int):
+            barrier.wait()
+            try:
+                while not stop.is_set():
+                    for game in server.handle_list_games(ListGamesPacket()).data["games"]:
+                        check_game(game, errors)
+                    game_id = game_ids[reads[index] % len(game_ids)]
+                    reply = server.handle_get_game_detail(GetGameDetailPacket(game_id))
+                    game = reply.data["game_info"]
+                    check_game(game, errors)
+                    newest = game["reviews"][0]["review_id"] if game["reviews"] else None
+                    if game["review_seq"] and newest != f"{game_id}:{game['review_seq']}":
+                        errors.append(f"game {game_id}: first review page is not the newest")
+                    reads[index] += 1
+                    # 真正的 handler 在 request 之間會等待 socket 而釋放 GIL；不讓出的話
+                    # 純運算的迴圈會讓 committer 等很久才拿回 GIL
+                    time.sleep(0)
+            except Exception as e:
+                errors.append(f"reader {index}: {e!r}")
+
+        writers = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+        readers = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+        for t in writers + readers:
+            t.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for t in writers:
+            t.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for t in readers:
+            t.join()
+        server.close()
+
+        def verify(server: DatabaseServer, label: str):
+            lost = 0
+            for game_id, counts in expected.items():
+                game = server.get_game(game_id)
+                check_game(game, errors)
+                lost += counts["downloads"] - game["download_count"]
+                lost += counts["reviews"] - game["rating_count"]
+                if game["rating_sum"] != counts["rating_sum"]:
+                    errors.append(f"{label}: game {game_id} rating_sum mismatch")
+            if lost:
+                errors.append(f"{label}: {lost} updates lost")
+            return lost
+
+        server = open_server(args.backend, data_dir)
+        lost = verify(server, "after restart")
+        server.close()
+
+        writes = args.writers * args.ops
+        print(
+            f"backend={args.backend} writers={args.writers} readers={args.readers} "
+            f"games={args.games}"
+        )
+        print(f"writes:        {writes} in {elapsed:.2f}s ({writes / elapsed:.0f}/s)")
+        print(f"reader loops:  {sum(reads)} ({sum(reads) / elapsed:.0f}/s)")
+        print(f"lost updates:  {lost}")
+        print(f"inconsistent:  {len(errors)}")
+        for error in errors[:10]:
+            print(f"  {error}")
+        if errors:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
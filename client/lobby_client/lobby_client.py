@@ -1,12 +1,19 @@
 import socket
-from common.packet import Packet
+from common.codec import CODECS, JSON_CODEC, PREFERRED_CODECS
+from common.compression import COMPRESSION_LEVEL, Compressor
+from common.dispatcher import Dispatcher
+from common.packet import Packet, PacketReader, DataFrame
 from common.type import (
+    T_HELLO,
     T_LOGIN,
     T_REGISTER,
     T_LOGOUT,
     T_LIST_GAMES,
     T_GET_GAME_DETAIL,
     T_GAME_REVIEW,
+    T_LIST_GAME_REVIEWS,
+    T_SEARCH_GAMES,
+    T_LEADERBOARD,
     T_LIST_ONLINE_USERS,
     T_LIST_ROOMS,
     T_CREATE_ROOM,
@@ -16,6 +23,7 @@ from common.type import (
     T_START_GAME,
     T_JOIN_ROOM,
 )
+from common.Packet.connection import HelloPacket
 from common.Packet.user import (
     LoginPacket,
     RegisterPacket,
@@ -26,6 +34,9 @@ from common.Packet.game import (
     ListGamesPacket,
     GetGameDetailPacket,
     GameReviewPacket,
+    ListGameReviewsPacket,
+    SearchGamesPacket,
+    LeaderboardPacket,
     ListRoomsPacket,
     CreateRoomPacket,
 )
@@ -45,6 +56,17 @@ import subprocess
 import threading
 from common.Packet.game_extra import StartGamePacket
 
+# 遊戲列表每頁的筆數、需要的欄位與可以選擇的排序
+LIST_PAGE_SIZE = 10
+LIST_FIELDS = ["game_name", "game_author", "average_rating"]
+LIST_SORTS = [
+    ("game_id", "Upload order"),
+    ("name", "Name"),
+    ("downloads", "Most downloaded"),
+    ("rating", "Top rated"),
+    ("newest", "Newest"),
+]
+
 
 class UserContext:
     def __init__(self, username: str, password: str):
@@ -57,13 +79,22 @@ class LobbyClient:
         self.host = host
         self.port = port
         self.user_context = None
+        self.reader = None  # 連線後所有回覆都透過同一個 PacketReader 讀取
+        # 送出請求並依 request id 取得回覆，server 的推送交給註冊的 handler
+        self.dispatcher = None
         self.users_game = {}
+        # 最後一次收到的遊戲列表頁與遊戲詳細資料，再次查詢時帶上 ETag，沒有改變就直接使用
+        self.list_cache = {}  # {(offset, sort): (etag, reply data)}
+        self.detail_cache = {}  # {game_id: (etag, reply data)}
         self.logger = setup_logger("LobbyClient", "./logs/lobby_client.log")
 
     def start(self):
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.connect((self.host, self.port))
+            self.reader = PacketReader(s)
+            self.dispatcher = Dispatcher(s, self.reader, logger=self.logger)
             self.logger.info(f"Connected to lobby server at {self.host}:{self.port}")
+            self.handshake(s)
             print("=" * 50)
             print("WELCOME TO THE LOBBY!".center(50))
             print("=" * 50)
@@ -73,6 +104,20 @@ class LobbyClient:
                     break
                 self.handle_lobby(s)
 
+    def handshake(self, s: socket.socket):
+        """送出支援的 codec 與想要的壓縮 level，使用 server 選擇的設定；
+        沒有回覆時維持 JSON 且不壓縮"""
+        reply = self.dispatcher.request(HelloPacket(PREFERRED_CODECS, COMPRESSION_LEVEL))
+        if reply is None or reply.type != T_HELLO or not reply.data["success"]:
+            self.logger.error("Handshake failed, using JSON")
+            return
+        self.dispatcher.codec = CODECS.get(reply.data["codec"], JSON_CODEC)
+        level = reply.data.get("compression_level")
+        if level:
+            self.dispatcher.compressor = Compressor(level)
+            self.reader.accept_compressed = True
+        self.logger.info(f"Negotiated codec: {self.dispatcher.codec.name}, compression level {level}")
+
     def handle_auth(self, s: socket.socket):
         while True:
             print("1. Login")
@@ -86,8 +131,7 @@ class LobbyClient:
                 username = input("Username: ").strip()
                 password = input("Password: ").strip()
                 packet = LoginPacket(username, password)
-                s.sendall(packet.to_bytes())
-                reply = Packet.receive(s)
+                reply = self.dispatcher.request(packet)
                 if reply is None:
                     self.logger.error("Failed to receive response from server")
                     return
@@ -107,8 +151,7 @@ class LobbyClient:
                 username = input("Username: ").strip()
                 password = input("Password: ").strip()
                 packet = RegisterPacket(username, password)
-                s.sendall(packet.to_bytes())
-                reply = Packet.receive(s)
+                reply = self.dispatcher.request(packet)
                 if reply is None:
                     self.logger.error("Failed to receive response from server")
                     return
@@ -126,35 +169,83 @@ class LobbyClient:
             print("=" * 50)
             print(f"Welcome to the Lobby! {self.user_context.username}".center(50))
             print("=" * 50)
+            self.print_lobby_summary()
             print("1. List the available games")
-            print("2. List online users")
-            print("3. Play game")
-            print("4. Personal center")
-            print("5. Logout")
-            command = input("Enter command (1 ~ 5): ").strip()
+            print("2. Search games")
+            print("3. Leaderboards")
+            print("4. List online users")
+            print("5. Play game")
+            print("6. Personal center")
+            print("7. Logout")
+            command = input("Enter command (1 ~ 7): ").strip()
             if command == "1":
                 self.handle_list_games(s)
             elif command == "2":
-                self.handle_list_online_users(s)
+                self.handle_search_games(s)
             elif command == "3":
-                self.handle_play_game(s)
+                self.handle_leaderboards(s)
             elif command == "4":
-                self.handle_personal_center(s)
+                self.handle_list_online_users(s)
             elif command == "5":
+                self.handle_play_game(s)
+            elif command == "6":
+                self.handle_personal_center(s)
+            elif command == "7":
                 if self.handle_logout(s):
                     break
             else:
                 self.logger.info("Invalid command")
 
-    def handle_list_games(self, s: socket.socket):
-        packet = ListGamesPacket()
-        s.sendall(packet.to_bytes())
-        reply = Packet.receive(s)
-        if reply is None:
-            self.logger.error("Failed to receive response from server")
+    def print_lobby_summary(self):
+        """一次送出三個請求，只等一次 round trip 就取得線上人數、房間數與遊戲數"""
+        replies = self.dispatcher.pipeline(
+            [ListOnlineUsersPacket(), ListRoomsPacket(), ListGamesPacket(limit=1, fields=["game_name"])]
+        )
+        if not all(reply and reply.data.get("success") for reply in replies):
             return
+        users, rooms, games = (reply.data for reply in replies)
+        print(
+            f"Online: {len(users['online_users'])} | "
+            f"Rooms: {len(rooms['rooms'])} | "
+            f"Games: {games['total']}".center(50)
+        )
+        print("-" * 50)
+
+    def request_cached(self, s: socket.socket, cache: dict, key, make_packet):
+        """送出可以帶 ETag 的 request，server 回覆 not_modified 時改用快取的資料
+
+        make_packet 接收上次的 ETag (沒有快取時為 None) 並回傳要送出的 packet。
+        """
+        cached = cache.get(key)
+        packet = make_packet(cached[0] if cached else None)
+        reply = self.dispatcher.request(packet)
+        if reply is None or reply.type != packet.type:
+            return reply
+        if reply.data.get("not_modified") and cached is not None:
+            reply.data = cached[1]
+        elif reply.data.get("success") and "etag" in reply.data:
+            cache[key] = (reply.data["etag"], reply.data)
+        return reply
+
+    def handle_list_games(self, s: socket.socket):
+        """逐頁列出遊戲，只向 server 要列表需要的欄位"""
+        offset = 0
+        sort_index = 0
+        while True:
+            sort, sort_title = LIST_SORTS[sort_index]
+            reply = self.request_cached(
+                s,
+                self.list_cache,
+                (offset, sort),
+                lambda etag: ListGamesPacket(offset, LIST_PAGE_SIZE, sort, LIST_FIELDS, etag),
+            )
+            if reply is None:
+                self.logger.error("Failed to receive response from server")
+                return
+            if reply.type != T_LIST_GAMES or not reply.data["success"]:
+                self.logger.info(reply.data.get("message", "Failed to list games"))
+                return
 
-        if reply.type == T_LIST_GAMES:
             games = reply.data["games"]
             print("=" * 50)
             if not games:
@@ -162,6 +253,8 @@ class LobbyClient:
                 print("=" * 50)
                 return
 
+            total = reply.data["total"]
+            print(f"Games {offset + 1}-{offset + len(games)} of {total} (sorted by {sort_title})")
             print(f"{'ID':<5} {'Name':<20} {'Author':<15} {'Rating':<5}")
             print("-" * 50)
             for game in games:
@@ -172,26 +265,138 @@ class LobbyClient:
                 print("-" * 50)
             print("=" * 50)
 
-            while True:
-                print("\n[Game List Menu]")
-                print("1. View Game Details (Enter ID)")
-                print("2. Back to Main Menu")
-                choice = input("Select: ").strip()
+            next_offset = reply.data["next_offset"]
+            print("\n[Game List Menu]")
+            print("1. View Game Details (Enter ID)")
+            print("2. Back to Main Menu")
+            if next_offset is not None:
+                print("3. Next Page")
+            if offset > 0:
+                print("4. Previous Page")
+            print("5. Change Sort Order")
+            choice = input("Select: ").strip()
+
+            if choice == "1":
+                game_id = input("Enter Game ID: ").strip()
+                self.handle_game_detail(s, game_id)
+            elif choice == "2":
+                break
+            elif choice == "3" and next_offset is not None:
+                offset = next_offset
+            elif choice == "4" and offset > 0:
+                offset = max(0, offset - LIST_PAGE_SIZE)
+            elif choice == "5":
+                for i, (_, title) in enumerate(LIST_SORTS, 1):
+                    print(f"{i}. {title}")
+                picked = input("Sort by: ").strip()
+                if picked.isdigit() and 1 <= int(picked) <= len(LIST_SORTS):
+                    sort_index = int(picked) - 1
+                    offset = 0
+            else:
+                print("Invalid choice.")
 
-                if choice == "1":
-                    game_id = input("Enter Game ID: ").strip()
-                    self.handle_game_detail(s, game_id)
-                elif choice == "2":
-                    break
-                else:
-                    print("Invalid choice.")
-        else:
-            self.logger.info(reply.data["message"])
+    def handle_search_games(self, s: socket.socket):
+        """以關鍵字搜尋遊戲，逐頁顯示結果"""
+        query = input("Search (name or description): ").strip()
+        if not query:
+            return
+        offset = 0
+        while True:
+            packet = SearchGamesPacket(query, offset)
+            reply = self.dispatcher.request(packet)
+            if reply is None:
+                self.logger.error("Failed to receive response from server")
+                return
+            if reply.type != T_SEARCH_GAMES or not reply.data["success"]:
+                print(f"Search failed: {reply.data.get('message', 'Unknown error')}")
+                return
+
+            games = reply.data["games"]
+            print("=" * 50)
+            if not games:
+                print(f"No games match '{query}'.")
+                print("=" * 50)
+                return
+            print(f"Results {offset + 1}-{offset + len(games)} of {reply.data['total']}")
+            print(f"{'ID':<5} {'Name':<20} {'Author':<15} {'Rating':<5}")
+            print("-" * 50)
+            for game in games:
+                rating = game.get("average_rating", "N/A")
+                print(
+                    f"{game['game_id']:<5} {game['game_name']:<20} {game['game_author']:<15} {rating:<5}"
+                )
+            print("=" * 50)
+
+            next_offset = reply.data["next_offset"]
+            print("\n[Search Results Menu]")
+            print("1. View Game Details (Enter ID)")
+            print("2. Back to Main Menu")
+            if next_offset is not None:
+                print("3. Next Page")
+            choice = input("Select: ").strip()
+            if choice == "1":
+                game_id = input("Enter Game ID: ").strip()
+                self.handle_game_detail(s, game_id)
+            elif choice == "2":
+                return
+            elif choice == "3" and next_offset is not None:
+                offset = next_offset
+            else:
+                print("Invalid choice.")
+
+    def handle_leaderboards(self, s: socket.socket):
+        """顯示熱門下載、最高評分與最新上架的遊戲排行"""
+        boards = [
+            ("top_downloaded", "Most Downloaded"),
+            ("top_rated", "Top Rated"),
+            ("newest", "Newest"),
+        ]
+        while True:
+            print("\n[Leaderboards]")
+            for i, (_, title) in enumerate(boards, 1):
+                print(f"{i}. {title}")
+            print(f"{len(boards) + 1}. Back to Main Menu")
+            choice = input("Select: ").strip()
+            if choice == str(len(boards) + 1):
+                return
+            if not choice.isdigit() or not 1 <= int(choice) <= len(boards):
+                print("Invalid choice.")
+                continue
+
+            board, title = boards[int(choice) - 1]
+            packet = LeaderboardPacket(board)
+            reply = self.dispatcher.request(packet)
+            if reply is None:
+                self.logger.error("Failed to receive response from server")
+                return
+            if reply.type != T_LEADERBOARD or not reply.data["success"]:
+                print(f"Failed: {reply.data.get('message', 'Unknown error')}")
+                continue
+
+            games = reply.data["games"]
+            print("=" * 60)
+            print(title.center(60))
+            print("=" * 60)
+            if not games:
+                print("No games yet.")
+            else:
+                print(f"{'#':<4} {'ID':<5} {'Name':<20} {'Downloads':<10} {'Rating':<6}")
+                print("-" * 60)
+                for rank, game in enumerate(games, 1):
+                    rating = f"{game['average_rating']:.1f}" if game["rating_count"] else "-"
+                    print(
+                        f"{rank:<4} {game['game_id']:<5} {game['game_name']:<20} "
+                        f"{game['download_count']:<10} {rating:<6}"
+                    )
+            print("=" * 60)
+            game_id = input("Enter Game ID for details (or press Enter to go back): ").strip()
+            if game_id:
+                self.handle_game_detail(s, game_id)
 
     def handle_game_detail(self, s: socket.socket, game_id: str):
-        packet = GetGameDetailPacket(game_id)
-        s.sendall(packet.to_bytes())
-        reply = Packet.receive(s)
+        reply = self.request_cached(
+            s, self.detail_cache, game_id, lambda etag: GetGameDetailPacket(game_id, etag)
+        )
         if reply is None:
             self.logger.error("Failed to receive response from server")
             return
@@ -217,11 +422,11 @@ class LobbyClient:
                     print("Rating: No ratings yet")
                 
                 print("\nReviews:")
-                if game["comments"]:
-                    for i, comment in enumerate(game["comments"][:5], 1):  # Show latest 5
-                        print(f"  {i}. {comment['username']} ({comment['rating']}/5): {comment['comment']}")
-                    if len(game["comments"]) > 5:
-                        print(f"  ... and {len(game['comments']) - 5} more reviews")
+                if game["reviews"]:
+                    for i, review in enumerate(game["reviews"], 1):  # Show latest page
+                        print(f"  {i}. {review['username']} ({review['rating']}/5): {review['comment']}")
+                    if game["rating_count"] > len(game["reviews"]):
+                        print(f"  ... and {game['rating_count'] - len(game['reviews'])} more reviews")
                 else:
                     print("  No reviews yet. Be the first to review!")
                 
@@ -230,6 +435,8 @@ class LobbyClient:
                 print("2. Create Room (Play)")
                 print("3. Write a Review / Rate")
                 print("4. Back to List")
+                if game["reviews_cursor"] is not None:
+                    print("5. More Reviews")
 
                 cmd = input("Choose action: ").strip()
 
@@ -241,12 +448,36 @@ class LobbyClient:
                     self.handle_review_game(s, game_id)
                 elif cmd == "4":
                     break
+                elif cmd == "5" and game["reviews_cursor"] is not None:
+                    self.handle_more_reviews(s, game_id, game["reviews_cursor"])
                 else:
                     print("Invalid choice. Please enter 1-4.")
         else:
             print(f"Error: {reply.data.get('message', 'Game not found')}")
             input("Press Enter to continue...")
 
+    def handle_more_reviews(self, s: socket.socket, game_id: str, cursor: int):
+        """逐頁往前瀏覽較舊的評論"""
+        while cursor is not None:
+            packet = ListGameReviewsPacket(game_id, cursor)
+            reply = self.dispatcher.request(packet)
+            if reply is None:
+                self.logger.error("Failed to receive response from server")
+                return
+            if reply.type != T_LIST_GAME_REVIEWS or not reply.data["success"]:
+                print("Failed to load reviews.")
+                return
+
+            for review in reply.data["reviews"]:
+                print(f"  - {review['username']} ({review['rating']}/5): {review['comment']}")
+            cursor = reply.data["next_cursor"]
+            if cursor is None:
+                print("  (no more reviews)")
+                input("Press Enter to continue...")
+                return
+            if input("Show more? (y/n): ").strip().lower() != "y":
+                return
+
     def handle_review_game(self, s: socket.socket, game_id: str):
         print("\n--- Write a Review ---")
         score = input("Rating (1-5): ").strip()
@@ -257,9 +488,7 @@ class LobbyClient:
             return
 
         packet = GameReviewPacket(game_id, int(score), comment, self.user_context.username)
-        s.sendall(packet.to_bytes())
-
-        reply = Packet.receive(s)
+        reply = self.dispatcher.request(packet)
         if reply is None:
             self.logger.error("Failed to receive response from server")
             return
@@ -298,8 +527,7 @@ class LobbyClient:
 
     def handle_list_online_users(self, s: socket.socket):
         packet = ListOnlineUsersPacket()
-        s.sendall(packet.to_bytes())
-        reply = Packet.receive(s)
+        reply = self.dispatcher.request(packet)
         if reply is None:
             self.logger.error("Failed to receive response from server")
             return
@@ -319,8 +547,7 @@ class LobbyClient:
 
     def handle_logout(self, s: socket.socket):
         packet = LogoutPacket(self.user_context.username)
-        s.sendall(packet.to_bytes())
-        reply = Packet.receive(s)
+        reply = self.dispatcher.request(packet)
         if reply is None:
             self.logger.error("Failed to receive response from server")
             return False
@@ -397,8 +624,7 @@ class LobbyClient:
             # 檢查版本是否為最新
             from common.Packet.game import GetGameDetailPacket
             detail_packet = GetGameDetailPacket(game_id)
-            s.sendall(detail_packet.to_bytes())
-            detail_reply = Packet.receive(s)
+            detail_reply = self.dispatcher.request(detail_packet)
             
             if detail_reply and detail_reply.data.get("success"):
                 server_version = detail_reply.data.get("game_info", {}).get("game_version")
@@ -469,8 +695,7 @@ class LobbyClient:
             # 檢查版本是否為最新（當從選單輸入 game_id 時）
             from common.Packet.game import GetGameDetailPacket
             detail_packet = GetGameDetailPacket(game_id)
-            s.sendall(detail_packet.to_bytes())
-            detail_reply = Packet.receive(s)
+            detail_reply = self.dispatcher.request(detail_packet)
             
             if detail_reply and detail_reply.data.get("success"):
                 server_version = detail_reply.data.get("game_info", {}).get("game_version")
@@ -494,8 +719,7 @@ class LobbyClient:
                         return
         
         packet = CreateRoomPacket(game_id, self.user_context.username)
-        s.sendall(packet.to_bytes())
-        reply = Packet.receive(s)
+        reply = self.dispatcher.request(packet)
         if reply is None:
             self.logger.error("Failed to receive response from server")
             print("ERROR: No response from server")
@@ -512,8 +736,7 @@ class LobbyClient:
 
     def handle_list_rooms(self, s: socket.socket):
         packet = ListRoomsPacket()
-        s.sendall(packet.to_bytes())
-        reply = Packet.receive(s)
+        reply = self.dispatcher.request(packet)
         if reply is None:
             self.logger.error("Failed to receive response from server")
             return
@@ -591,8 +814,7 @@ class LobbyClient:
                 # 獲取伺服器上的最新版本資訊
                 from common.Packet.game import GetGameDetailPacket
                 detail_packet = GetGameDetailPacket(game_id)
-                s.sendall(detail_packet.to_bytes())
-                detail_reply = Packet.receive(s)
+                detail_reply = self.dispatcher.request(detail_packet)
                 
                 if detail_reply and detail_reply.data.get("success"):
                     server_version = detail_reply.data.get("game_info", {}).get("game_version")
@@ -615,9 +837,7 @@ class LobbyClient:
                             return
         
         packet = JoinRoomPacket(room_id, self.user_context.username)
-        s.sendall(packet.to_bytes())
-
-        reply = Packet.receive(s)
+        reply = self.dispatcher.request(packet)
         if not reply:
             self.logger.error("Failed to receive response")
             return
@@ -642,10 +862,9 @@ class LobbyClient:
 
         # 1. Send Init
         packet = DownloadGameInitPacket(game_id, self.user_context.username)
-        s.sendall(packet.to_bytes())
 
         # 2. Receive Init Reply
-        reply = Packet.receive(s)
+        reply = self.dispatcher.request(packet)
         if not reply or reply.type != T_DOWNLOAD_GAME_INIT:
             self.logger.error("Failed to receive download init response")
             return
@@ -659,6 +878,7 @@ class LobbyClient:
         file_size = reply.data["file_size"]
         game_version = reply.data["game_version"]
         upload_id = reply.data["upload_id"]
+        stream_id = reply.data.get("stream_id")
 
         print(
             f"Downloading Game {game_id} (v{game_version})... Size: {file_size} bytes"
@@ -676,16 +896,29 @@ class LobbyClient:
         temp_zip_path = os.path.join(download_dir, "download.zip")
 
         received_bytes = 0
+        file_hash = hashlib.md5()  # 邊收邊算 checksum，不必再讀一次檔案
         with open(temp_zip_path, "wb") as f:
             while received_bytes < file_size:
-                packet = Packet.receive(s)
+                packet = self.dispatcher.receive()
                 if not packet:
                     self.logger.error("Connection lost during download")
                     return
 
-                if packet.type == T_DOWNLOAD_GAME_CHUNK:
+                if isinstance(packet, DataFrame):
+                    # payload 指向 reader 的 buffer，下一次 receive 前寫入檔案
+                    if packet.stream_id != stream_id or packet.offset != received_bytes:
+                        self.logger.error(
+                            f"Unexpected data frame: stream {packet.stream_id} offset {packet.offset}"
+                        )
+                        return
+                    f.write(packet.payload)
+                    file_hash.update(packet.payload)
+                    received_bytes += len(packet.payload)
+                    self._print_progress_bar(received_bytes, file_size)
+                elif packet.type == T_DOWNLOAD_GAME_CHUNK:
                     chunk_data = base64.b64decode(packet.data["chunk_data"])
                     f.write(chunk_data)
+                    file_hash.update(chunk_data)
                     received_bytes += len(chunk_data)
                     self._print_progress_bar(received_bytes, file_size)
                 elif packet.type == T_DOWNLOAD_GAME_FINISH:
@@ -697,7 +930,7 @@ class LobbyClient:
 
         # Receive Finish Packet (if not already received in loop? Wait, loop condition is size)
         # If we received exactly file_size, the next packet should be FINISH.
-        packet = Packet.receive(s)
+        packet = self.dispatcher.receive()
         if not packet or packet.type != T_DOWNLOAD_GAME_FINISH:
             self.logger.error("Missing finish packet")
             return
@@ -705,10 +938,7 @@ class LobbyClient:
         server_checksum = packet.data["checksum"]
 
         # Verify Checksum
-        with open(temp_zip_path, "rb") as f:
-            local_checksum = hashlib.md5(f.read()).hexdigest()
-
-        if server_checksum != local_checksum:
+        if server_checksum != file_hash.hexdigest():
             self.logger.error("Checksum mismatch!")
             return
 
@@ -738,60 +968,62 @@ class LobbyClient:
         else:
             print("Press 'q' to leave.")
 
-        while True:
-            # Check for input or socket data
-            inputs = [s, sys.stdin]
-            readable, _, _ = select.select(inputs, [], [])
-
-            for r in readable:
-                if r is s:
-                    # Receive packet
-                    packet = Packet.receive(s)
-                    if not packet:
-                        print("Connection lost.")
-                        return
+        # 其他玩家的 START_GAME 是 server 的推送，交給 handler；房主的則是請求的回覆
+        started = []
+        self.dispatcher.on(T_START_GAME, started.append)
+        try:
+            while not started:
+                # Check for input or socket data
+                inputs = [s, sys.stdin]
+                if self.reader.has_packet():
+                    # 已經收進 buffer 的封包不會讓 select 回報 socket 可讀
+                    readable = [s]
+                else:
+                    readable, _, _ = select.select(inputs, [], [])
 
-                    if packet.type == T_START_GAME:
-                        # 檢查是否成功
-                        if packet.data.get("success") == False:
-                            print(f"\n❌ Cannot start game: {packet.data.get('message', 'Unknown error')}\n")
-                            continue
-                        
-                        print("Game Starting!")
-                        self._launch_game_client(packet)
-                        return  # Exit room loop after game starts? Or stay?
-                        # Usually game client takes over screen.
-                        # After game, we might return here.
-                        # For now, let's return to lobby after game launch.
-                    elif packet.type == T_LIST_ROOMS:  # Ignore or handle updates
-                        pass
-                    else:
-                        # Handle other packets (chat?)
-                        pass
-                elif r is sys.stdin:
-                    cmd = sys.stdin.readline().strip()
-                    if cmd == "q":
-                        # Leave room
-                        from common.Packet.game_extra import LeaveRoomPacket
-                        leave_packet = LeaveRoomPacket(room_id, self.user_context.username)
-                        s.sendall(leave_packet.to_bytes())
-                        reply = Packet.receive(s)
-                        if reply and reply.data.get("success"):
-                            print("✓ Left room successfully")
-                        else:
-                            print(f"✗ Failed to leave room: {reply.data.get('message', 'Unknown error')}")
-                        return
-                    if is_owner and cmd == "s":
-                        # Start Game
-                        packet = Packet(
-                            T_START_GAME,
-                            {
-                                "room_id": room_id,
-                                "username": self.user_context.username,
-                            },
-                        )
-                        s.sendall(packet.to_bytes())
-                        print("Start request sent...")
+                for r in readable:
+                    if r is s:
+                        # 推送交給 handler，沒有 handler 的封包會被丟掉
+                        if not self.dispatcher.poll():
+                            print("Connection lost.")
+                            return
+                    elif r is sys.stdin:
+                        cmd = sys.stdin.readline().strip()
+                        if cmd == "q":
+                            # Leave room
+                            from common.Packet.game_extra import LeaveRoomPacket
+                            leave_packet = LeaveRoomPacket(room_id, self.user_context.username)
+                            reply = self.dispatcher.request(leave_packet)
+                            if reply and reply.data.get("success"):
+                                print("✓ Left room successfully")
+                            else:
+                                print(f"✗ Failed to leave room: {reply.data.get('message', 'Unknown error')}")
+                            return
+                        if is_owner and cmd == "s":
+                            # Start Game
+                            packet = Packet(
+                                T_START_GAME,
+                                {
+                                    "room_id": room_id,
+                                    "username": self.user_context.username,
+                                },
+                            )
+                            print("Start request sent...")
+                            reply = self.dispatcher.request(packet)
+                            if not reply:
+                                print("Connection lost.")
+                                return
+                            # 檢查是否成功
+                            if reply.data.get("success") == False:
+                                print(f"\n❌ Cannot start game: {reply.data.get('message', 'Unknown error')}\n")
+                                continue
+                            started.append(reply)
+        finally:
+            self.dispatcher.off(T_START_GAME)
+
+        print("Game Starting!")
+        # 遊戲 client 結束後回到 lobby
+        self._launch_game_client(started[0])
 
     def _launch_game_client(self, packet: StartGamePacket):
         game_id = packet.data["game_id"]
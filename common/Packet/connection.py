@@ -0,0 +1,47 @@
+from ..packet import Packet
+from ..type import T_HELLO
+
+
+class HelloPacket(Packet):
+    """
+    Hello packet format, sent by the client right after connecting:
+    {
+        "type": T_HELLO,
+        "data": {
+            "codecs": ["binary-1a2b3c4d", "json"],
+            "compression_level": 6
+        }
+    }
+
+    ``codecs`` are the codecs the client can use, most preferred first
+    (common/codec.py). ``compression_level`` is the zlib level the client
+    would like large frames compressed with, or 0 for no compression
+    (common/compression.py). The hello and its reply are always JSON and
+    never compressed.
+    """
+
+    def __init__(self, codecs: list[str], compression_level: int = 0):
+        super().__init__(T_HELLO, {"codecs": codecs, "compression_level": compression_level})
+
+
+class HelloPacketReply(Packet):
+    """
+    Reply packet from lobby server to client
+    Packet format:
+    {
+        "type": T_HELLO,
+        "data": {
+            "success": true,
+            "codec": "binary-1a2b3c4d",
+            "compression_level": 6
+        }
+    }
+
+    Both sides encode every later packet on the connection with ``codec``
+    and compress the large ones at ``compression_level`` (0: never).
+    """
+
+    def __init__(self, codec: str, compression_level: int = 0):
+        super().__init__(
+            T_HELLO, {"success": True, "codec": codec, "compression_level": compression_level}
+        )
@@ -8,11 +8,21 @@ from ..type import (
     T_LIST_GAMES,
     T_GET_GAME_DETAIL,
     T_GAME_REVIEW,
+    T_LIST_GAME_REVIEWS,
+    T_SEARCH_GAMES,
+    T_LEADERBOARD,
+    T_CATALOG_CHANGES,
     T_DEVELOPER_LOGIN,
     T_DEVELOPER_REGISTER,
     T_DEVELOPER_LOGOUT,
     T_LIST_DEVELOPER_GAMES,
     T_UPLOAD_GAME,
+    T_DB_GET_GAME,
+    T_DB_RESERVE_GAME_ID,
+    T_DB_ADD_GAME_METADATA,
+    T_DB_UPDATE_GAME_METADATA,
+    T_DB_DELETE_GAME_METADATA,
+    T_DB_INCREMENT_DOWNLOAD_COUNT,
 )
 
 
@@ -102,17 +112,47 @@ class DBListGamesPacket(Packet):
                     "game_version": "1.0.0",
                     "game_author": "user",
                     "download_count": 0,
-                    "comments": [],
-                    "game_created_at": "2025-11-25T22:58:34+08:00"
+                    "game_created_at": "2025-11-25T22:58:34+08:00",
+                    "rating_sum": 0,
+                    "rating_count": 0,
+                    "rating_histogram": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0},
+                    "average_rating": 0
                 },
                 ...
-            ]
+            ],
+            "total": 25,
+            "next_offset": 10,
+            "etag": "3f2a9c1e.42"
         }
     }
+    ``games`` only holds the requested page and fields. ``total`` is the
+    number of games in the catalog and ``next_offset`` is null on the
+    last page. An unknown sort key gets ``success`` false and a
+    ``message``.
+
+    ``etag`` changes whenever any game changes. When the request carried
+    the current tag, ``games`` is empty and ``not_modified`` is true: the
+    cached reply is still valid.
     """
 
-    def __init__(self, success: bool, games: list[dict]):
-        super().__init__(T_LIST_GAMES, {"success": success, "games": games})
+    def __init__(
+        self,
+        success: bool,
+        games: list[dict],
+        total: int = None,
+        next_offset: int = None,
+        message: str = None,
+        etag: str = None,
+        not_modified: bool = False,
+    ):
+        data = {"success": success, "games": games, "total": total, "next_offset": next_offset}
+        if message is not None:
+            data["message"] = message
+        if etag is not None:
+            data["etag"] = etag
+        if not_modified:
+            data["not_modified"] = True
+        super().__init__(T_LIST_GAMES, data)
 
 
 class DBGetGameDetailPacket(Packet):
@@ -130,17 +170,42 @@ class DBGetGameDetailPacket(Packet):
                 "game_version": "1.0.0",
                 "game_author": "user",
                 "download_count": 0,
-                "comments": [],
-                "game_created_at": "2025-11-25T22:58:34+08:00"
-            }
+                "game_created_at": "2025-11-25T22:58:34+08:00",
+                "rating_sum": 0,
+                "rating_count": 0,
+                "rating_histogram": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0},
+                "average_rating": 0,
+                "reviews": [
+                    {
+                        "review_id": "1:1",
+                        "game_id": "1",
+                        "username": "user",
+                        "rating": 5,
+                        "comment": "game1 comment",
+                        "created_at": "2025-11-25T22:58:34+08:00"
+                    }
+                ],
+                "reviews_cursor": null,
+                "downloads_by_version": {"1.0.0": 3},
+                "downloads_by_day": {"2025-11-25": 3}
+            },
+            "etag": "7"
         }
     }
+    ``etag`` is the game's revision, which changes whenever the game, its
+    reviews or its download statistics change. When the request carried
+    the current tag, ``game_info`` is null and ``not_modified`` is true.
     """
 
-    def __init__(self, success: bool, game_info: dict):
-        super().__init__(
-            T_GET_GAME_DETAIL, {"success": success, "game_info": game_info}
-        )
+    def __init__(
+        self, success: bool, game_info: dict, etag: str = None, not_modified: bool = False
+    ):
+        data = {"success": success, "game_info": game_info}
+        if etag is not None:
+            data["etag"] = etag
+        if not_modified:
+            data["not_modified"] = True
+        super().__init__(T_GET_GAME_DETAIL, data)
 
 
 class DBGameReviewPacket(Packet):
@@ -160,6 +225,145 @@ class DBGameReviewPacket(Packet):
         super().__init__(T_GAME_REVIEW, {"success": success, "message": message})
 
 
+class DBListGameReviewsPacket(Packet):
+    """
+    Reply packet from database server to lobby server
+    Packet format:
+    {
+        "type": T_LIST_GAME_REVIEWS,
+        "data": {
+            "success": true,
+            "reviews": [
+                {
+                    "review_id": "1:2",
+                    "game_id": "1",
+                    "username": "user",
+                    "rating": 5,
+                    "comment": "game1 comment",
+                    "created_at": "2025-11-25T22:58:34+08:00"
+                },
+                ...
+            ],
+            "next_cursor": 1
+        }
+    }
+    ``next_cursor`` is null once the oldest review has been returned.
+    """
+
+    def __init__(self, success: bool, reviews: list[dict], next_cursor: int = None):
+        super().__init__(
+            T_LIST_GAME_REVIEWS,
+            {"success": success, "reviews": reviews, "next_cursor": next_cursor},
+        )
+
+
+class DBSearchGamesPacket(Packet):
+    """
+    Reply packet from database server to lobby server
+    Packet format:
+    {
+        "type": T_SEARCH_GAMES,
+        "data": {
+            "success": true,
+            "games": [
+                {
+                    "game_id": "1",
+                    "game_name": "game1",
+                    ...
+                    "average_rating": 0,
+                    "score": 110
+                },
+                ...
+            ],
+            "total": 12,
+            "next_offset": 10
+        }
+    }
+    ``total`` is the number of matching games; ``next_offset`` is null on
+    the last page.
+    """
+
+    def __init__(self, success: bool, games: list[dict], total: int = 0, next_offset: int = None):
+        super().__init__(
+            T_SEARCH_GAMES,
+            {"success": success, "games": games, "total": total, "next_offset": next_offset},
+        )
+
+
+class DBLeaderboardPacket(Packet):
+    """
+    Reply packet from database server to lobby server
+    Packet format:
+    {
+        "type": T_LEADERBOARD,
+        "data": {
+            "success": true,
+            "board": "top_downloaded",
+            "games": [
+                {
+                    "game_id": "1",
+                    "game_name": "game1",
+                    ...
+                    "download_count": 42,
+                    "average_rating": 4.5
+                },
+                ...
+            ]
+        }
+    }
+    ``games`` is ordered from first place down. An unknown board gets
+    ``success`` false and a ``message``.
+    """
+
+    def __init__(self, success: bool, board: str, games: list[dict], message: str = None):
+        data = {"success": success, "board": board, "games": games}
+        if message is not None:
+            data["message"] = message
+        super().__init__(T_LEADERBOARD, data)
+
+
+class DBCatalogChangesPacket(Packet):
+    """
+    Reply packet from database server to lobby server
+    Packet format:
+    {
+        "type": T_CATALOG_CHANGES,
+        "data": {
+            "success": true,
+            "epoch": "3f2a9c1e",
+            "seq": 42,
+            "events": [
+                {"seq": 41, "event": "game_added", "game_id": "7", "game": {...}},
+                {"seq": 42, "event": "review_added", "game_id": "3", "review": {...}, "game": {...}}
+            ],
+            "more": false
+        }
+    }
+    ``event`` is "game_added", "game_updated", "game_deleted",
+    "review_added" or "downloads_flushed"; every event but
+    "game_deleted" carries ``game``, the game after the change. ``seq`` is the cursor for the
+    next request and ``more`` tells whether further events are waiting.
+
+    When the subscriber has to start over, ``reset`` is true and
+    ``games`` holds the whole catalog as of ``seq``.
+    """
+
+    def __init__(
+        self,
+        success: bool,
+        epoch: str,
+        seq: int,
+        events: list[dict],
+        more: bool = False,
+        games: list[dict] = None,
+    ):
+        data = {"success": success, "epoch": epoch, "seq": seq, "events": events, "more": more}
+        if games is not None:
+            data["reset"] = True
+            data["games"] = games
+        super().__init__(T_CATALOG_CHANGES, data)
+
+
 class DBDeveloperLoginPacket(Packet):
     """
     Reply packet from database server to developer server
@@ -227,8 +431,11 @@ class ListDeveloperGamesPacket(Packet):
                     "game_version": "1.0.0",
                     "game_author": "user",
                     "download_count": 0,
-                    "comments": [],
-                    "game_created_at": "2025-11-25T22:58:34+08:00"
+                    "game_created_at": "2025-11-25T22:58:34+08:00",
+                    "rating_sum": 0,
+                    "rating_count": 0,
+                    "rating_histogram": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0},
+                    "average_rating": 0
                 },
                 ...
             ]
@@ -255,3 +462,259 @@ class UploadGamePacketReply(Packet):
 
     def __init__(self, success: bool, message: str = "Upload successful"):
         super().__init__(T_UPLOAD_GAME, {"success": success, "message": message})
+
+
+# Packets used only between the front-end servers and the database server
+
+
+class GetGamePacket(Packet):
+    """
+    Request packet from lobby server to database server
+    Packet format:
+    {
+        "type": T_DB_GET_GAME,
+        "data": {
+            "game_id": "1"
+        }
+    }
+    """
+
+    def __init__(self, game_id: str):
+        super().__init__(T_DB_GET_GAME, {"game_id": game_id})
+
+
+class DBGetGamePacket(Packet):
+    """
+    Reply packet from database server to lobby server
+    Packet format:
+    {
+        "type": T_DB_GET_GAME,
+        "data": {
+            "success": true,
+            "game": {"game_id": "1", ..., "average_rating": 0}
+        }
+    }
+    "game" is null when the game does not exist.
+    """
+
+    def __init__(self, success: bool, game: dict = None):
+        super().__init__(T_DB_GET_GAME, {"success": success, "game": game})
+
+
+class ReserveGameIdPacket(Packet):
+    """
+    Request packet from developer server to database server
+    Packet format:
+    {
+        "type": T_DB_RESERVE_GAME_ID,
+        "data": {}
+    }
+    """
+
+    def __init__(self):
+        super().__init__(T_DB_RESERVE_GAME_ID, {})
+
+
+class DBReserveGameIdPacket(Packet):
+    """
+    Reply packet from database server to developer server
+    Packet format:
+    {
+        "type": T_DB_RESERVE_GAME_ID,
+        "data": {
+            "success": true,
+            "game_id": "7"
+        }
+    }
+    The ID is never handed out again, even if no game is created with it.
+    """
+
+    def __init__(self, success: bool, game_id: str = None):
+        super().__init__(T_DB_RESERVE_GAME_ID, {"success": success, "game_id": game_id})
+
+
+class AddGameMetadataPacket(Packet):
+    """
+    Request packet from developer server to database server
+    Packet format:
+    {
+        "type": T_DB_ADD_GAME_METADATA,
+        "data": {
+            "username": "developer",
+            "game_name": "game1",
+            "game_description": "game1 description",
+            "game_version": "1.0.0",
+            "max_players": 2,
+            "game_id": "7"
+        }
+    }
+    game_id is an ID from T_DB_RESERVE_GAME_ID, or null to allocate one.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        game_name: str,
+        game_description: str,
+        game_version: str,
+        max_players: int = 2,
+        game_id: str = None,
+    ):
+        super().__init__(
+            T_DB_ADD_GAME_METADATA,
+            {
+                "username": username,
+                "game_name": game_name,
+                "game_description": game_description,
+                "game_version": game_version,
+                "max_players": max_players,
+                "game_id": game_id,
+            },
+        )
+
+
+class DBAddGameMetadataPacket(Packet):
+    """
+    Reply packet from database server to developer server
+    Packet format:
+    {
+        "type": T_DB_ADD_GAME_METADATA,
+        "data": {
+            "success": true,
+            "game_id": "1"
+        }
+    }
+    """
+
+    def __init__(self, success: bool, game_id: str = None):
+        super().__init__(
+            T_DB_ADD_GAME_METADATA, {"success": success, "game_id": game_id}
+        )
+
+
+class UpdateGameMetadataPacket(Packet):
+    """
+    Request packet from developer server to database server
+    Packet format:
+    {
+        "type": T_DB_UPDATE_GAME_METADATA,
+        "data": {
+            "game_id": "1",
+            "game_version": "1.0.1",
+            "game_name": "game1",
+            "game_description": "game1 description",
+            "max_players": 2
+        }
+    }
+    game_name, game_description and max_players may be null to keep the
+    current value.
+    """
+
+    def __init__(
+        self,
+        game_id: str,
+        game_version: str,
+        game_name: str = None,
+        game_description: str = None,
+        max_players: int = None,
+    ):
+        super().__init__(
+            T_DB_UPDATE_GAME_METADATA,
+            {
+                "game_id": game_id,
+                "game_version": game_version,
+                "game_name": game_name,
+                "game_description": game_description,
+                "max_players": max_players,
+            },
+        )
+
+
+class DBUpdateGameMetadataPacket(Packet):
+    """
+    Reply packet from database server to developer server
+    Packet format:
+    {
+        "type": T_DB_UPDATE_GAME_METADATA,
+        "data": {
+            "success": true
+        }
+    }
+    """
+
+    def __init__(self, success: bool):
+        super().__init__(T_DB_UPDATE_GAME_METADATA, {"success": success})
+
+
+class DeleteGameMetadataPacket(Packet):
+    """
+    Request packet from developer server to database server
+    Packet format:
+    {
+        "type": T_DB_DELETE_GAME_METADATA,
+        "data": {
+            "game_id": "1",
+            "username": "developer"
+        }
+    }
+    """
+
+    def __init__(self, game_id: str, username: str):
+        super().__init__(
+            T_DB_DELETE_GAME_METADATA, {"game_id": game_id, "username": username}
+        )
+
+
+class DBDeleteGameMetadataPacket(Packet):
+    """
+    Reply packet from database server to developer server
+    Packet format:
+    {
+        "type": T_DB_DELETE_GAME_METADATA,
+        "data": {
+            "success": true,
+            "message": "Game deleted successfully"
+        }
+    }
+    """
+
+    def __init__(self, success: bool, message: str = "Game deleted successfully"):
+        super().__init__(
+            T_DB_DELETE_GAME_METADATA, {"success": success, "message": message}
+        )
+
+
+class IncrementDownloadCountPacket(Packet):
+    """
+    Request packet from lobby server to database server
+    Packet format:
+    {
+        "type": T_DB_INCREMENT_DOWNLOAD_COUNT,
+        "data": {
+            "game_id": "1",
+            "game_version": "1.0.0"
+        }
+    }
+    """
+
+    def __init__(self, game_id: str, game_version: str = None):
+        super().__init__(
+            T_DB_INCREMENT_DOWNLOAD_COUNT,
+            {"game_id": game_id, "game_version": game_version},
+        )
+
+
+class DBIncrementDownloadCountPacket(Packet):
+    """
+    Reply packet from database server to lobby server
+    Packet format:
+    {
+        "type": T_DB_INCREMENT_DOWNLOAD_COUNT,
+        "data": {
+            "success": true
+        }
+    }
+    """
+
+    def __init__(self, success: bool):
+        super().__init__(T_DB_INCREMENT_DOWNLOAD_COUNT, {"success": success})
@@ -3,19 +3,50 @@ from ..type import (
     T_LIST_GAMES,
     T_GET_GAME_DETAIL,
     T_GAME_REVIEW,
+    T_LIST_GAME_REVIEWS,
+    T_SEARCH_GAMES,
+    T_LEADERBOARD,
+    T_CATALOG_CHANGES,
     T_CREATE_ROOM,
     T_LIST_ROOMS,
 )
 
 
 class ListGamesPacket(Packet):
-    def __init__(self):
-        super().__init__(T_LIST_GAMES, {})
+    """
+    List games ordered by ``sort`` ("game_id", "name", "downloads",
+    "rating" or "newest"). ``offset`` is the ``next_offset`` of the
+    previous page; without ``limit`` every game from ``offset`` on is
+    returned. ``fields`` keeps only the listed fields of each game
+    (``game_id`` is always kept); None returns every field.
+
+    ``etag`` is the tag of a cached reply to the same request; when the
+    catalog has not changed since, the reply is only "not modified".
+    """
+
+    def __init__(
+        self,
+        offset: int = 0,
+        limit: int = None,
+        sort: str = "game_id",
+        fields: list[str] = None,
+        etag: str = None,
+    ):
+        super().__init__(
+            T_LIST_GAMES,
+            {"offset": offset, "limit": limit, "sort": sort, "fields": fields, "etag": etag},
+        )
 
 
 class GetGameDetailPacket(Packet):
-    def __init__(self, game_id: str):
-        super().__init__(T_GET_GAME_DETAIL, {"game_id": game_id})
+    """
+    Fetch a game with its first page of reviews. ``etag`` is the tag of
+    a cached reply for the same game; when the game has not changed
+    since, the reply is only "not modified".
+    """
+
+    def __init__(self, game_id: str, etag: str = None):
+        super().__init__(T_GET_GAME_DETAIL, {"game_id": game_id, "etag": etag})
 
 
 class GameReviewPacket(Packet):
@@ -25,6 +56,52 @@ class GameReviewPacket(Packet):
         )
 
 
+class ListGameReviewsPacket(Packet):
+    """
+    Fetch one page of a game's reviews, newest first. ``cursor`` is the
+    ``next_cursor`` of the previous page (None for the first page).
+    """
+
+    def __init__(self, game_id: str, cursor: int = None, limit: int = 5):
+        super().__init__(
+            T_LIST_GAME_REVIEWS, {"game_id": game_id, "cursor": cursor, "limit": limit}
+        )
+
+
+class SearchGamesPacket(Packet):
+    """
+    Search game names and descriptions. Results are ranked best first;
+    ``offset`` is the ``next_offset`` of the previous page (0 for the
+    first page).
+    """
+
+    def __init__(self, query: str, offset: int = 0, limit: int = 10):
+        super().__init__(
+            T_SEARCH_GAMES, {"query": query, "offset": offset, "limit": limit}
+        )
+
+
+class LeaderboardPacket(Packet):
+    """
+    Fetch the top ``limit`` games of a leaderboard: "top_downloaded",
+    "top_rated" or "newest".
+    """
+
+    def __init__(self, board: str, limit: int = 10):
+        super().__init__(T_LEADERBOARD, {"board": board, "limit": limit})
+
+
+class CatalogChangesPacket(Packet):
+    """
+    Fetch the catalog events after ``since``, the ``seq`` of the last
+    reply. ``epoch`` is the ``epoch`` of that reply; None (or an epoch
+    the server no longer knows) gets the whole catalog instead.
+    """
+
+    def __init__(self, since: int = 0, epoch: str = None, limit: int = 100):
+        super().__init__(T_CATALOG_CHANGES, {"since": since, "epoch": epoch, "limit": limit})
+
+
 class CreateRoomPacket(Packet):
     def __init__(self, game_id: str, username: str):
         super().__init__(T_CREATE_ROOM, {"game_id": game_id, "username": username})
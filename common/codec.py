@@ -0,0 +1,217 @@
+import json
+import struct
+import zlib
+
+from . import type as types
+from .type import (
+    T_LOGIN,
+    T_REGISTER,
+    T_LOGOUT,
+    T_LIST_ONLINE_USERS,
+    T_LIST_GAMES,
+    T_GET_GAME_DETAIL,
+    T_GAME_REVIEW,
+    T_SEARCH_GAMES,
+    T_LEADERBOARD,
+    T_CATALOG_CHANGES,
+    T_CREATE_ROOM,
+    T_JOIN_ROOM,
+    T_LEAVE_ROOM,
+    T_START_GAME,
+    T_LIST_ROOMS,
+    T_DOWNLOAD_GAME_INIT,
+)
+
+
+# 沒有空白的 JSON；共用一個 encoder，不必每次 json.dumps 都建立新的
+COMPACT_JSON = json.JSONEncoder(separators=(",", ":"), check_circular=False)
+
+
+class JsonCodec:
+    """原本的編碼：data 加上 type 的 UTF-8 JSON，所有 peer 都看得懂"""
+
+    name = "json"
+
+    def encode(self, type: str, data: dict, request_id: int = None) -> bytes:
+        payload = data.copy()
+        payload["type"] = type
+        if request_id is not None:
+            payload["request_id"] = request_id
+        return json.dumps(payload).encode("utf-8")
+
+    def decode(self, body) -> dict:
+        return json.loads(str(body, "utf-8"))
+
+
+class Schema:
+    """一種封包形狀的固定格式，pack 出的 body 不含 key；data 不符合時 pack 回傳 None"""
+
+    # fields 是 (key, kind)，kind 為 "?" bool、"i" 64-bit int、"s" 字串、"j" 任意 JSON 值；
+    # 字串與 JSON 在 struct 中只放長度，內容接在 struct 之後
+    FORMATS = {"?": "?", "i": "q", "s": "I", "j": "I"}
+    EMPTY = {"?": False, "i": 0, "s": 0, "j": 0}
+
+    def __init__(self, *fields: tuple[str, str]):
+        assert len(fields) <= 8
+        self.fields = fields
+        self.keys = {key for key, _ in fields}
+        self.struct = struct.Struct("!B" + "".join(self.FORMATS[kind] for _, kind in fields))
+
+    def pack(self, data: dict):
+        if data.keys() - {"type"} != self.keys:
+            return None
+        nulls = 0
+        values = []
+        strings = []
+        for bit, (key, kind) in enumerate(self.fields):
+            value = data[key]
+            if value is None:
+                nulls |= 1 << bit
+                value = self.EMPTY[kind]
+            elif kind == "s" or kind == "j":
+                if kind == "j":
+                    value = COMPACT_JSON.encode(value)
+                elif type(value) is not str:
+                    return None
+                value = value.encode("utf-8")
+                strings.append(value)
+                value = len(value)
+            elif type(value) is not (bool if kind == "?" else int):
+                return None
+            values.append(value)
+        try:
+            head = self.struct.pack(nulls, *values)
+        except struct.error:
+            return None
+        return head + b"".join(strings)
+
+    def unpack(self, body, offset: int) -> dict:
+        nulls, *values = self.struct.unpack_from(body, offset)
+        offset += self.struct.size
+        data = {}
+        for bit, ((key, kind), value) in enumerate(zip(self.fields, values)):
+            if nulls >> bit & 1:
+                value = None
+            elif kind == "s" or kind == "j":
+                end = offset + value
+                value = str(body[offset:end], "utf-8")
+                if kind == "j":
+                    value = json.loads(value)
+                offset = end
+            data[key] = value
+        return data
+
+
+EMPTY = Schema()
+RESULT = Schema(("success", "?"), ("message", "s"))
+CREDENTIALS = Schema(("username", "s"), ("password", "s"))
+ROOM_MEMBER = Schema(("room_id", "s"), ("username", "s"))
+
+# lobby 最常見的封包形狀；同一個 type 的請求與回覆各有一個 schema
+SCHEMAS = {
+    T_LOGIN: (CREDENTIALS, RESULT),
+    T_REGISTER: (CREDENTIALS, RESULT),
+    T_LOGOUT: (Schema(("username", "s")), RESULT),
+    T_LIST_ONLINE_USERS: (EMPTY, Schema(("success", "?"), ("online_users", "j"))),
+    T_LIST_ROOMS: (EMPTY,),
+    T_LIST_GAMES: (
+        Schema(("offset", "i"), ("limit", "i"), ("sort", "s"), ("fields", "j"), ("etag", "s")),
+    ),
+    T_GET_GAME_DETAIL: (Schema(("game_id", "s"), ("etag", "s")),),
+    T_GAME_REVIEW: (
+        Schema(("game_id", "s"), ("score", "i"), ("comment", "s"), ("username", "s")),
+        RESULT,
+    ),
+    T_SEARCH_GAMES: (Schema(("query", "s"), ("offset", "i"), ("limit", "i")),),
+    T_LEADERBOARD: (Schema(("board", "s"), ("limit", "i")),),
+    T_CATALOG_CHANGES: (Schema(("since", "i"), ("epoch", "s"), ("limit", "i")),),
+    T_CREATE_ROOM: (
+        Schema(("game_id", "s"), ("username", "s")),
+        Schema(("success", "?"), ("room_id", "s")),
+    ),
+    T_JOIN_ROOM: (ROOM_MEMBER, RESULT),
+    T_LEAVE_ROOM: (ROOM_MEMBER, RESULT),
+    T_START_GAME: (
+        Schema(("room_id", "s"), ("game_id", "s"), ("server_ip", "s"), ("server_port", "i")),
+    ),
+    T_DOWNLOAD_GAME_INIT: (Schema(("game_id", "s"), ("username", "s")),),
+}
+
+
+class BinaryCodec:
+    """不重複 key 的編碼：MAGIC、type tag、schema 編號，之後是 struct 或 JSON
+
+    name 含有 tag 與 schema 的 checksum，雙方相同時 handshake 才會選用。
+    """
+
+    MAGIC = 0xB1
+    VERSION = 2  # 格式改變時加一，讓 name 跟著改變
+    HEAD = struct.Struct("!BHB")  # magic, type tag, schema
+    REQUEST_ID = struct.Struct("!I")
+    REQUEST_ID_FLAG = 0x80
+
+    def __init__(self, type_names: tuple[str, ...], schemas: dict):
+        self.types = type_names
+        self.tags = {name: tag for tag, name in enumerate(type_names, 1)}
+        self.schemas = {self.tags[name]: entries for name, entries in schemas.items()}
+        layout = repr((self.VERSION, type_names, [(name, [s.fields for s in e]) for name, e in schemas.items()]))
+        self.name = f"binary-{zlib.crc32(layout.encode()):08x}"
+
+    def encode(self, type: str, data: dict, request_id: int = None) -> bytes:
+        tag = self.tags.get(type, 0)
+        for number, schema in enumerate(self.schemas.get(tag, ()), 1):
+            body = schema.pack(data)
+            if body is not None:
+                return self._head(tag, number, request_id) + body
+        if not tag:
+            payload = data.copy()
+            payload["type"] = type
+        elif "type" in data:
+            # 收到後轉送的封包 data 中仍有 type，tag 已經代表它
+            payload = data.copy()
+            del payload["type"]
+        else:
+            payload = data
+        return self._head(tag, 0, request_id) + COMPACT_JSON.encode(payload).encode("utf-8")
+
+    def _head(self, tag: int, number: int, request_id: int) -> bytes:
+        if request_id is None:
+            return self.HEAD.pack(self.MAGIC, tag, number)
+        head = self.HEAD.pack(self.MAGIC, tag, number | self.REQUEST_ID_FLAG)
+        return head + self.REQUEST_ID.pack(request_id)
+
+    def decode(self, body) -> dict:
+        _, tag, number = self.HEAD.unpack_from(body)
+        offset = self.HEAD.size
+        request_id = None
+        if number & self.REQUEST_ID_FLAG:
+            number &= ~self.REQUEST_ID_FLAG
+            request_id = self.REQUEST_ID.unpack_from(body, offset)[0]
+            offset += self.REQUEST_ID.size
+        if number:
+            data = self.schemas[tag][number - 1].unpack(body, offset)
+        else:
+            data = json.loads(str(body[offset:], "utf-8"))
+        if tag:
+            data["type"] = self.types[tag - 1]
+        if request_id is not None:
+            data["request_id"] = request_id
+        return data
+
+
+# common/type.py 中所有 T_ 常數，依定義順序編號
+TYPES = tuple(value for name, value in vars(types).items() if name.startswith("T_"))
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec(TYPES, SCHEMAS)
+CODECS = {codec.name: codec for codec in (BINARY_CODEC, JSON_CODEC)}
+# client 在 HELLO 中依偏好順序提出的 codec
+PREFERRED_CODECS = [BINARY_CODEC.name, JSON_CODEC.name]
+
+
+def choose_codec(offered: list[str]):
+    """依對方的偏好順序選出第一個雙方都支援的 codec，沒有時使用 JSON"""
+    for name in offered:
+        if name in CODECS:
+            return CODECS[name]
+    return JSON_CODEC
@@ -0,0 +1,67 @@
+import threading
+import time
+import zlib
+
+# 小於這個大小的 body 不壓縮：省下的 byte 很少，只會多花 CPU 時間
+COMPRESSION_THRESHOLD = 1024
+# client 在 HELLO 中提出的 zlib level，也是 server 接受的上限
+COMPRESSION_LEVEL = 6
+
+
+class CompressionStats:
+    """每種封包的壓縮統計，由 server 的所有連線共用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._types = {}  # {type: [frames, raw_bytes, compressed_bytes, cpu_seconds]}
+
+    def add(self, type: str, raw_bytes: int, compressed_bytes: int, cpu_seconds: float):
+        with self._lock:
+            totals = self._types.setdefault(type, [0, 0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += raw_bytes
+            totals[2] += compressed_bytes
+            totals[3] += cpu_seconds
+
+    def metrics(self) -> dict:
+        """每種封包的壓縮統計：ratio 是壓縮後 / 壓縮前，us_per_frame 是每個 frame 的 CPU 時間"""
+        with self._lock:
+            types = {type: list(totals) for type, totals in self._types.items()}
+        return {
+            type: {
+                "frames": frames,
+                "raw_bytes": raw,
+                "compressed_bytes": compressed,
+                "ratio": compressed / raw,
+                "us_per_frame": seconds / frames * 1e6,
+            }
+            for type, (frames, raw, compressed, seconds) in types.items()
+        }
+
+
+class Compressor:
+    """以 HELLO 協商的 level 壓縮一個連線送出的 body；太小或壓不小的 body 原樣送出"""
+
+    def __init__(self, level: int, threshold: int = COMPRESSION_THRESHOLD, stats: CompressionStats = None):
+        self.level = level
+        self.threshold = threshold
+        self.stats = stats
+
+    def compress(self, type: str, body: bytes) -> tuple[bytes, bool]:
+        """回傳 (要送出的 body, 是否已壓縮)"""
+        if len(body) < self.threshold:
+            return body, False
+        started = time.thread_time()
+        compressed = zlib.compress(body, self.level)
+        if self.stats is not None:
+            self.stats.add(type, len(body), len(compressed), time.thread_time() - started)
+        if len(compressed) >= len(body):
+            return body, False
+        return compressed, True
+
+
+def negotiate_level(offered) -> int:
+    """client 提出的 level 不超過 COMPRESSION_LEVEL 時照用；沒有提出或為 0 代表不壓縮"""
+    if not offered:
+        return 0
+    return max(1, min(int(offered), COMPRESSION_LEVEL))
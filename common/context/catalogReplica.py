@@ -0,0 +1,38 @@
+from ..packet import Packet
+from ..Packet.game import CatalogChangesPacket
+
+
+class CatalogReplica:
+    """由 CATALOG_CHANGES 更新的本機 catalog；遊戲只會整筆替換，其他 thread 可以直接 get"""
+
+    def __init__(self):
+        self.games = {}  # {game_id: game}
+        self.epoch = None
+        self.seq = 0
+
+    def request(self, limit: int = 100) -> CatalogChangesPacket:
+        return CatalogChangesPacket(self.seq, self.epoch, limit)
+
+    def apply(self, reply: Packet) -> bool:
+        """套用 CATALOG_CHANGES 的回覆，回傳是否還有尚未取得的事件"""
+        data = reply.data
+        if not data.get("success"):
+            return False
+        if data.get("reset"):
+            self.games = {game["game_id"]: game for game in data["games"]}
+        else:
+            for event in data["events"]:
+                self._apply_event(event)
+        self.epoch = data["epoch"]
+        self.seq = data["seq"]
+        return data["more"]
+
+    def _apply_event(self, event: dict):
+        game_id = event["game_id"]
+        if event["event"] == "game_deleted":
+            self.games.pop(game_id, None)
+        else:
+            self.games[game_id] = event["game"]
+
+    def get(self, game_id: str):
+        return self.games.get(game_id)
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from .userContext import UserContext
+
+
+class PresenceRegistry:
+    """這個 server 上線中的帳號，只存在記憶體，以 username 為 key"""
+
+    def __init__(self, session_ttl: float = None):
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+        self._sessions = {}  # {username: UserContext}
+        self._last_seen = {}  # {username: monotonic time}
+
+    def claim(self, context: UserContext) -> bool:
+        """登記上線，帳號已經在其他連線登入時回傳 False"""
+        with self._lock:
+            if context.username in self._sessions:
+                return False
+            self._sessions[context.username] = context
+            self._last_seen[context.username] = time.monotonic()
+            return True
+
+    def login(self, context: UserContext, authenticate):
+        """以 authenticate() 驗證帳號並登記上線，回傳它的回覆；帳號已經在其他連線登入時回傳 None
+
+        已登入的帳號直接拒絕，不必再到 database 驗證並寫入 last_login；驗證成功但
+        claim 失敗代表驗證期間有另一個連線搶先登入。
+        """
+        if self.is_online(context.username):
+            return None
+        reply = authenticate()
+        if reply.data["success"] and not self.claim(context):
+            return None
+        return reply
+
+    def release(self, username: str, sock=None) -> bool:
+        """登記下線；有給 sock 時只會釋放由該連線持有的 session"""
+        with self._lock:
+            context = self._sessions.get(username)
+            if context is None or (sock is not None and context.socket is not sock):
+                return False
+            del self._sessions[username]
+            del self._last_seen[username]
+            return True
+
+    def touch(self, username: str):
+        with self._lock:
+            if username in self._sessions:
+                self._last_seen[username] = time.monotonic()
+
+    def get(self, username: str):
+        return self._sessions.get(username)
+
+    def is_online(self, username: str) -> bool:
+        return username in self._sessions
+
+    def online_users(self) -> list[str]:
+        with self._lock:
+            return list(self._sessions)
+
+    def sweep(self) -> list[UserContext]:
+        """移除已斷線或閒置過久的 session，回傳被移除的 session"""
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            for username, context in list(self._sessions.items()):
+                expired = (
+                    self.session_ttl is not None
+                    and now - self._last_seen[username] > self.session_ttl
+                )
+                if context.socket.fileno() == -1 or expired:
+                    del self._sessions[username]
+                    del self._last_seen[username]
+                    stale.append(context)
+        return stale
+
+    def clear(self) -> list[UserContext]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self._last_seen.clear()
+        return sessions
@@ -0,0 +1,82 @@
+import itertools
+import socket
+
+from .codec import JSON_CODEC
+from .packet import PacketReader
+
+
+class Dispatcher:
+    """client 端依 request id 取得回覆，沒有 request id 的推送交給 on 註冊的 handler
+
+    和 PacketReader 一樣只能由一個 thread 使用。
+    """
+
+    def __init__(self, sock: socket.socket, reader: PacketReader, codec=JSON_CODEC, logger=None):
+        self.sock = sock
+        self.reader = reader
+        self.codec = codec
+        self.compressor = None  # 協商壓縮後由呼叫端設定
+        self.logger = logger
+        self.handlers = {}  # {type: handler}
+        self._replies = {}  # {request_id: reply}，已經收到但還沒有被 wait 取走的回覆
+        self._ids = itertools.count(1)
+
+    def on(self, type: str, handler):
+        """把 type 的推送交給 handler(packet)"""
+        self.handlers[type] = handler
+
+    def off(self, type: str):
+        self.handlers.pop(type, None)
+
+    def send(self, packet) -> int:
+        request_id = next(self._ids)
+        self.sock.sendall(packet.to_bytes(self.codec, request_id, self.compressor))
+        return request_id
+
+    def wait(self, request_id: int):
+        """讀取直到 request_id 的回覆到達並回傳；連線中斷時回傳 None"""
+        while request_id not in self._replies:
+            if not self.poll():
+                return None
+        return self._replies.pop(request_id)
+
+    def request(self, packet):
+        return self.wait(self.send(packet))
+
+    def pipeline(self, packets: list) -> list:
+        """一次送出所有請求再依序等待回覆，回傳與 packets 對應的回覆"""
+        request_ids = [next(self._ids) for _ in packets]
+        self.sock.sendall(
+            b"".join(
+                packet.to_bytes(self.codec, i, self.compressor)
+                for packet, i in zip(packets, request_ids)
+            )
+        )
+        return [self.wait(request_id) for request_id in request_ids]
+
+    def poll(self) -> bool:
+        """讀取一個 frame 並分派給等待中的請求或推送的 handler；連線中斷時回傳 False"""
+        packet = self.reader.receive()
+        if packet is None:
+            return False
+        if packet.request_id is not None:
+            self._replies[packet.request_id] = packet
+        elif not self._push(packet) and self.logger:
+            self.logger.info(f"Dropped unexpected {packet.type} packet")
+        return True
+
+    def receive(self):
+        """讀取下一個不是推送的 frame；連線中斷時回傳 None"""
+        while True:
+            packet = self.reader.receive()
+            if packet is None or not self._push(packet):
+                return packet
+
+    def _push(self, packet) -> bool:
+        if packet.request_id is not None:
+            return False
+        handler = self.handlers.get(packet.type)
+        if handler is None:
+            return False
+        handler(packet)
+        return True
@@ -1,45 +1,314 @@
-import json, struct, socket
+import struct, socket, threading, zlib
+
+from .codec import JSON_CODEC, BINARY_CODEC
+from .type import T_DATA_FRAME
 
 
 class Packet:
+    # 收到的封包所回覆的 request id (見 common/dispatcher.py)，server 推送的封包為 None
+    request_id = None
+
     def __init__(self, type: str, data: dict):
         self.type = type
         self.data = data
 
-    def to_bytes(self):
-        payload = self.data.copy()
-        payload["type"] = self.type
-        json_str = json.dumps(payload)
-        json_bytes = json_str.encode("utf-8")
-
-        header = struct.pack("!I", len(json_bytes))
-        return header + json_bytes
+    def to_bytes(self, codec=JSON_CODEC, request_id: int = None, compressor=None):
+        """加上長度 header 的封包；codec 與 compressor 是連線在 HELLO 時協商出的
+        編碼與壓縮，request_id 是請求的編號或回覆所對應的請求編號"""
+        body = codec.encode(self.type, self.data, request_id)
+        flags = 0
+        if compressor is not None:
+            body, compressed = compressor.compress(self.type, body)
+            if compressed:
+                flags = COMPRESSED_FLAG
+        header = struct.pack("!I", flags | len(body))
+        return header + body
 
     @staticmethod
     def receive(sock: socket.socket):
         try:
-            header_bytes = recv_all(sock, 4)
-            if not header_bytes:
-                return None
-            body_length = struct.unpack("!I", header_bytes)[0]
-            body_bytes = recv_all(sock, body_length)
-            if not body_bytes:
+            return Packet.read(sock)
+        except Exception as e:
+            print(f"Error receiving packet: {e}")
+            return None
+
+    @staticmethod
+    def read(sock: socket.socket):
+        """和 receive 相同，但 socket 錯誤 (例如逾時) 直接拋出；對方關閉連線時回傳 None"""
+        header_bytes = recv_all(sock, 4)
+        if not header_bytes:
+            return None
+        word = struct.unpack("!I", header_bytes)[0]
+        check_length(word & LENGTH_MASK, MAX_FRAME_SIZE)
+        body_bytes = recv_all(sock, word & LENGTH_MASK)
+        if not body_bytes:
+            return None
+        if word & COMPRESSED_FLAG:
+            # 沒有經過 HELLO 的 socket 不會協商壓縮
+            raise FrameError("Compressed frame on a connection without compression")
+        return Packet.decode(body_bytes)
+
+    @staticmethod
+    def decode(body_bytes: bytes):
+        """把不含 4-byte 長度 header 的封包內容轉回 Packet；也接受 memoryview
+
+        JSON 的 body 一定以 `{` 開頭，binary codec 的 body 以 MAGIC 開頭，
+        所以不需要知道連線協商的 codec 就能 decode"""
+        if body_bytes[0] == BINARY_CODEC.MAGIC:
+            data_dict = BINARY_CODEC.decode(body_bytes)
+        else:
+            data_dict = JSON_CODEC.decode(body_bytes)
+
+        packet = Packet(data_dict["type"], data_dict)
+        packet.request_id = data_dict.pop("request_id", None)
+        return packet
+
+
+HEADER = struct.Struct("!I")
+# 長度 header 的最高兩個位元是 flag，其餘位元是 body 長度
+DATA_FLAG = 0x80000000  # 這是 DataFrame
+COMPRESSED_FLAG = 0x40000000  # body 以 zlib 壓縮 (common/compression.py)
+LENGTH_MASK = 0x3FFFFFFF
+DATA_HEADER = struct.Struct("!IQ")  # stream id, offset
+# 傳送檔案時每個 DataFrame 的 payload 大小，小於 PacketReader 預設的 buffer
+DATA_CHUNK_SIZE = 32768
+# 單一 frame body 的上限；header 宣稱的長度超過它時直接中斷連線
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+class FrameError(ConnectionError):
+    """對方送出不合法的 frame，這個連線不能再繼續使用"""
+
+
+def check_length(length: int, limit: int):
+    if length > limit:
+        raise FrameError(f"Frame of {length} bytes exceeds the {limit} byte limit")
+
+
+def decompress(body, limit: int) -> bytes:
+    """解壓縮 frame 的 body；結果超過 limit bytes 或不是完整的 zlib 資料時拋出 FrameError"""
+    decompressor = zlib.decompressobj()
+    try:
+        data = decompressor.decompress(body, limit)
+    except zlib.error as e:
+        raise FrameError(f"Corrupt compressed frame: {e}") from e
+    if decompressor.unconsumed_tail:
+        raise FrameError(f"Compressed frame expands beyond the {limit} byte limit")
+    if not decompressor.eof or decompressor.unused_data:
+        raise FrameError("Malformed compressed frame")
+    return data
+
+
+class DataFrame:
+    """stream 的原始 bytes (例如檔案的一段)，header 帶 DATA_FLAG
+
+    PacketReader.read 回傳的 payload 指向 reader 的 buffer，只在下一次 read 前有效。
+    """
+
+    type = T_DATA_FRAME
+    request_id = None
+
+    def __init__(self, stream_id: int, offset: int, payload: bytes):
+        self.stream_id = stream_id
+        self.offset = offset
+        self.payload = payload
+
+    def to_bytes(self, codec=None, request_id: int = None, compressor=None):
+        # payload 是原始 bytes，不受連線的 codec 與壓縮影響
+        header = HEADER.pack(DATA_FLAG | (DATA_HEADER.size + len(self.payload)))
+        return b"".join((header, DATA_HEADER.pack(self.stream_id, self.offset), self.payload))
+
+    @staticmethod
+    def decode(body):
+        """把不含長度 header 的 body 轉回 DataFrame；payload 與 body 共用記憶體"""
+        if len(body) < DATA_HEADER.size:
+            raise FrameError(f"Data frame of {len(body)} bytes is shorter than its header")
+        stream_id, offset = DATA_HEADER.unpack_from(body)
+        return DataFrame(stream_id, offset, body[DATA_HEADER.size :])
+
+
+class PacketReader:
+    """以可重複使用的 buffer 讀取一個 socket 上的 frame
+
+    buffer 中可能有下一個 frame 的資料，所以這個 socket 的所有讀取都要經過同一個
+    reader；select 之前要先檢查 has_packet。
+    """
+
+    def __init__(
+        self, sock: socket.socket, buffer_size: int = 65536, max_frame_size: int = MAX_FRAME_SIZE
+    ):
+        self.sock = sock
+        self.buffer_size = buffer_size
+        self.max_frame_size = max_frame_size
+        # HELLO 協商壓縮後才接受 COMPRESSED_FLAG 的 frame
+        self.accept_compressed = False
+        self._allocate(buffer_size)
+        self._wanted = HEADER.size  # 下一個封包至少需要的 byte 數
+        self.recv_calls = 0
+        self.packets = 0
+
+    def _allocate(self, size: int):
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # 第一個尚未讀取的 byte
+        self._end = 0  # 已收到資料的結尾
+
+    def _frame_length(self):
+        """buffer 開頭的 frame 的 (body 長度, flags)，header 還沒收到時回傳 None"""
+        if self._end - self._start < HEADER.size:
+            return None
+        word = HEADER.unpack_from(self._buffer, self._start)[0]
+        return word & LENGTH_MASK, word & ~LENGTH_MASK
+
+    def _next_frame(self):
+        """切出下一個完整 frame，回傳 (flags, body 的 memoryview)；
+        資料還不完整時回傳 None"""
+        header = self._frame_length()
+        if header is None:
+            return None
+        length, flags = header
+        check_length(length, self.max_frame_size)
+        if self._end - self._start < HEADER.size + length:
+            self._wanted = HEADER.size + length
+            return None
+        begin = self._start + HEADER.size
+        self._start = begin + length
+        self._wanted = HEADER.size
+        self.packets += 1
+        return flags, self._view[begin : self._start]
+
+    def _make_room(self):
+        """把未讀的資料搬到 buffer 開頭，buffer 被未讀的資料填滿時放大為 4 倍
+
+        最多到下一個封包的大小。buffer 隨著實際收到的資料變大，只送出 header 的
+        peer 不會讓 reader 先配置一大塊記憶體。
+        """
+        pending = bytes(self._view[self._start : self._end])
+        size = len(self._buffer)
+        if len(pending) == size:
+            self._allocate(min(self._wanted, size * 4))
+        elif size > self.buffer_size and self._wanted <= self.buffer_size:
+            self._allocate(self.buffer_size)
+        else:
+            self._start = self._end = 0
+        self._buffer[: len(pending)] = pending
+        self._end = len(pending)
+
+    def _fill(self) -> int:
+        """從 socket 讀取資料接在 buffer 尾端，回傳讀到的 byte 數 (0 代表對方關閉連線)"""
+        if self._start == self._end:
+            # 沒有未讀的資料時從頭使用 buffer，讀完大封包後縮回原本的大小
+            if len(self._buffer) > self.buffer_size:
+                self._allocate(self.buffer_size)
+            self._start = self._end = 0
+        elif self._end == len(self._buffer) or (
+            self._start and self._start + self._wanted > len(self._buffer)
+        ):
+            self._make_room()
+        count = self.sock.recv_into(self._view[self._end :])
+        self.recv_calls += 1
+        self._end += count
+        return count
+
+    def has_packet(self) -> bool:
+        """buffer 中是否已經有完整的 frame，可以不等 socket 直接 read"""
+        header = self._frame_length()
+        return header is not None and self._end - self._start >= HEADER.size + header[0]
+
+    def read(self):
+        """讀取下一個 Packet 或 DataFrame；對方關閉連線時回傳 None，socket 錯誤
+        (例如逾時) 直接拋出"""
+        while True:
+            frame = self._next_frame()
+            if frame is not None:
+                flags, body = frame
+                if flags & DATA_FLAG:
+                    return DataFrame.decode(body)
+                if flags & COMPRESSED_FLAG:
+                    body = self._decompress(body)
+                return Packet.decode(body)
+            if not self._fill():
                 return None
-            json_str = body_bytes.decode("utf-8")
-            data_dict = json.loads(json_str)
 
-            return Packet(data_dict["type"], data_dict)
+    def _decompress(self, body) -> bytes:
+        if not self.accept_compressed:
+            raise FrameError("Compressed frame on a connection without compression")
+        return decompress(body, self.max_frame_size)
 
+    def receive(self):
+        """和 read 相同，但錯誤只會印出並回傳 None，對應 Packet.receive"""
+        try:
+            return self.read()
         except Exception as e:
             print(f"Error receiving packet: {e}")
             return None
 
+    def read_frames(self):
+        """recv 一次，回傳其中所有完整的 frame；對方關閉連線時回傳 None
+
+        封包回傳 body 的 bytes (已經解壓縮)，留給呼叫端 decode；DataFrame 回傳
+        payload 已經複製出來的 DataFrame。frame 不合法時拋出 FrameError。
+        給 selector 使用：只在 socket 可讀時呼叫，所以不會阻塞。
+        """
+        if not self._fill():
+            return None
+        frames = []
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return frames
+            flags, body = frame
+            if flags & DATA_FLAG:
+                frames.append(DataFrame.decode(bytes(body)))
+            elif flags & COMPRESSED_FLAG:
+                frames.append(self._decompress(body))
+            else:
+                frames.append(bytes(body))
+
+
+class Connection:
+    """server 端的一個連線：socket、PacketReader，以及 HELLO 協商出的 codec 與壓縮"""
+
+    def __init__(self, sock: socket.socket, codec=JSON_CODEC):
+        self.sock = sock
+        self.reader = PacketReader(sock)
+        self.codec = codec
+        self.compressor = None  # 協商不壓縮時為 None
+        self.request_id = None  # 正在處理的請求的編號，只由這個連線的 thread 設定
+        self._send_lock = threading.Lock()
+
+    def send(self, packet):
+        """回覆正在處理的請求"""
+        self.sendall(packet.to_bytes(self.codec, self.request_id, self.compressor))
+
+    def push(self, packet):
+        """主動送出不屬於任何請求的封包，可以由其他 thread 呼叫"""
+        self.sendall(packet.to_bytes(self.codec, compressor=self.compressor))
+
+    def sendall(self, data: bytes):
+        with self._send_lock:
+            self.sock.sendall(data)
+
+    def receive(self):
+        return self.reader.receive()
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def shutdown(self, how: int):
+        self.sock.shutdown(how)
+
+    def close(self):
+        self.sock.close()
+
 
 def recv_all(sock: socket.socket, n: int):
-    data = b""
-    while len(data) < n:
-        packet = sock.recv(n - len(data))
-        if not packet:
+    data = bytearray(n)
+    view = memoryview(data)
+    received = 0
+    while received < n:
+        count = sock.recv_into(view[received:])
+        if not count:
             return None
-        data += packet
+        received += count
     return data
@@ -1,3 +1,6 @@
+# Handshake Types
+T_HELLO = "HELLO"
+
 # Auth Types
 T_LOGIN = "LOGIN"
 T_REGISTER = "REGISTER"
@@ -13,6 +16,18 @@ T_LIST_ONLINE_USERS = "LIST_ONLINE_USERS"
 T_LIST_GAMES = "LIST_GAMES"
 T_GET_GAME_DETAIL = "GET_GAME_DETAIL"
 T_GAME_REVIEW = "GAME_REVIEW"
+T_LIST_GAME_REVIEWS = "LIST_GAME_REVIEWS"
+T_SEARCH_GAMES = "SEARCH_GAMES"
+T_LEADERBOARD = "LEADERBOARD"
+T_CATALOG_CHANGES = "CATALOG_CHANGES"
+
+# Database Types (lobby / developer server -> database server)
+T_DB_GET_GAME = "DB_GET_GAME"
+T_DB_RESERVE_GAME_ID = "DB_RESERVE_GAME_ID"
+T_DB_ADD_GAME_METADATA = "DB_ADD_GAME_METADATA"
+T_DB_UPDATE_GAME_METADATA = "DB_UPDATE_GAME_METADATA"
+T_DB_DELETE_GAME_METADATA = "DB_DELETE_GAME_METADATA"
+T_DB_INCREMENT_DOWNLOAD_COUNT = "DB_INCREMENT_DOWNLOAD_COUNT"
 
 
 # Room Types
@@ -39,6 +54,9 @@ T_UPDATE_GAME_INIT = "UPDATE_GAME_INIT"
 T_UPDATE_GAME_CHUNK = "UPDATE_GAME_CHUNK"
 T_UPDATE_GAME_FINISH = "UPDATE_GAME_FINISH"
 
+# Raw binary frame (common/packet.py DataFrame)
+T_DATA_FRAME = "DATA_FRAME"
+
 # Download Game Types
 T_DOWNLOAD_GAME_INIT = "DOWNLOAD_GAME_INIT"
 T_DOWNLOAD_GAME_CHUNK = "DOWNLOAD_GAME_CHUNK"
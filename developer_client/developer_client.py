@@ -23,7 +23,7 @@ from common.type import (
 )
 from common.Packet.developer_extra import DeleteGamePacket
 from common.log_utils import setup_logger
-from common.packet import Packet
+from common.packet import PacketReader, DataFrame, DATA_CHUNK_SIZE
 from pathlib import Path
 import os
 import json
@@ -42,10 +42,12 @@ class DeveloperClient:
         self.port = port
         self.logger = setup_logger("developer_client", "logs/developer_client.log")
         self.user_context = None
+        self.reader = None  # 連線後所有回覆都透過同一個 PacketReader 讀取
 
     def start(self):
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.connect((self.host, self.port))
+            self.reader = PacketReader(s)
             self.logger.info(f"Connected to lobby server at {self.host}:{self.port}")
             print("=" * 50)
             print("WELCOME TO THE LOBBY!".center(50))
@@ -72,7 +74,7 @@ class DeveloperClient:
                 print("DEBUG")
                 s.sendall(packet.to_bytes())
                 print("DEBUG")
-                reply = Packet.receive(s)
+                reply = self.reader.receive()
                 if reply is None:
                     self.logger.error("Failed to receive response from server")
                     return
@@ -90,7 +92,7 @@ class DeveloperClient:
                 password = input("Password: ").strip()
                 packet = DeveloperRegisterPacket(username, password)
                 s.sendall(packet.to_bytes())
-                reply = Packet.receive(s)
+                reply = self.reader.receive()
                 if reply is None:
                     self.logger.error("Failed to receive response from server")
                     return
@@ -136,7 +138,7 @@ class DeveloperClient:
     def handle_list_games(self, s: socket.socket):
         packet = ListDeveloperGamesPacket(self.user_context.username)
         s.sendall(packet.to_bytes())
-        reply = Packet.receive(s)
+        reply = self.reader.receive()
         if reply is None:
             self.logger.error("Failed to receive response from server")
             print("ERROR: Failed to receive response from server")
@@ -161,10 +163,9 @@ class DeveloperClient:
                     print(f"Version: {game['game_version']}")
                     print(f"Downloads: {game['download_count']}")
                     
-                    # Calculate average rating if comments exist
-                    if game['comments']:
-                        avg_rating = sum(c['rating'] for c in game['comments']) / len(game['comments'])
-                        print(f"Rating: {avg_rating:.1f}/5.0 ({len(game['comments'])} reviews)")
+                    # Rating aggregates are maintained by the database server
+                    if game.get('rating_count'):
+                        print(f"Rating: {game['average_rating']:.1f}/5.0 ({game['rating_count']} reviews)")
                     else:
                         print(f"Rating: No reviews yet")
                     
@@ -203,7 +204,7 @@ class DeveloperClient:
             )
             s.sendall(packet.to_bytes())
 
-            reply = Packet.receive(s)
+            reply = self.reader.receive()
             if (
                 not reply
                 or reply.type != T_UPLOAD_GAME_INIT
@@ -217,18 +218,15 @@ class DeveloperClient:
             upload_id = reply.data["upload_id"]
 
             # 2. Send Chunks
-            self._send_file_chunks(s, zip_path, upload_id, file_size, is_update=False)
+            file_hash = self._send_file_chunks(
+                s, zip_path, upload_id, file_size, False, reply.data.get("stream_id")
+            )
 
             # 3. Send Finish Packet
-            import hashlib
-
-            with open(zip_path, "rb") as f:
-                file_hash = hashlib.md5(f.read()).hexdigest()
-
             packet = UploadGameFinishPacket(upload_id, file_hash)
             s.sendall(packet.to_bytes())
 
-            reply = Packet.receive(s)
+            reply = self.reader.receive()
             self.logger.info(
                 f"Received reply: {reply.type if reply else 'None'} - {reply.data if reply else 'None'}"
             )
@@ -263,7 +261,7 @@ class DeveloperClient:
         # 先列出開發者的遊戲
         packet = ListDeveloperGamesPacket(self.user_context.username)
         s.sendall(packet.to_bytes())
-        reply = Packet.receive(s)
+        reply = self.reader.receive()
         
         if not reply or reply.type != T_LIST_DEVELOPER_GAMES or not reply.data["success"]:
             print("ERROR: Failed to retrieve your games")
@@ -349,7 +347,7 @@ class DeveloperClient:
             )
             s.sendall(packet.to_bytes())
 
-            reply = Packet.receive(s)
+            reply = self.reader.receive()
             if (
                 not reply
                 or reply.type != T_UPDATE_GAME_INIT
@@ -363,18 +361,15 @@ class DeveloperClient:
             upload_id = reply.data["upload_id"]
 
             # 2. Send Chunks
-            self._send_file_chunks(s, zip_path, upload_id, file_size, is_update=True)
+            file_hash = self._send_file_chunks(
+                s, zip_path, upload_id, file_size, True, reply.data.get("stream_id")
+            )
 
             # 3. Send Finish Packet
-            import hashlib
-
-            with open(zip_path, "rb") as f:
-                file_hash = hashlib.md5(f.read()).hexdigest()
-
             packet = UpdateGameFinishPacket(upload_id, file_hash)
             s.sendall(packet.to_bytes())
 
-            reply = Packet.receive(s)
+            reply = self.reader.receive()
             if reply and reply.type == T_UPDATE_GAME_FINISH and reply.data["success"]:
                 self.logger.info(reply.data["message"])
                 print("\n" + "=" * 50)
@@ -463,29 +458,35 @@ class DeveloperClient:
         upload_id: str,
         file_size: int,
         is_update: bool,
-    ):
+        stream_id: int = None,
+    ) -> str:
+        """傳送檔案內容並回傳 md5；有 stream_id 時以 DataFrame 傳送原始 bytes，
+        否則使用舊的 base64 CHUNK 封包"""
         import base64
-        import math
+        import hashlib
 
-        chunk_size = 4096  # 4KB chunks
-        total_chunks = math.ceil(file_size / chunk_size)
+        chunk_size = DATA_CHUNK_SIZE if stream_id is not None else 4096
+        file_hash = hashlib.md5()
         sent_bytes = 0
 
         with open(file_path, "rb") as f:
-            for i in range(total_chunks):
-                chunk = f.read(chunk_size)
-                encoded_chunk = base64.b64encode(chunk).decode("utf-8")
+            while chunk := f.read(chunk_size):
+                file_hash.update(chunk)
 
-                if is_update:
-                    packet = UpdateGameChunkPacket(upload_id, encoded_chunk)
+                if stream_id is not None:
+                    packet = DataFrame(stream_id, sent_bytes, chunk)
+                elif is_update:
+                    packet = UpdateGameChunkPacket(upload_id, base64.b64encode(chunk).decode("utf-8"))
                 else:
-                    packet = UploadGameChunkPacket(upload_id, encoded_chunk)
+                    packet = UploadGameChunkPacket(upload_id, base64.b64encode(chunk).decode("utf-8"))
 
                 s.sendall(packet.to_bytes())
 
                 sent_bytes += len(chunk)
                 self._print_progress_bar(sent_bytes, file_size)
 
+        return file_hash.hexdigest()
+
     def _print_progress_bar(self, current, total, length=50):
         percent = float(current) * 100 / total
         arrow = "-" * int(percent / 100 * length - 1) + ">"
@@ -503,7 +504,7 @@ class DeveloperClient:
         packet = DeleteGamePacket(game_id, self.user_context.username)
         s.sendall(packet.to_bytes())
 
-        reply = Packet.receive(s)
+        reply = self.reader.receive()
         if reply is None:
             self.logger.error("Failed to receive response from server")
             return
@@ -521,7 +522,7 @@ class DeveloperClient:
     def handle_logout(self, s: socket.socket):
         packet = DeveloperLogoutPacket(self.user_context.username)
         s.sendall(packet.to_bytes())
-        reply = Packet.receive(s)
+        reply = self.reader.receive()
         if reply is None:
             self.logger.error("Failed to receive response from server")
             return False
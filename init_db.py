@@ -2,7 +2,7 @@ import os
 import json
 
 data_dir = "server/database_server/data"
-files = ["users.json", "games.json", "developers.json"]
+files = ["users.json", "games.json", "developers.json", "reviews.json", "meta.json", "downloads.json"]
 
 if not os.path.exists(data_dir):
     os.makedirs(data_dir)
@@ -0,0 +1,22 @@
+import collections
+
+
+class ChangeFeed:
+    """最近 capacity 個 catalog 事件，seq 遞增；subscriber 記住最後的 seq，重新連線後接續取得"""
+
+    def __init__(self, capacity: int = 10000):
+        self.events = collections.deque(maxlen=capacity)
+        self.last_seq = 0
+
+    def append(self, event: str, game_id: str, **fields):
+        self.last_seq += 1
+        self.events.append({"seq": self.last_seq, "event": event, "game_id": game_id, **fields})
+
+    def since(self, seq: int, limit: int):
+        """seq 之後最多 limit 個事件；seq 之後的事件已經被丟掉時回傳 None"""
+        missing = self.last_seq - seq
+        if missing < 0 or missing > len(self.events):
+            return None
+        # 新的事件在 deque 尾端，從尾端往回算 index 不必走過整個 deque
+        start = len(self.events) - missing
+        return [self.events[i] for i in range(start, start + min(missing, limit))]
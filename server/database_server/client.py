@@ -0,0 +1,214 @@
+import queue
+import socket
+import threading
+
+from common.packet import Packet, PacketReader
+from common.type import (
+    T_LIST_GAMES,
+    T_GET_GAME_DETAIL,
+    T_LIST_GAME_REVIEWS,
+    T_SEARCH_GAMES,
+    T_LEADERBOARD,
+    T_CATALOG_CHANGES,
+    T_LIST_DEVELOPER_GAMES,
+    T_DB_GET_GAME,
+)
+from common.Packet.db import (
+    GetGamePacket,
+    ReserveGameIdPacket,
+    AddGameMetadataPacket,
+    UpdateGameMetadataPacket,
+    DeleteGameMetadataPacket,
+    IncrementDownloadCountPacket,
+)
+
+# 只讀取資料的 request，server 處理過後再重送一次也不會重複修改資料
+READ_ONLY = {
+    T_LIST_GAMES,
+    T_GET_GAME_DETAIL,
+    T_LIST_GAME_REVIEWS,
+    T_SEARCH_GAMES,
+    T_LEADERBOARD,
+    T_CATALOG_CHANGES,
+    T_LIST_DEVELOPER_GAMES,
+    T_DB_GET_GAME,
+}
+
+
+class DatabaseError(Exception):
+    """database request 無法完成，例如連不上、逾時或 server 處理失敗"""
+
+
+class DatabaseClient:
+    """透過 TCP 使用共用的 DatabaseServer
+
+    最多 pool_size 個連線重複使用，每個 request 在來回期間獨占一個連線；出錯或逾時的
+    連線直接關閉，不放回 pool。
+    """
+
+    def __init__(self, host: str, port: int, pool_size: int = 8, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._closed = False
+
+    def _acquire(self):
+        """取得一個連線的 PacketReader，回傳 (reader, 是否為 pool 中重用的連線)"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise DatabaseError("No database connection available")
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            pass
+        try:
+            conn = socket.create_connection((self.host, self.port), self.timeout)
+        except OSError as e:
+            self._slots.release()
+            raise DatabaseError(f"Cannot connect to database server: {e}")
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return PacketReader(conn), False
+
+    def _release(self, reader: PacketReader, reusable: bool):
+        if reusable and not self._closed:
+            self._idle.put(reader)
+        else:
+            reader.sock.close()
+        self._slots.release()
+
+    def _drain_idle(self):
+        while True:
+            try:
+                self._idle.get_nowait().sock.close()
+            except queue.Empty:
+                return
+
+    def pipeline(self, packets: list[Packet]) -> list[Packet]:
+        """在同一個連線上一次送出多個 request，再依序讀回 reply"""
+        payload = b"".join(packet.to_bytes() for packet in packets)
+        read_only = all(packet.type in READ_ONLY for packet in packets)
+        for attempt in range(2):
+            reader, reused = self._acquire()
+            replies = []
+            sent = False
+            try:
+                reader.sock.sendall(payload)
+                sent = True
+                for _ in packets:
+                    reply = reader.read()
+                    if reply is None:
+                        raise ConnectionResetError("Database server closed the connection")
+                    replies.append(reply)
+            except socket.timeout:
+                self._release(reader, False)
+                raise DatabaseError("Database server timed out")
+            except OSError as e:
+                self._release(reader, False)
+                # database server 重啟後 pool 裡的連線都失效了，換新連線重送一次。
+                # 送出後才失敗時 server 可能已經處理了 request，只有唯讀的 request 可以重送
+                if reused and not replies and attempt == 0 and (not sent or read_only):
+                    self._drain_idle()
+                    continue
+                raise DatabaseError(f"Database request failed: {e}")
+            except Exception:
+                self._release(reader, False)
+                raise
+            self._release(reader, True)
+            return replies
+
+    def request(self, packet: Packet) -> Packet:
+        return self.pipeline([packet])[0]
+
+    def close(self):
+        self._closed = True
+        self._drain_idle()
+
+    # Packets forwarded as-is from the lobby / developer clients
+
+    def handle_login(self, packet: Packet):
+        return self.request(packet)
+
+    def handle_register(self, packet: Packet):
+        return self.request(packet)
+
+    def handle_list_games(self, packet: Packet):
+        return self.request(packet)
+
+    def handle_get_game_detail(self, packet: Packet):
+        return self.request(packet)
+
+    def handle_game_review(self, packet: Packet):
+        return self.request(packet)
+
+    def handle_list_game_reviews(self, packet: Packet):
+        return self.request(packet)
+
+    def handle_search_games(self, packet: Packet):
+        return self.request(packet)
+
+    def handle_leaderboard(self, packet: Packet):
+        return self.request(packet)
+
+    def handle_catalog_changes(self, packet: Packet):
+        return self.request(packet)
+
+    def handle_developer_login(self, packet: Packet):
+        return self.request(packet)
+
+    def handle_developer_register(self, packet: Packet):
+        return self.request(packet)
+
+    def handle_list_developer_games(self, packet: Packet):
+        return self.request(packet)
+
+    # Game metadata
+
+    def get_game(self, game_id: str):
+        """取得單一遊戲資料，找不到時回傳 None"""
+        return self.request(GetGamePacket(game_id)).data.get("game")
+
+    def get_game_max_players(self, game_id: str):
+        game = self.get_game(game_id)
+        if game is not None:
+            return game["max_players"]
+        return 0
+
+    def get_game_name(self, game_id: str):
+        game = self.get_game(game_id)
+        if game is not None:
+            return game["game_name"]
+        return ""
+
+    def reserve_game_id(self):
+        return self.request(ReserveGameIdPacket()).data["game_id"]
+
+    def add_game_metadata(
+        self, username, game_name, game_description, game_version, max_players=2, game_id=None
+    ):
+        reply = self.request(
+            AddGameMetadataPacket(
+                username, game_name, game_description, game_version, max_players, game_id
+            )
+        )
+        if not reply.data["success"]:
+            raise DatabaseError(reply.data.get("message", "Failed to add game"))
+        return reply.data["game_id"]
+
+    def update_game_metadata(
+        self, game_id, game_version, game_name=None, game_description=None, max_players=None
+    ):
+        reply = self.request(
+            UpdateGameMetadataPacket(
+                game_id, game_version, game_name, game_description, max_players
+            )
+        )
+        return reply.data["success"]
+
+    def delete_game_metadata(self, game_id, username):
+        reply = self.request(DeleteGameMetadataPacket(game_id, username))
+        return reply.data["success"], reply.data.get("message", "")
+
+    def increment_download_count(self, game_id, game_version=None):
+        reply = self.request(IncrementDownloadCountPacket(game_id, game_version))
+        return reply.data["success"]
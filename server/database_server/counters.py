@@ -0,0 +1,48 @@
+import collections
+import itertools
+import threading
+
+
+class DownloadCounters:
+    """尚未寫入 store 的下載次數；每個 thread 寫自己的 shard，drain 一次取出全部"""
+
+    def __init__(self, shards: int = 16):
+        self._shards = [(threading.Lock(), collections.Counter()) for _ in range(shards)]
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._shards[next(self._next_shard) % len(self._shards)]
+            self._local.shard = shard
+        return shard
+
+    def add(self, game_id: str, game_version: str, day: str, count: int = 1):
+        lock, counter = self._shard()
+        with lock:
+            counter[(game_id, game_version, day)] += count
+
+    def pending(self) -> collections.Counter:
+        """所有 shard 合併後尚未寫入的下載次數，key 為 (game_id, game_version, day)"""
+        merged = collections.Counter()
+        for lock, counter in self._shards:
+            with lock:
+                merged.update(counter)
+        return merged
+
+    def pending_totals(self) -> collections.Counter:
+        """每個遊戲尚未寫入的下載次數"""
+        totals = collections.Counter()
+        for (game_id, _, _), count in self.pending().items():
+            totals[game_id] += count
+        return totals
+
+    def drain(self) -> collections.Counter:
+        """取出並清空目前累積的下載次數"""
+        merged = collections.Counter()
+        for lock, counter in self._shards:
+            with lock:
+                merged.update(counter)
+                counter.clear()
+        return merged
@@ -1,90 +1,417 @@
-import json
+import collections
+import heapq
 import os
-from datetime import datetime
+import selectors
 import socket
-from common.packet import Packet
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from common.packet import FrameError, Packet, PacketReader
 from common.type import (
     T_LOGIN,
     T_REGISTER,
-    T_LOGOUT,
-    T_LIST_ONLINE_USERS,
     T_LIST_GAMES,
     T_GET_GAME_DETAIL,
     T_GAME_REVIEW,
+    T_LIST_GAME_REVIEWS,
+    T_SEARCH_GAMES,
+    T_LEADERBOARD,
+    T_CATALOG_CHANGES,
     T_DEVELOPER_LOGIN,
     T_DEVELOPER_REGISTER,
-    T_DEVELOPER_LOGOUT,
     T_LIST_DEVELOPER_GAMES,
+    T_DB_GET_GAME,
+    T_DB_RESERVE_GAME_ID,
+    T_DB_ADD_GAME_METADATA,
+    T_DB_UPDATE_GAME_METADATA,
+    T_DB_DELETE_GAME_METADATA,
+    T_DB_INCREMENT_DOWNLOAD_COUNT,
 )
 from common.Packet.db import (
     DBLoginPacket,
     DBRegisterPacket,
-    DBLogoutPacket,
     DBListGamesPacket,
-    DBListOnlineUsersPacket,
     DBGameReviewPacket,
     DBGetGameDetailPacket,
+    DBListGameReviewsPacket,
+    DBSearchGamesPacket,
+    DBLeaderboardPacket,
+    DBCatalogChangesPacket,
     DBDeveloperLoginPacket,
     DBDeveloperRegisterPacket,
-    DBDeveloperLogoutPacket,
     ListDeveloperGamesPacket,
+    DBGetGamePacket,
+    DBReserveGameIdPacket,
+    DBAddGameMetadataPacket,
+    DBUpdateGameMetadataPacket,
+    DBDeleteGameMetadataPacket,
+    DBIncrementDownloadCountPacket,
 )
 from common.log_utils import setup_logger
+from .changefeed import ChangeFeed
+from .counters import DownloadCounters
+from .leaderboard import BOARDS, Leaderboard, name_key, rating_or_unrated_key
+from .search import SearchIndex
+from .storage import create_backend, lock_data_dir
+from .store import Store
+
+# 遊戲詳細資料中附帶的評論數，以及單次查詢評論的上限
+REVIEW_PAGE_SIZE = 5
+MAX_REVIEW_PAGE_SIZE = 50
+
+# 搜尋結果每頁的預設筆數與上限
+SEARCH_PAGE_SIZE = 10
+MAX_SEARCH_PAGE_SIZE = 50
+
+# 排行榜單次最多回傳的遊戲數
+LEADERBOARD_SIZE = 10
+MAX_LEADERBOARD_SIZE = 50
+
+# LIST_GAMES 有指定 limit 時單頁的上限
+MAX_LIST_PAGE_SIZE = 100
+
+# CATALOG_CHANGES 單次回傳的事件數，以及記憶體中保留的事件數
+CHANGE_BATCH_SIZE = 100
+MAX_CHANGE_BATCH_SIZE = 500
+CHANGE_FEED_CAPACITY = 10000
+
+# worker 回覆時 sendall 最多等待的秒數，避免不讀取回覆的 peer 卡住 worker
+SEND_TIMEOUT = 5.0
+# 每個連線 PacketReader 的 buffer 大小，一次 recv 最多讀取這麼多
+RECV_SIZE = 65536
+
+
+class ClientConnection:
+    """event loop 中的一個連線；busy 時由一個 worker 依序處理 pending 中的 request"""
+
+    def __init__(self, sock: socket.socket, addr):
+        self.sock = sock
+        self.addr = addr
+        self.reader = PacketReader(sock, RECV_SIZE)
+        self.pending = collections.deque()
+        self.busy = False
+        self.closed = False  # 不再處理 request 也不再回覆
+        self.registered = True  # 還在 selector 中；移除後 fd 才能關閉
+        self.lock = threading.Lock()
 
 
 class DatabaseServer:
-    def __init__(self, port: int = 12345, host: str = "140.113.17.13"):
+    def __init__(
+        self,
+        port: int = 12345,
+        host: str = "140.113.17.13",
+        compact_interval: float = 30.0,
+        compact_threshold: int = 1000,
+        backend: str = "json",
+        data_dir: str = None,
+        workers: int = 16,
+        commit_delay: float = 0.0,
+        max_batch: int = 256,
+        download_flush_interval: float = 1.0,
+    ):
+        """
+        Args:
+            backend: 儲存方式，"json" (snapshot + write-ahead log) 或 "sqlite"
+            data_dir: 資料目錄，預設為 server/database_server/data
+            workers: 同時處理 request 的 worker thread 數
+            commit_delay: group commit 最多等待幾秒收集更多寫入再一起 fsync
+            max_batch: group commit 單次最多寫入的 record 數
+            download_flush_interval: 每隔幾秒把累積的下載次數一次寫入資料庫
+        """
         self.port = port
         self.host = host
-        self.database = {
-            "user": os.path.join(os.path.dirname(__file__), "data/users.json"),
-            "game": os.path.join(os.path.dirname(__file__), "data/games.json"),
-            "developer": os.path.join(
-                os.path.dirname(__file__), "data/developers.json"
-            ),
-        }
+        self.workers = workers
+        self._stopped = threading.Event()
+        self.data_dir = data_dir or os.path.join(os.path.dirname(__file__), "data")
         self.logger = setup_logger("DatabaseServer", "./logs/database_server.log")
+        # 同一個資料目錄只能由一個 process 使用
+        self._dir_lock = lock_data_dir(self.data_dir)
+        # 資料只在啟動時讀取一次，之後以記憶體為準；修改交給 backend 持久化
+        self.store = Store(
+            create_backend(backend, self.data_dir),
+            compact_interval,
+            compact_threshold,
+            self.logger,
+            commit_delay,
+            max_batch,
+        )
+        self.logger.info(f"Using {backend} storage backend in {self.data_dir}")
+        self._migrate_account_records()
+        self._migrate_game_records()
+        self._migrate_game_id_sequence()
+        # catalog 的 ETag 是 "<epoch>.<game table 版本>"；版本號只存在記憶體，
+        # 每次啟動換一個 epoch，重啟前拿到的 ETag 就不會被誤認為沒有改變
+        self.catalog_epoch = uuid.uuid4().hex[:8]
+        # 以下的 change feed、搜尋 index 與排行榜本身都沒有 lock：一律在持有 store.lock
+        # 時修改，在持有 store.read_lock 時查詢
+        # 遊戲新增、修改、刪除與評論的事件，subscriber 以 seq 接續取得；seq 同樣只在
+        # 這個 epoch 內有效
+        self.changes = ChangeFeed(CHANGE_FEED_CAPACITY)
+
+        # 搜尋用的 index 只存在記憶體，啟動時建立，之後隨遊戲的新增、修改、刪除更新
+        self.search = SearchIndex()
+        # 排行榜同樣只存在記憶體，遊戲資料每次改變時更新該遊戲的位置
+        self.leaderboards = {name: Leaderboard(key) for name, key in BOARDS.items()}
+        # LIST_GAMES 可以使用的排序，None 表示依上架順序；能共用排行榜的就直接共用
+        self.list_orders = {
+            "game_id": None,
+            "name": Leaderboard(name_key, ascending=True),
+            "downloads": self.leaderboards["top_downloaded"],
+            "rating": Leaderboard(rating_or_unrated_key),
+            "newest": self.leaderboards["newest"],
+        }
+        self._rankings = [
+            *self.leaderboards.values(),
+            self.list_orders["name"],
+            self.list_orders["rating"],
+        ]
+        for game in self.store.values("game"):
+            self.search.add(game)
+            self._update_rankings(game)
+
+        # 下載次數先累積在記憶體，定期一次寫入，避免每次下載都寫一筆 record
+        self.downloads = DownloadCounters()
+        self.download_flush_interval = download_flush_interval
+        self._flush_stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def _migrate_account_records(self):
+        """移除舊資料中的 is_online，上線狀態改由各 server 的 PresenceRegistry 管理"""
+        with self.store.lock:
+            for name in ("user", "developer"):
+                for account in self.store.values(name):
+                    if "is_online" in account:
+                        account = dict(account)
+                        del account["is_online"]
+                        self.store.put(name, account)
+
+    def _migrate_game_records(self):
+        """把舊格式的遊戲資料轉成新格式
+
+        補上 rating_sum / rating_count / rating_histogram，並把內嵌在遊戲裡的
+        comments 搬到獨立的 review table。
+        """
+        with self.store.lock:
+            for game in self.store.values("game"):
+                if "rating_count" in game and "comments" not in game:
+                    continue
+                game = self.store.get_for_update("game", game["game_id"])
+                if "rating_count" not in game:
+                    game.update(empty_rating_aggregates())
+                    for comment in game.get("comments", []):
+                        add_rating(game, comment["rating"])
+                if "comments" in game:
+                    comments = game.pop("comments")
+                    game["review_seq"] = 0
+                    for comment in comments:
+                        game["review_seq"] += 1
+                        self.store.put(
+                            "review",
+                            {
+                                "review_id": review_key(game["game_id"], game["review_seq"]),
+                                "game_id": game["game_id"],
+                                "username": comment["username"],
+                                "rating": comment["rating"],
+                                "comment": comment["comment"],
+                                "created_at": "",
+                            },
+                        )
+                self._put_game(game)
+
+    def _migrate_game_id_sequence(self):
+        """舊資料沒有 game_id sequence 時，從現有遊戲的最大 ID 開始"""
+        with self.store.lock:
+            if self.store.get("meta", "game_id") is None:
+                last = max((int(game_id) for game_id in self.store.tables["game"]), default=0)
+                self.store.put("meta", {"name": "game_id", "value": last})
 
     def start(self):
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            s.bind((self.host, self.port))
-            s.listen()
-            self.logger.info(f"Database server listening on {self.host}:{self.port}")
-            while True:
-                conn, addr = s.accept()
-                with conn:
-                    self.logger.info(f"Connected by {addr}")
-                    while True:
-                        packet = Packet.receive(conn)
-                        if not packet:
-                            break
-                        reply = self.handle_packet(packet)
-                        conn.sendall(reply.to_bytes())
+        """以 selector 接收所有連線，完整的 request 交給固定大小的 worker pool 處理"""
+        self._selector = selectors.DefaultSelector()
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="db-worker")
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                s.bind((self.host, self.port))
+                s.listen(socket.SOMAXCONN)
+                s.setblocking(False)
+                self._selector.register(s, selectors.EVENT_READ)
+                self.logger.info(
+                    f"Database server listening on {self.host}:{self.port} "
+                    f"with {self.workers} workers"
+                )
+                while not self._stopped.is_set():
+                    for key, _ in self._selector.select(timeout=0.5):
+                        if key.data is None:
+                            self._accept(s)
+                        else:
+                            self._read(key.data)
+        finally:
+            self._pool.shutdown(wait=True)
+            for key in list(self._selector.get_map().values()):
+                if key.data is not None:
+                    key.data.sock.close()
+            self._selector.close()
+            self.close()
+
+    def stop(self):
+        """讓 start() 在下一次 select 逾時後結束"""
+        self._stopped.set()
+
+    def _accept(self, listener: socket.socket):
+        try:
+            conn, addr = listener.accept()
+        except BlockingIOError:
+            return
+        conn.settimeout(SEND_TIMEOUT)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._selector.register(
+            conn, selectors.EVENT_READ, ClientConnection(conn, addr)
+        )
+        self.logger.info(f"Connected by {addr}")
+
+    def _read(self, connection: ClientConnection):
+        """讀取已到達的資料，切出完整的封包；只在 selector 回報可讀時呼叫，不會阻塞"""
+        try:
+            requests = connection.reader.read_frames()
+        except (BlockingIOError, socket.timeout):
+            return
+        except FrameError as e:
+            # 只中斷這個 peer，selector thread 繼續服務其他連線
+            self.logger.error(f"Invalid frame from {connection.addr}: {e}")
+            requests = None
+        except OSError:
+            requests = None
+        if requests is None:
+            self._disconnect(connection)
+            return
+        if not requests:
+            return
+
+        with connection.lock:
+            if connection.closed:
+                return
+            connection.pending.extend(requests)
+            if connection.busy:
+                return
+            connection.busy = True
+        self._pool.submit(self._serve_next, connection)
+
+    def _serve_next(self, connection: ClientConnection):
+        """處理連線上的下一個 request；還有剩餘的 request 時重新排隊，讓各連線輪流使用 worker"""
+        with connection.lock:
+            if connection.closed or not connection.pending:
+                self._release(connection)
+                return
+            body = connection.pending.popleft()
+
+        reply = self._handle_request(body)
+        try:
+            connection.sock.sendall(reply.to_bytes())
+        except OSError as e:
+            # 逾時時 frame 可能只送出一部分，之後的回覆會讓對方讀錯位置，只能中斷連線。
+            # shutdown 讓 selector 讀到 EOF，由 _disconnect 把連線移出 selector
+            self.logger.info(f"Failed to reply to {connection.addr}: {e}")
+            with connection.lock:
+                connection.closed = True
+                connection.pending.clear()
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        with connection.lock:
+            if connection.closed or not connection.pending:
+                self._release(connection)
+                return
+        self._pool.submit(self._serve_next, connection)
+
+    def _release(self, connection: ClientConnection):
+        """worker 不再使用這個連線；呼叫時需持有 connection.lock"""
+        connection.busy = False
+        if connection.closed and not connection.registered:
+            connection.sock.close()
+
+    def _handle_request(self, body: bytes):
+        try:
+            packet = Packet.decode(body)
+        except Exception as e:
+            self.logger.error(f"Malformed packet: {e}")
+            return Packet("ERROR", {"success": False, "message": "Malformed packet"})
+        try:
+            reply = self.handle_packet(packet)
+            # 這個 request 的修改寫入磁碟後才回覆
+            self.store.sync()
+        except Exception as e:
+            self.logger.error(f"Failed to handle {packet.type}: {e}")
+            reply = None
+        if reply is None:
+            reply = Packet(
+                packet.type,
+                {"success": False, "message": f"Cannot handle {packet.type}"},
+            )
+        return reply
+
+    def _disconnect(self, connection: ClientConnection):
+        self._selector.unregister(connection.sock)
+        with connection.lock:
+            connection.closed = True
+            connection.registered = False
+            connection.pending.clear()
+            # worker 還在使用 socket 時由 worker 負責關閉，避免 fd 被重用後回覆寫錯連線
+            close_now = not connection.busy
+        if close_now:
+            connection.sock.close()
+        self.logger.info(f"Disconnected {connection.addr}")
+
+    def close(self):
+        """寫入累積的下載次數，把 log compaction 成 snapshot 後關閉"""
+        self._flush_stopped.set()
+        self._flusher.join()
+        self.flush_downloads()
+        self.store.close()
+        self._dir_lock.close()
+        self.logger.info("Database compacted to disk")
 
     def handle_packet(self, packet: Packet):
         if packet.type == T_LOGIN:
             return self.handle_login(packet)
         elif packet.type == T_REGISTER:
             return self.handle_register(packet)
-        elif packet.type == T_LOGOUT:
-            return self.handle_logout(packet)
-        elif packet.type == T_LIST_ONLINE_USERS:
-            return self.handle_list_online_users(packet)
         elif packet.type == T_LIST_GAMES:
             return self.handle_list_games(packet)
         elif packet.type == T_GET_GAME_DETAIL:
             return self.handle_get_game_detail(packet)
         elif packet.type == T_GAME_REVIEW:
             return self.handle_game_review(packet)
+        elif packet.type == T_LIST_GAME_REVIEWS:
+            return self.handle_list_game_reviews(packet)
+        elif packet.type == T_SEARCH_GAMES:
+            return self.handle_search_games(packet)
+        elif packet.type == T_LEADERBOARD:
+            return self.handle_leaderboard(packet)
+        elif packet.type == T_CATALOG_CHANGES:
+            return self.handle_catalog_changes(packet)
         elif packet.type == T_DEVELOPER_LOGIN:
             return self.handle_developer_login(packet)
         elif packet.type == T_DEVELOPER_REGISTER:
             return self.handle_developer_register(packet)
-        elif packet.type == T_DEVELOPER_LOGOUT:
-            return self.handle_developer_logout(packet)
         elif packet.type == T_LIST_DEVELOPER_GAMES:
             return self.handle_list_developer_games(packet)
+        elif packet.type == T_DB_GET_GAME:
+            return self.handle_get_game(packet)
+        elif packet.type == T_DB_RESERVE_GAME_ID:
+            return DBReserveGameIdPacket(True, self.reserve_game_id())
+        elif packet.type == T_DB_ADD_GAME_METADATA:
+            return self.handle_add_game_metadata(packet)
+        elif packet.type == T_DB_UPDATE_GAME_METADATA:
+            return self.handle_update_game_metadata(packet)
+        elif packet.type == T_DB_DELETE_GAME_METADATA:
+            return self.handle_delete_game_metadata(packet)
+        elif packet.type == T_DB_INCREMENT_DOWNLOAD_COUNT:
+            return self.handle_increment_download_count(packet)
         # elif packet.type == T_UPLOAD_GAME:
         #     return self.handle_upload_game(packet)
         # elif packet.type == T_UPDATE_GAME:
@@ -98,28 +425,21 @@ class DatabaseServer:
         if not username or not password:
             self.logger.info("Username or password is empty")
             return DBLoginPacket(False, "Username or password is empty")
-        with open(self.database["user"], "r") as f:
-            users = json.load(f)
-
-        for user in users:
-            if user["username"] == username:
-                if user["password"] != password:
-                    self.logger.info("Login failed - incorrect password")
-                    return DBLoginPacket(False, "Incorrect password")
-                # Check if already logged in
-                if user.get("is_online", False):
-                    self.logger.info(f"User {username} already logged in")
-                    return DBLoginPacket(False, "Account already logged in from another session")
-                # Login successful
-                user["is_online"] = True
-                user["last_login"] = datetime.now().isoformat()
-                with open(self.database["user"], "w") as f:
-                    json.dump(users, f, indent=2)
-                self.logger.info("Login successful")
-                return DBLoginPacket(True, "Login successful")
-
-        self.logger.info("Login failed - user not found")
-        return DBLoginPacket(False, "User not found")
+
+        with self.store.lock:
+            user = self.store.get_for_update("user", username)
+            if user is None:
+                self.logger.info("Login failed - user not found")
+                return DBLoginPacket(False, "User not found")
+            if user["password"] != password:
+                self.logger.info("Login failed - incorrect password")
+                return DBLoginPacket(False, "Incorrect password")
+            # 是否重複登入由呼叫端 server 的 PresenceRegistry 判斷
+            # Login successful
+            user["last_login"] = datetime.now().isoformat()
+            self.store.put("user", user)
+        self.logger.info("Login successful")
+        return DBLoginPacket(True, "Login successful")
 
     def handle_register(self, packet: Packet):
         username = packet.data["username"]
@@ -127,67 +447,209 @@ class DatabaseServer:
         if not username or not password:
             self.logger.info("Username or password is empty")
             return DBRegisterPacket(False, "Username or password is empty")
-        with open(self.database["user"], "r") as f:
-            users = json.load(f)
 
-        for user in users:
-            if user["username"] == username:
+        with self.store.lock:
+            if self.store.get("user", username) is not None:
                 self.logger.info("Username already exists")
                 return DBRegisterPacket(False, "Username already exists")
 
-        new_user = {
-            "username": username,
-            "password": password,
-            "is_online": False,
-            "last_login": "",
-            "created_at": datetime.now().isoformat(),
-            "role": "user",
-        }
-        users.append(new_user)
-
-        with open(self.database["user"], "w") as f:
-            json.dump(users, f, indent=2)
+            new_user = {
+                "username": username,
+                "password": password,
+                "last_login": "",
+                "created_at": datetime.now().isoformat(),
+                "role": "user",
+            }
+            self.store.put("user", new_user)
         self.logger.info("Register successful")
         return DBRegisterPacket(True, "Register successful")
 
-    def handle_logout(self, packet: Packet):
-        username = packet.data["username"]
-        with open(self.database["user"], "r") as f:
-            users = json.load(f)
+    # Handle Game Packets
 
-        for user in users:
-            if user["username"] == username:
-                user["is_online"] = False
-                with open(self.database["user"], "w") as f:
-                    json.dump(users, f, indent=2)
-                self.logger.info("Logout successful")
-                return DBLogoutPacket(True, "Logout successful")
+    def handle_list_games(self, packet: Packet):
+        """列出遊戲
 
-        self.logger.info("Username not found")
-        return DBLogoutPacket(False, "Username not found")
+        可以指定 sort (game_id / name / downloads / rating / newest)、offset、
+        limit 與只回傳部分欄位的 fields；沒有指定 limit 時回傳全部遊戲。
+        request 帶的 etag 與目前 catalog 相同時只回覆 not_modified。
+        """
+        sort = packet.data.get("sort") or "game_id"
+        if sort not in self.list_orders:
+            return DBListGamesPacket(False, [], message=f"Unknown sort key: {sort}")
+        offset = max(0, packet.data.get("offset") or 0)
+        limit = packet.data.get("limit")
+        if limit is not None:
+            limit = max(1, min(limit, MAX_LIST_PAGE_SIZE))
 
-    # Handle Game Packets
+        with self.store.read_lock:
+            etag = self.catalog_etag()
+            if packet.data.get("etag") == etag:
+                return DBListGamesPacket(True, [], etag=etag, not_modified=True)
+            order = self.list_orders[sort]
+            if order is None:
+                # 共用的 snapshot，切出一頁不需要複製整個 catalog
+                catalog = self.store.values("game")
+                total = len(catalog)
+                page = catalog[offset : offset + limit] if limit else catalog[offset:]
+            else:
+                total = len(order)
+                page = [
+                    self.store.get("game", game_id)
+                    for game_id in order.page(offset, limit or total)
+                ]
+            games = self._public_games(page)
 
-    def handle_list_games(self, packet: Packet):
-        with open(self.database["game"], "r") as f:
-            games = json.load(f)
+        fields = packet.data.get("fields")
+        if fields:
+            games = [project(game, fields) for game in games]
+        end = offset + len(games)
+        return DBListGamesPacket(True, games, total, end if end < total else None, etag=etag)
+
+    def _public_games(self, games):
+        """回傳加上 average_rating 與尚未寫入的下載次數的副本；呼叫時需持有 store.read_lock"""
+        pending = self.downloads.pending_totals()
+        result = []
         for game in games:
-            if not game["comments"]:
-                game["average_rating"] = 0
-            else:
-                game["average_rating"] = sum(
-                    comment["rating"] for comment in game["comments"]
-                ) / len(game["comments"])
-        return DBListGamesPacket(True, games)
+            game = with_average_rating(game)
+            game["download_count"] += pending[game["game_id"]]
+            result.append(game)
+        return result
 
     def handle_get_game_detail(self, packet: Packet):
         game_id = packet.data["game_id"]
-        with open(self.database["game"], "r") as f:
-            games = json.load(f)
+        # 遊戲資料與評論要來自同一個時間點，評分統計才會和評論一致
+        with self.store.read_lock:
+            stored = self.store.get("game", game_id)
+            if stored is None:
+                return DBGetGameDetailPacket(False, "Game not found")
+            # 評論與下載統計改變時都會一起寫入遊戲資料，revision 相同代表整份回覆都沒變
+            etag = str(stored.get("revision", 0))
+            if packet.data.get("etag") == etag:
+                return DBGetGameDetailPacket(True, None, etag, not_modified=True)
+            game = self._public_games([stored])[0]
+            # 只附上第一頁評論，其餘透過 LIST_GAME_REVIEWS 分頁取得
+            game["reviews"], game["reviews_cursor"] = self.get_reviews(
+                game_id, None, REVIEW_PAGE_SIZE
+            )
+            game["downloads_by_version"], game["downloads_by_day"] = (
+                self.get_download_stats(game_id)
+            )
+        return DBGetGameDetailPacket(True, game, etag)
+
+    def handle_list_game_reviews(self, packet: Packet):
+        game_id = packet.data["game_id"]
+        if self.store.get("game", game_id) is None:
+            return DBListGameReviewsPacket(False, [])
+        reviews, next_cursor = self.get_reviews(
+            game_id,
+            packet.data.get("cursor"),
+            packet.data.get("limit", REVIEW_PAGE_SIZE),
+        )
+        return DBListGameReviewsPacket(True, reviews, next_cursor)
+
+    def get_reviews(self, game_id: str, cursor, limit: int):
+        """由新到舊取得一頁評論
+
+        review_id 是 "<game_id>:<seq>"，seq 從 1 開始遞增，所以 cursor 就是
+        下一頁要開始的 seq，取一頁只需要 O(limit)。
+
+        Returns:
+            (reviews, next_cursor)，沒有更舊的評論時 next_cursor 為 None
+        """
+        with self.store.read_lock:
+            game = self.store.get("game", game_id)
+            if game is None:
+                return [], None
+            seq = game["review_seq"] if cursor is None else min(cursor, game["review_seq"])
+            limit = max(1, min(limit, MAX_REVIEW_PAGE_SIZE))
+            reviews = []
+            while seq > 0 and len(reviews) < limit:
+                review = self.store.get("review", review_key(game_id, seq))
+                if review is not None:
+                    reviews.append(dict(review))
+                seq -= 1
+        return reviews, (seq if seq > 0 else None)
+
+    def handle_search_games(self, packet: Packet):
+        games, total, next_offset = self.search_games(
+            packet.data.get("query", ""),
+            packet.data.get("offset", 0),
+            packet.data.get("limit", SEARCH_PAGE_SIZE),
+        )
+        return DBSearchGamesPacket(True, games, total, next_offset)
+
+    def search_games(self, query: str, offset: int, limit: int):
+        """以 search index 找出符合 query 的遊戲，依分數、下載次數排序後取一頁
+
+        只會讀取符合的遊戲，不需要掃描整個 catalog；取第 offset 頁只需要部分排序。
+
+        Returns:
+            (games, total, next_offset)，沒有下一頁時 next_offset 為 None
+        """
+        offset = max(0, offset)
+        limit = max(1, min(limit, MAX_SEARCH_PAGE_SIZE))
+        with self.store.read_lock:
+            scores = self.search.search(query)
+            ranked = heapq.nsmallest(
+                offset + limit,
+                scores,
+                key=lambda game_id: (
+                    -scores[game_id],
+                    -self.store.get("game", game_id)["download_count"],
+                    int(game_id),
+                ),
+            )[offset:]
+            games = self._public_games([self.store.get("game", game_id) for game_id in ranked])
         for game in games:
-            if game["game_id"] == game_id:
-                return DBGetGameDetailPacket(True, game)
-        return DBGetGameDetailPacket(False, "Game not found")
+            game["score"] = scores[game["game_id"]]
+        next_offset = offset + limit if offset + limit < len(scores) else None
+        return games, len(scores), next_offset
+
+    def handle_leaderboard(self, packet: Packet):
+        board = packet.data.get("board")
+        if board not in self.leaderboards:
+            return DBLeaderboardPacket(False, board, [], f"Unknown leaderboard: {board}")
+        limit = max(1, min(packet.data.get("limit", LEADERBOARD_SIZE), MAX_LEADERBOARD_SIZE))
+        with self.store.read_lock:
+            games = self._public_games(
+                [self.store.get("game", game_id) for game_id in self.leaderboards[board].top(limit)]
+            )
+        return DBLeaderboardPacket(True, board, games)
+
+    def handle_catalog_changes(self, packet: Packet):
+        """回傳 seq 之後的 catalog 事件
+
+        epoch 不同 (第一次訂閱或 server 重啟過) 或 seq 之後的事件已經不在記憶體時，
+        改為回傳整份 catalog 與目前的 seq，subscriber 重建 replica 後再從那裡接續。
+        """
+        since = packet.data.get("since") or 0
+        limit = max(1, min(packet.data.get("limit", CHANGE_BATCH_SIZE), MAX_CHANGE_BATCH_SIZE))
+        with self.store.read_lock:
+            events = None
+            if packet.data.get("epoch") == self.catalog_epoch:
+                events = self.changes.since(since, limit)
+            if events is None:
+                games = self._public_games(self.store.values("game"))
+                return DBCatalogChangesPacket(
+                    True, self.catalog_epoch, self.changes.last_seq, [], games=games
+                )
+            seq = events[-1]["seq"] if events else since
+            more = seq < self.changes.last_seq
+        return DBCatalogChangesPacket(True, self.catalog_epoch, seq, events, more)
+
+    def _put_game(self, game: dict):
+        """寫入遊戲資料並增加它的 revision；呼叫時需持有 store.lock"""
+        game["revision"] = game.get("revision", 0) + 1
+        self.store.put("game", game)
+
+    def catalog_etag(self):
+        """目前 catalog 的 ETag，任何遊戲改變後都會不同；呼叫時需持有 store.read_lock"""
+        return f"{self.catalog_epoch}.{self.store.version('game')}"
+
+    def _update_rankings(self, game: dict):
+        """遊戲資料改變後更新它在各排行榜與排序中的位置；呼叫時需持有 store.lock"""
+        for ranking in self._rankings:
+            ranking.update(game)
 
     def handle_game_review(self, packet: Packet):
         game_id = packet.data["game_id"]
@@ -195,131 +657,178 @@ class DatabaseServer:
         comment = packet.data["comment"]
         username = packet.data.get("username", "anonymous")
         
-        # Validate score
-        if not (1 <= score <= 5):
-            return DBGameReviewPacket(False, "Rating must be between 1 and 5")
+        # Validate score；評分統計的 histogram 只有 1 到 5 的整數 (bool 也不算)
+        if type(score) is not int or not (1 <= score <= 5):
+            return DBGameReviewPacket(False, "Rating must be an integer between 1 and 5")
         
-        with open(self.database["game"], "r") as f:
-            games = json.load(f)
-        for game in games:
-            if game["game_id"] == game_id:
-                game["comments"].append(
-                    {"username": username, "rating": score, "comment": comment}
-                )
-                with open(self.database["game"], "w") as f:
-                    json.dump(games, f, indent=2)
-                return DBGameReviewPacket(True, "Review submitted successfully")
-        return DBGameReviewPacket(False, "Game not found")
-
-    # Query
-
-    def handle_list_online_users(self, packet: Packet):
-        with open(self.database["user"], "r") as f:
-            users = json.load(f)
-        online_users = [user["username"] for user in users if user["is_online"]]
-        return DBListOnlineUsersPacket(True, online_users)
+        with self.store.lock:
+            game = self.store.get_for_update("game", game_id)
+            if game is None:
+                return DBGameReviewPacket(False, "Game not found")
+            # 先更新統計再寫入 review，失敗時不會留下沒有計入統計的 review
+            add_rating(game, score)
+            game["review_seq"] += 1
+            self.store.put(
+                "review",
+                {
+                    "review_id": review_key(game_id, game["review_seq"]),
+                    "game_id": game_id,
+                    "username": username,
+                    "rating": score,
+                    "comment": comment,
+                    "created_at": datetime.now().isoformat(),
+                },
+            )
+            self._put_game(game)
+            self._update_rankings(game)
+            self.changes.append(
+                "review_added",
+                game_id,
+                review=self.store.get("review", review_key(game_id, game["review_seq"])),
+                game=with_average_rating(game),
+            )
+        return DBGameReviewPacket(True, "Review submitted successfully")
 
     # Room handler
     # def handle_create_room(self, packet: Packet):
     #     return DBCreateRoomPacket(True, "Room created successfully")
 
+    def handle_get_game(self, packet: Packet):
+        game = self.get_game(packet.data["game_id"])
+        return DBGetGamePacket(game is not None, game)
+
+    def get_game(self, game_id: str):
+        """取得單一遊戲資料的副本，找不到時回傳 None"""
+        with self.store.read_lock:
+            game = self.store.get("game", game_id)
+            if game is None:
+                return None
+            return self._public_games([game])[0]
+
     def get_game_max_players(self, game_id: str):
-        with open(self.database["game"], "r") as f:
-            games = json.load(f)
-        for game in games:
-            if game["game_id"] == game_id:
-                return game["max_players"]
+        game = self.get_game(game_id)
+        if game is not None:
+            return game["max_players"]
         return 0
 
     def get_game_name(self, game_id: str):
         self.logger.info(f"Get game name: {game_id}")
-        with open(self.database["game"], "r") as f:
-            games = json.load(f)
-        for game in games:
-            self.logger.info(f"Game id: {game['game_id']}")
-            if game["game_id"] == game_id:
-                self.logger.info(f"Game name: {game['game_name']}")
-                return game["game_name"]
+        game = self.get_game(game_id)
+        if game is not None:
+            self.logger.info(f"Game name: {game['game_name']}")
+            return game["game_name"]
         return ""
 
     # handle developer auth
     def handle_developer_login(self, packet: Packet):
         username = packet.data["username"]
         password = packet.data["password"]
-        with open(self.database["developer"], "r") as f:
-            developers = json.load(f)
-        for developer in developers:
-            if developer["username"] == username:
-                if developer["password"] != password:
-                    self.logger.info("Login failed - incorrect password")
-                    return DBDeveloperLoginPacket(False, "Incorrect password")
-                # Check if already logged in
-                if developer.get("is_online", False):
-                    self.logger.info(f"Developer {username} already logged in")
-                    return DBDeveloperLoginPacket(False, "Account already logged in from another session")
-                # Login successful
-                developer["is_online"] = True
-                developer["last_login"] = datetime.now().isoformat()
-                with open(self.database["developer"], "w") as f:
-                    json.dump(developers, f, indent=2)
-                self.logger.info("Login successful")
-                return DBDeveloperLoginPacket(True, "Login successful")
-
-        self.logger.info("Login failed - developer not found")
-        return DBDeveloperLoginPacket(False, "Developer not found")
+        with self.store.lock:
+            developer = self.store.get_for_update("developer", username)
+            if developer is None:
+                self.logger.info("Login failed - developer not found")
+                return DBDeveloperLoginPacket(False, "Developer not found")
+            if developer["password"] != password:
+                self.logger.info("Login failed - incorrect password")
+                return DBDeveloperLoginPacket(False, "Incorrect password")
+            # 是否重複登入由呼叫端 server 的 PresenceRegistry 判斷
+            # Login successful
+            developer["last_login"] = datetime.now().isoformat()
+            self.store.put("developer", developer)
+        self.logger.info("Login successful")
+        return DBDeveloperLoginPacket(True, "Login successful")
 
     def handle_developer_register(self, packet: Packet):
         username = packet.data["username"]
         password = packet.data["password"]
-        with open(self.database["developer"], "r") as f:
-            developers = json.load(f)
-        for developer in developers:
-            if developer["username"] == username:
+        with self.store.lock:
+            if self.store.get("developer", username) is not None:
                 self.logger.info("Username already exists")
                 return DBDeveloperRegisterPacket(False, "Username already exists")
 
-        new_developer = {
-            "username": username,
-            "password": password,
-            "is_online": False,
-            "last_login": "",
-            "created_at": datetime.now().isoformat(),
-            "role": "developer",
-        }
-        developers.append(new_developer)
-
-        with open(self.database["developer"], "w") as f:
-            json.dump(developers, f, indent=2)
+            new_developer = {
+                "username": username,
+                "password": password,
+                "last_login": "",
+                "created_at": datetime.now().isoformat(),
+                "role": "developer",
+            }
+            self.store.put("developer", new_developer)
         self.logger.info("Register successful")
         return DBDeveloperRegisterPacket(True, "Register successful")
 
-    def handle_developer_logout(self, packet: Packet):
-        username = packet.data["username"]
-        with open(self.database["developer"], "r") as f:
-            developers = json.load(f)
-        for developer in developers:
-            if developer["username"] == username:
-                developer["is_online"] = False
-                with open(self.database["developer"], "w") as f:
-                    json.dump(developers, f, indent=2)
-                self.logger.info("Logout successful")
-                return DBDeveloperLogoutPacket(True, "Logout successful")
-
-        self.logger.info("Username not found")
-        return DBDeveloperLogoutPacket(False, "Username not found")
-
     def handle_list_developer_games(self, packet: Packet):
         username = packet.data["username"]
-        developer_games = []
-        with open(self.database["game"], "r") as f:
-            games = json.load(f)
-        for game in games:
-            if game["game_author"] == username:
-                developer_games.append(game)
+        with self.store.read_lock:
+            developer_games = self._public_games(
+                self.store.find("game", "game_author", username)
+            )
         return ListDeveloperGamesPacket(True, developer_games)
 
+    # Handle game metadata packets from the developer / lobby server
+
+    def handle_add_game_metadata(self, packet: Packet):
+        try:
+            game_id = self.add_game_metadata(
+                packet.data["username"],
+                packet.data["game_name"],
+                packet.data["game_description"],
+                packet.data["game_version"],
+                packet.data.get("max_players", 2),
+                packet.data.get("game_id"),
+            )
+        except ValueError as e:
+            self.logger.info(f"Add game failed: {e}")
+            return DBAddGameMetadataPacket(False)
+        return DBAddGameMetadataPacket(True, game_id)
+
+    def reserve_game_id(self):
+        """保留一個新的 game_id；保留過的 ID（包含已刪除遊戲的 ID）不會再被使用
+
+        ID 記在 meta 的 reserved_game_ids，直到 add_game_metadata 使用它。
+        """
+        with self.store.lock:
+            game_id = str(self.store.reserve("game_id"))
+            meta = self.store.get("meta", "reserved_game_ids")
+            reserved = meta["value"] if meta is not None else []
+            self.store.put("meta", {"name": "reserved_game_ids", "value": [*reserved, game_id]})
+        return game_id
+
+    def _claim_reserved_game_id(self, game_id):
+        """使用一個保留中的 game_id；呼叫時需持有 store.lock"""
+        meta = self.store.get("meta", "reserved_game_ids")
+        reserved = meta["value"] if meta is not None else []
+        if game_id not in reserved:
+            raise ValueError(f"Game ID {game_id} was not reserved")
+        self.store.put(
+            "meta",
+            {"name": "reserved_game_ids", "value": [i for i in reserved if i != game_id]},
+        )
+
+    def handle_update_game_metadata(self, packet: Packet):
+        updated = self.update_game_metadata(
+            packet.data["game_id"],
+            packet.data["game_version"],
+            packet.data.get("game_name"),
+            packet.data.get("game_description"),
+            packet.data.get("max_players"),
+        )
+        return DBUpdateGameMetadataPacket(updated)
+
+    def handle_delete_game_metadata(self, packet: Packet):
+        success, message = self.delete_game_metadata(
+            packet.data["game_id"], packet.data["username"]
+        )
+        return DBDeleteGameMetadataPacket(success, message)
+
+    def handle_increment_download_count(self, packet: Packet):
+        updated = self.increment_download_count(
+            packet.data["game_id"], packet.data.get("game_version")
+        )
+        return DBIncrementDownloadCountPacket(updated)
+
     def add_game_metadata(
-        self, username, game_name, game_description, game_version, max_players=2
+        self, username, game_name, game_description, game_version, max_players=2, game_id=None
     ):
         """添加遊戲元數據，自動生成數字 game_id
         
@@ -329,33 +838,33 @@ class DatabaseServer:
             game_description: 遊戲描述 (從 config.json 讀取)
             game_version: 遊戲版本 (從 config.json 讀取)
             max_players: 最大玩家數 (從 config.json 讀取)
+            game_id: 事先以 reserve_game_id 保留的 ID，None 時自動配發
         """
-        with open(self.database["game"], "r") as f:
-            games = json.load(f)
-
-        # 自動生成遞增的數字 ID
-        if games:
-            max_id = max(int(game["game_id"]) for game in games)
-            new_game_id = str(max_id + 1)
-        else:
-            new_game_id = "1"
-
-        new_game = {
-            "game_id": new_game_id,
-            "game_name": game_name,
-            "game_description": game_description,
-            "game_version": game_version,
-            "game_author": username,  # 使用上傳者的 username
-            "download_count": 0,
-            "comments": [],
-            "game_created_at": datetime.now().isoformat(),
-            "max_players": max_players,  # 從 config.json 讀取
-        }
-        games.append(new_game)
+        with self.store.lock:
+            if game_id is None:
+                new_game_id = str(self.store.reserve("game_id"))
+            else:
+                # 每個保留的 ID 只能用一次，已刪除遊戲的 ID 不在其中
+                self._claim_reserved_game_id(game_id)
+                new_game_id = game_id
+
+            new_game = {
+                "game_id": new_game_id,
+                "game_name": game_name,
+                "game_description": game_description,
+                "game_version": game_version,
+                "game_author": username,  # 使用上傳者的 username
+                "download_count": 0,
+                "review_seq": 0,
+                "game_created_at": datetime.now().isoformat(),
+                "max_players": max_players,  # 從 config.json 讀取
+                **empty_rating_aggregates(),
+            }
+            self._put_game(new_game)
+            self.search.add(new_game)
+            self._update_rankings(new_game)
+            self.changes.append("game_added", new_game_id, game=with_average_rating(new_game))
 
-        with open(self.database["game"], "w") as f:
-            json.dump(games, f, indent=2)
-        
         return new_game_id  # 返回生成的 ID
 
     def update_game_metadata(self, game_id, game_version, game_name=None, game_description=None, max_players=None):
@@ -367,56 +876,158 @@ class DatabaseServer:
             game_name: 遊戲名稱（可選，從 config.json 讀取）
             game_description: 遊戲描述（可選，從 config.json 讀取）
             max_players: 最大玩家數（可選，從 config.json 讀取）
-        """
-        with open(self.database["game"], "r") as f:
-            games = json.load(f)
 
-        for game in games:
-            if game["game_id"] == game_id:
-                game["game_version"] = game_version
-                # 如果提供了新的資訊，則更新
-                if game_name is not None:
-                    game["game_name"] = game_name
-                if game_description is not None:
-                    game["game_description"] = game_description
-                if max_players is not None:
-                    game["max_players"] = max_players
-                break
-
-        with open(self.database["game"], "w") as f:
-            json.dump(games, f, indent=2)
+        Returns:
+            遊戲不存在時回傳 False
+        """
+        with self.store.lock:
+            game = self.store.get_for_update("game", game_id)
+            if game is None:
+                return False
+            game["game_version"] = game_version
+            # 如果提供了新的資訊，則更新
+            if game_name is not None:
+                game["game_name"] = game_name
+            if game_description is not None:
+                game["game_description"] = game_description
+            if max_players is not None:
+                game["max_players"] = max_players
+            self._put_game(game)
+            self.search.add(game)
+            self._update_rankings(game)
+            self.changes.append("game_updated", game_id, game=with_average_rating(game))
+        return True
 
     def delete_game_metadata(self, game_id, username):
-        with open(self.database["game"], "r") as f:
-            games = json.load(f)
+        with self.store.lock:
+            game = self.store.get("game", game_id)
+            if game is None:
+                return False, "Game not found"
+            if game["game_author"] != username:
+                return False, "You are not the author of this game"
+            for seq in range(1, game["review_seq"] + 1):
+                self.store.delete("review", review_key(game_id, seq))
+            for record in self.store.find("download", "game_id", game_id):
+                self.store.delete("download", record["download_id"])
+            self.store.delete("game", game_id)
+            self.search.remove(game_id)
+            for ranking in self._rankings:
+                ranking.remove(game_id)
+            self.changes.append("game_deleted", game_id)
+        return True, "Game deleted successfully"
 
-        new_games = []
-        deleted = False
-        for game in games:
-            if game["game_id"] == game_id:
-                if game["game_author"] != username:
-                    return False, "You are not the author of this game"
-                deleted = True
-                continue
-            new_games.append(game)
+    def increment_download_count(self, game_id, game_version=None):
+        """增加遊戲的下載次數，遊戲不存在時回傳 False
 
-        if not deleted:
-            return False, "Game not found"
+        只累加在記憶體中的 counter，由背景 thread 定期以 flush_downloads 寫入；
+        查詢遊戲時會加上尚未寫入的次數。game_version 為下載的版本，預設為目前版本。
+        """
+        game = self.store.get("game", game_id)
+        if game is None:
+            return False
+        self.downloads.add(
+            game_id, game_version or game["game_version"], date.today().isoformat()
+        )
+        return True
 
-        with open(self.database["game"], "w") as f:
-            json.dump(new_games, f, indent=2)
+    def flush_downloads(self):
+        """把累積的下載次數一次寫入遊戲的 download_count 與每個版本、每天的統計
 
-        return True, "Game deleted successfully"
+        Returns:
+            寫入的下載次數
+        """
+        # 持有寫入 lock，查詢時不會同時看到已取出與已寫入的次數而重複計算
+        with self.store.lock:
+            counts = self.downloads.drain()
+            totals = {}
+            for (game_id, game_version, day), count in counts.items():
+                # 已刪除的遊戲不再記錄
+                if self.store.get("game", game_id) is None:
+                    continue
+                totals[game_id] = totals.get(game_id, 0) + count
+                key = download_key(game_id, game_version, day)
+                record = self.store.get_for_update("download", key) or {
+                    "download_id": key,
+                    "game_id": game_id,
+                    "game_version": game_version,
+                    "day": day,
+                    "count": 0,
+                }
+                record["count"] += count
+                self.store.put("download", record)
+            for game_id, count in totals.items():
+                game = self.store.get_for_update("game", game_id)
+                game["download_count"] = game.get("download_count", 0) + count
+                self._put_game(game)
+                self._update_rankings(game)
+                self.changes.append("downloads_flushed", game_id, game=with_average_rating(game))
+        flushed = sum(totals.values())
+        if flushed:
+            self.logger.debug(f"Flushed {flushed} downloads of {len(totals)} games")
+        return flushed
 
-    def increment_download_count(self, game_id):
-        """增加遊戲的下載次數"""
-        with open(self.database["game"], "r") as f:
-            games = json.load(f)
+    def _flush_loop(self):
+        while not self._flush_stopped.wait(self.download_flush_interval):
+            try:
+                self.flush_downloads()
+            except Exception as e:
+                self.logger.error(f"Failed to flush download counts: {e}")
+
+    def get_download_stats(self, game_id):
+        """每個版本與每天的下載次數（包含尚未寫入的次數）
+
+        Returns:
+            (by_version, by_day)，例如 ({"1.0.0": 3}, {"2025-11-25": 3})
+        """
+        by_version = collections.Counter()
+        by_day = collections.Counter()
+        with self.store.read_lock:
+            for record in self.store.find("download", "game_id", game_id):
+                by_version[record["game_version"]] += record["count"]
+                by_day[record["day"]] += record["count"]
+            for (pending_id, game_version, day), count in self.downloads.pending().items():
+                if pending_id == game_id:
+                    by_version[game_version] += count
+                    by_day[day] += count
+        return dict(by_version), dict(sorted(by_day.items()))
+
+def review_key(game_id: str, seq: int):
+    return f"{game_id}:{seq}"
+
+
+def project(game: dict, fields: list[str]):
+    """只保留指定的欄位，game_id 一定會保留"""
+    projected = {"game_id": game["game_id"]}
+    for field in fields:
+        if field in game:
+            projected[field] = game[field]
+    return projected
+
+
+def download_key(game_id: str, game_version: str, day: str):
+    return f"{game_id}:{game_version}:{day}"
+
+
+def empty_rating_aggregates():
+    return {
+        "rating_sum": 0,
+        "rating_count": 0,
+        "rating_histogram": {str(star): 0 for star in range(1, 6)},
+    }
+
+
+def add_rating(game: dict, rating: int):
+    """O(1) 更新遊戲的評分統計"""
+    game["rating_sum"] += rating
+    game["rating_count"] += 1
+    game["rating_histogram"][str(rating)] += 1
 
-        for game in games:
-            if game["game_id"] == game_id:
-                game["download_count"] = game.get("download_count", 0) + 1
-                break
 
-        with open(self.database["game"], "w") as f:
-            json.dump(games, f, indent=2)
+def with_average_rating(game: dict):
+    """回傳加上 average_rating 的副本，避免改到記憶體中的資料"""
+    game = dict(game)
+    if game["rating_count"]:
+        game["average_rating"] = game["rating_sum"] / game["rating_count"]
+    else:
+        game["average_rating"] = 0
+    return game
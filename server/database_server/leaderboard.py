@@ -0,0 +1,81 @@
+import bisect
+
+
+class Leaderboard:
+    """依 key 排序的遊戲，key 大的在前 (ascending 時相反)；key 為 None 的遊戲不列入"""
+
+    def __init__(self, key, ascending: bool = False):
+        self.key = key
+        self.ascending = ascending
+        self.order = []  # [(key, game_id)]，由小到大
+        self.keys = {}  # {game_id: key}
+
+    def update(self, game: dict):
+        game_id = game["game_id"]
+        key = self.key(game)
+        if self.keys.get(game_id) == key:
+            return
+        self.remove(game_id)
+        if key is not None:
+            self.keys[game_id] = key
+            bisect.insort(self.order, (key, game_id))
+
+    def remove(self, game_id: str):
+        key = self.keys.pop(game_id, None)
+        if key is None:
+            return
+        index = bisect.bisect_left(self.order, (key, game_id))
+        del self.order[index]
+
+    def top(self, k: int) -> list[str]:
+        """排名前 k 的 game_id，第一名在最前面"""
+        return self.page(0, k)
+
+    def page(self, offset: int, limit: int) -> list[str]:
+        """從第 offset 名開始的 limit 個 game_id"""
+        if self.ascending:
+            entries = self.order[offset : offset + limit]
+        else:
+            end = len(self.order) - offset
+            entries = reversed(self.order[max(end - limit, 0) : max(end, 0)])
+        return [game_id for _, game_id in entries]
+
+    def __len__(self):
+        return len(self.order)
+
+
+def download_key(game: dict):
+    # 下載次數相同時，較早上架 (ID 較小) 的在前
+    return (game["download_count"], -int(game["game_id"]))
+
+
+def rating_key(game: dict):
+    # 沒有評分的遊戲不列入；平均相同時評分人數多的在前
+    if not game["rating_count"]:
+        return None
+    return (
+        game["rating_sum"] / game["rating_count"],
+        game["rating_count"],
+        -int(game["game_id"]),
+    )
+
+
+def newest_key(game: dict):
+    return (game.get("game_created_at", ""), int(game["game_id"]))
+
+
+def name_key(game: dict):
+    return (game["game_name"].lower(), int(game["game_id"]))
+
+
+def rating_or_unrated_key(game: dict):
+    # 列出遊戲時沒有評分的遊戲也要出現，排在所有有評分的遊戲之後
+    return rating_key(game) or (-1, 0, -int(game["game_id"]))
+
+
+# 可查詢的排行榜
+BOARDS = {
+    "top_downloaded": download_key,
+    "top_rated": rating_key,
+    "newest": newest_key,
+}
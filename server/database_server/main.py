@@ -1,8 +1,20 @@
+import os
+import signal
+import sys
+
 from .database_server import DatabaseServer
 
 
 def main():
-    db_server = DatabaseServer(12345, "140.113.17.13")
+    # pkill 送出的 SIGTERM 轉成 SystemExit，讓 start() 的 finally 能把資料寫回磁碟
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # DB_BACKEND=sqlite 時改用 SQLite，預設為 JSON 檔
+    # DB_HOST / DB_PORT 需與 lobby server、developer server 的設定相同
+    db_server = DatabaseServer(
+        int(os.environ.get("DB_PORT", "12345")),
+        os.environ.get("DB_HOST", "140.113.17.13"),
+        backend=os.environ.get("DB_BACKEND", "json"),
+    )
     db_server.start()
 
 
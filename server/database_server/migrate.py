@@ -0,0 +1,51 @@
+"""把 JSON 資料庫 (snapshot + write-ahead log) 搬到 SQLite
+
+Usage:
+    python3 -m server.database_server.migrate [--data-dir DIR] [--sqlite PATH]
+"""
+
+import argparse
+import os
+
+from .storage import JsonBackend, SqliteBackend, lock_data_dir
+
+
+def migrate(data_dir: str, sqlite_path: str):
+    # database server 執行中時不能搬移
+    dir_lock = lock_data_dir(data_dir)
+    source = JsonBackend(data_dir)
+    target = SqliteBackend(sqlite_path)
+    try:
+        tables = source.load()
+        # 全部寫在同一個 transaction 中，中途失敗不會留下一半的資料
+        target.write(
+            [
+                {"op": "put", "table": name, "key": key, "value": value}
+                for name, table in tables.items()
+                for key, value in table.items()
+            ]
+        )
+    finally:
+        source.close()
+        target.close()
+        dir_lock.close()
+    return {name: len(table) for name, table in tables.items()}
+
+
+def main():
+    default_dir = os.path.join(os.path.dirname(__file__), "data")
+    parser = argparse.ArgumentParser(description="Migrate the JSON database to SQLite")
+    parser.add_argument("--data-dir", default=default_dir)
+    parser.add_argument("--sqlite", default=None, help="default: <data-dir>/database.sqlite3")
+    args = parser.parse_args()
+
+    sqlite_path = args.sqlite or os.path.join(args.data_dir, "database.sqlite3")
+    counts = migrate(args.data_dir, sqlite_path)
+    for name, count in counts.items():
+        print(f"{name}: {count} records")
+    print(f"Migrated to {sqlite_path}")
+    print("Start the database server with DB_BACKEND=sqlite to use it.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import re
+
+# 英文與數字以連續的一段為一個 token，其他文字 (例如中文) 每個字各是一個 token
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[^\W_]")
+
+# 排序用的分數
+NAME_PREFIX_SCORE = 100
+NAME_TOKEN_SCORE = 10
+NAME_TOKEN_PREFIX_SCORE = 5
+DESCRIPTION_TOKEN_SCORE = 3
+DESCRIPTION_TOKEN_PREFIX_SCORE = 1
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class PrefixTrie:
+    """字串對應到一組值，可以找出某個前綴下的所有值"""
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, key: str, value):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault(None, set()).add(value)
+
+    def remove(self, key: str, value):
+        path = [self.root]
+        for char in key:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        values = path[-1].get(None)
+        if not values:
+            return
+        values.discard(value)
+        if not values:
+            del path[-1][None]
+        # 刪掉已經沒有任何值的節點
+        for char, parent, node in zip(reversed(key), reversed(path[:-1]), reversed(path)):
+            if node:
+                break
+            del parent[char]
+
+    def values(self, prefix: str) -> set:
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        found = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char is None:
+                    found.update(child)
+                else:
+                    stack.append(child)
+        return found
+
+
+class SearchIndex:
+    """遊戲名稱與描述的 inverted index；query 的每個 token 都要完整或以前綴符合"""
+
+    def __init__(self):
+        self.postings = {}  # {token: {game_id: score}}
+        self.tokens = PrefixTrie()
+        self.names = PrefixTrie()
+        self.documents = {}  # {game_id: (lower-cased name, {token: score})}
+
+    def add(self, game: dict):
+        """加入或更新一個遊戲"""
+        game_id = game["game_id"]
+        self.remove(game_id)
+        name = game["game_name"].lower()
+        scores = {}
+        for token in tokenize(game.get("game_description", "")):
+            scores[token] = DESCRIPTION_TOKEN_SCORE
+        for token in tokenize(name):
+            scores[token] = NAME_TOKEN_SCORE
+        for token, score in scores.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                self.tokens.add(token, token)
+            posting[game_id] = score
+        self.names.add(name, game_id)
+        self.documents[game_id] = (name, scores)
+
+    def remove(self, game_id: str):
+        document = self.documents.pop(game_id, None)
+        if document is None:
+            return
+        name, scores = document
+        self.names.remove(name, game_id)
+        for token in scores:
+            posting = self.postings[token]
+            del posting[game_id]
+            if not posting:
+                del self.postings[token]
+                self.tokens.remove(token, token)
+
+    def _match_token(self, token: str, indexed_tokens: set) -> dict:
+        """回傳 {game_id: 分數}，完整符合的 token 分數較高"""
+        matches = {}
+        for indexed in indexed_tokens:
+            exact = indexed == token
+            for game_id, score in self.postings[indexed].items():
+                if not exact:
+                    score = prefix_score(score)
+                if score > matches.get(game_id, 0):
+                    matches[game_id] = score
+        return matches
+
+    def _match_document(self, game_id: str, token: str) -> int:
+        """token 在單一遊戲中的分數，不符合時為 0"""
+        scores = self.documents[game_id][1]
+        if token in scores:
+            return scores[token]
+        return max(
+            (prefix_score(score) for indexed, score in scores.items() if indexed.startswith(token)),
+            default=0,
+        )
+
+    def search(self, query: str) -> dict:
+        """回傳符合 query 的 {game_id: 分數}"""
+        query = query.strip().lower()
+        if not query:
+            return {}
+        # 每個 query token 可能符合的 indexed token，以 posting 大小估計符合的遊戲數
+        expansions = {token: self.tokens.values(token) for token in set(tokenize(query))}
+        scores = {}
+        if expansions:
+            # 從符合最少遊戲的 token 找出候選，其他 token 只檢查候選遊戲本身的
+            # token，常見的字不會讓查詢走訪大半個 catalog
+            first = min(
+                expansions,
+                key=lambda token: sum(len(self.postings[t]) for t in expansions[token]),
+            )
+            scores = self._match_token(first, expansions.pop(first))
+            for token in expansions:
+                narrowed = {}
+                for game_id, score in scores.items():
+                    matched = self._match_document(game_id, token)
+                    if matched:
+                        narrowed[game_id] = score + matched
+                scores = narrowed
+        for game_id in self.names.values(query):
+            scores[game_id] = scores.get(game_id, 0) + NAME_PREFIX_SCORE
+        return scores
+
+
+def prefix_score(score: int) -> int:
+    """只符合 token 開頭時的分數"""
+    if score == NAME_TOKEN_SCORE:
+        return NAME_TOKEN_PREFIX_SCORE
+    return DESCRIPTION_TOKEN_PREFIX_SCORE
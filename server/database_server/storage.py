@@ -0,0 +1,251 @@
+import fcntl
+import json
+import os
+import sqlite3
+
+from .wal import WriteAheadLog
+
+# 每個 table 的 primary key 欄位
+KEYS = {
+    "user": "username",
+    "developer": "username",
+    "game": "game_id",
+    "review": "review_id",
+    "meta": "name",
+    "download": "download_id",
+}
+
+
+def lock_data_dir(data_dir: str):
+    """以 flock 獨占資料目錄，避免兩個 process 同時修改同一份資料
+
+    回傳持有 lock 的檔案，關閉它即釋放；目錄已被其他 process 使用時拋出 RuntimeError。
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    f = open(os.path.join(data_dir, "LOCK"), "w")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        raise RuntimeError(f"{data_dir} is already in use by another database process")
+    return f
+
+
+def fsync_dir(path: str):
+    """確保目錄中的 rename / 新增檔案也寫入磁碟"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path: str, text: str):
+    """寫到 <path>.tmp 並 fsync，再以 rename 取代原檔；舊檔保留為 <path>.prev
+
+    任何時刻 crash，path / .tmp / .prev 之中至少有一個完整的檔案。
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    if os.path.exists(path):
+        os.replace(path, path + ".prev")
+    os.replace(tmp_path, path)
+    fsync_dir(os.path.dirname(path))
+
+
+def read_snapshot(path: str):
+    """依序嘗試 <path>.tmp、path、<path>.prev，回傳 (第一個完整的 JSON, 使用的檔案)
+
+    .tmp 只會由最近一次寫入產生，內容完整時一定比 path 新。
+    都不存在時回傳 ([], None)。
+    """
+    for candidate in (path + ".tmp", path, path + ".prev"):
+        if not os.path.exists(candidate):
+            continue
+        try:
+            with open(candidate, "r", encoding="utf-8") as f:
+                return json.load(f), candidate
+        except (OSError, ValueError):
+            continue
+    return [], None
+
+
+class StorageBackend:
+    """Store 背後的持久化方式
+
+    write 回傳時 batch 必須已經持久化；prepare_compaction 在 store lock 內執行，必須很快，
+    慢的部分放在不持有 lock 的 finish_compaction。
+    """
+
+    replayed_records = 0
+    # 啟動時的異常狀況（例如改用備份 snapshot），由 Store 寫進 log
+    recovery_notes = ()
+
+    def load(self) -> dict[str, dict[str, dict]]:
+        raise NotImplementedError
+
+    def write(self, records: list[dict]):
+        raise NotImplementedError
+
+    @property
+    def pending(self) -> int:
+        return 0
+
+    def prepare_compaction(self, tables: dict[str, dict[str, dict]]):
+        return None
+
+    def finish_compaction(self, prepared):
+        pass
+
+    def abort_compaction(self, prepared):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonBackend(StorageBackend):
+    """每個 table 一個 JSON snapshot，加上共用的 write-ahead log"""
+
+    FILES = {
+        "user": "users.json",
+        "developer": "developers.json",
+        "game": "games.json",
+        "review": "reviews.json",
+        "meta": "meta.json",
+        "download": "downloads.json",
+    }
+
+    def __init__(self, data_dir: str):
+        self.paths = {
+            name: os.path.join(data_dir, filename)
+            for name, filename in self.FILES.items()
+        }
+        self.log = WriteAheadLog(os.path.join(data_dir, "wal.log"))
+        self.dirty = set()
+        self._pending = 0
+
+    def load(self):
+        tables = {}
+        notes = []
+        for name, path in self.paths.items():
+            records, source = read_snapshot(path)
+            tables[name] = {record[KEYS[name]]: record for record in records}
+            if source is not None and source != path:
+                notes.append(f"Recovered {name} table from {os.path.basename(source)}")
+                write_atomic(path, json.dumps(records, indent=2))
+            elif source is None and os.path.exists(path):
+                # 不要以空 table 繼續執行，否則下一次 compaction 會覆蓋掉原本的資料
+                raise ValueError(f"Snapshot {path} is corrupted and has no usable backup")
+        self.recovery_notes = notes
+
+        self.replayed_records = 0
+        for record in self.log.replay():
+            table = tables[record["table"]]
+            if record["op"] == "put":
+                table[record["key"]] = record["value"]
+            elif record["op"] == "delete":
+                table.pop(record["key"], None)
+            self.dirty.add(record["table"])
+            self.replayed_records += 1
+        self._pending = self.replayed_records
+        return tables
+
+    def write(self, records):
+        self.log.append(records)
+        for record in records:
+            self.dirty.add(record["table"])
+        self._pending += len(records)
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def prepare_compaction(self, tables):
+        # 在 store lock 內取得 table 內容並切換 log segment，確保 snapshot 與 log 對齊；
+        # record 是 copy-on-write，淺複製 list 就夠了，序列化留到 finish_compaction
+        prepared = (
+            {name: list(tables[name].values()) for name in self.dirty},
+            self._pending,
+        )
+        self.log.rotate()
+        self.dirty.clear()
+        self._pending = 0
+        return prepared
+
+    def finish_compaction(self, prepared):
+        snapshots, _ = prepared
+        for name, records in snapshots.items():
+            path = self.paths[name]
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, json.dumps(records, indent=2))
+        # 所有 snapshot 都已經持久化，rotated segment 才可以丟掉
+        self.log.discard_rotated()
+
+    def abort_compaction(self, prepared):
+        # rotated segment 仍保留著，下次 compaction 時重新寫這些 table
+        snapshots, records = prepared
+        self.dirty.update(snapshots)
+        self._pending += records
+
+    def close(self):
+        self.log.close()
+
+
+class SqliteBackend(StorageBackend):
+    """WAL mode 的 SQLite，每個 table 一列一筆 record，每次 write 是一個 transaction"""
+
+    # 舊版為 game_author / game_id 建立的 index，沒有任何查詢使用，只會拖慢寫入
+    UNUSED_INDEXES = ("game_game_author", "review_game_id", "download_game_id")
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 寫入由 store 的 committer thread 進行，且與其他存取互斥，可以共用同一個連線
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        with self.conn:
+            for name in KEYS:
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} "
+                    f"(key TEXT PRIMARY KEY, data TEXT NOT NULL)"
+                )
+            for index in self.UNUSED_INDEXES:
+                self.conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+    def load(self):
+        tables = {}
+        for name in KEYS:
+            rows = self.conn.execute(f"SELECT key, data FROM {name} ORDER BY rowid")
+            tables[name] = {key: json.loads(data) for key, data in rows}
+        return tables
+
+    def write(self, records):
+        with self.conn:
+            for record in records:
+                name = record["table"]
+                if record["op"] == "put":
+                    # 使用 upsert 而不是 REPLACE，保留 rowid 讓列表順序不變
+                    self.conn.execute(
+                        f"INSERT INTO {name} (key, data) VALUES (?, ?) "
+                        f"ON CONFLICT(key) DO UPDATE SET data = excluded.data",
+                        (record["key"], json.dumps(record["value"])),
+                    )
+                elif record["op"] == "delete":
+                    self.conn.execute(
+                        f"DELETE FROM {name} WHERE key = ?", (record["key"],)
+                    )
+
+    def close(self):
+        self.conn.close()
+
+
+def create_backend(kind: str, data_dir: str) -> StorageBackend:
+    if kind == "json":
+        return JsonBackend(data_dir)
+    if kind == "sqlite":
+        return SqliteBackend(os.path.join(data_dir, "database.sqlite3"))
+    raise ValueError(f"Unknown storage backend: {kind}")
@@ -0,0 +1,390 @@
+import collections
+import copy
+import threading
+import time
+
+from .storage import KEYS, StorageBackend
+
+# 需要 secondary index 的欄位
+INDEXES = {
+    "game": ("game_author",),
+    "download": ("game_id",),
+}
+
+
+class SecondaryIndex:
+    """欄位值對應到擁有該值的 record key；記住每個 key 上次的值，才能從舊的 bucket 移除"""
+
+    def __init__(self, field: str):
+        self.field = field
+        self.buckets = {}
+        self.indexed = {}
+
+    def update(self, key: str, record: dict):
+        value = record.get(self.field)
+        if key in self.indexed and self.indexed[key] == value:
+            return
+        self.remove(key)
+        self.indexed[key] = value
+        self.buckets.setdefault(value, {})[key] = None
+
+    def remove(self, key: str):
+        if key not in self.indexed:
+            return
+        value = self.indexed.pop(key)
+        bucket = self.buckets[value]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[value]
+
+    def keys(self, value):
+        return list(self.buckets.get(value, ()))
+
+
+class ReadWriteLock:
+    """可以同時有多個 reader 或一個 writer；writer 可重入，有 writer 等待時新的 reader 排在後面"""
+
+    class _Side:
+        def __init__(self, acquire, release):
+            self.acquire = acquire
+            self.release = release
+
+        def __enter__(self):
+            self.acquire()
+            return self
+
+        def __exit__(self, *exc):
+            self.release()
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+        self.reader = self._Side(self.acquire_read, self.release_read)
+        self.writer = self._Side(self.acquire_write, self.release_write)
+
+    def acquire_read(self):
+        depth = getattr(self._local, "reads", 0)
+        with self._cond:
+            # 已經持有 lock 的 thread 不用排隊，否則會和等待中的 writer 互相卡住
+            if not depth and self._writer != threading.get_ident():
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+            self._readers += 1
+        self._local.reads = depth + 1
+
+    def release_read(self):
+        self._local.reads -= 1
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            if getattr(self._local, "reads", 0):
+                raise RuntimeError("Cannot upgrade a read lock to a write lock")
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        with self._cond:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+
+class CommitBatch:
+    """一起交給 backend.write 的 record；寫入完成或失敗後設定 done"""
+
+    def __init__(self):
+        self.records = []
+        self.done = threading.Event()
+        self.error = None
+
+
+class Store:
+    """記憶體中的資料庫，修改以 group commit 交給 StorageBackend 持久化
+
+    record 是 copy-on-write：修改時持有 lock，以 get_for_update 取得副本再 put 回去；
+    一次讀取多筆時持有 read_lock。get 與 values 不需要 lock。
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        compact_interval: float = 30.0,
+        compact_threshold: int = 1000,
+        logger=None,
+        commit_delay: float = 0.0,
+        max_batch: int = 256,
+    ):
+        self.backend = backend
+        self.compact_interval = compact_interval
+        self.compact_threshold = compact_threshold
+        self.logger = logger
+        self.commit_delay = commit_delay
+        self.max_batch = max_batch
+        rwlock = ReadWriteLock()
+        self.lock = rwlock.writer
+        self.read_lock = rwlock.reader
+
+        started = time.perf_counter()
+        self.tables = backend.load()
+        self.indexes = {
+            name: {field: SecondaryIndex(field) for field in INDEXES.get(name, ())}
+            for name in self.tables
+        }
+        for name, table in self.tables.items():
+            for index in self.indexes[name].values():
+                for key, value in table.items():
+                    index.update(key, value)
+        self.recovery_stats = {
+            "replayed_records": backend.replayed_records,
+            "seconds": time.perf_counter() - started,
+        }
+        if self.logger:
+            self.logger.info(
+                f"Recovered database: replayed {backend.replayed_records} log "
+                f"records in {self.recovery_stats['seconds'] * 1000:.1f} ms"
+            )
+            for note in backend.recovery_notes:
+                self.logger.warning(note)
+
+        # 每個 table 的版本號，values() 的 snapshot 在版本改變前都可以共用
+        self._versions = dict.fromkeys(self.tables, 0)
+        self._snapshots = {}
+
+        # backend 的寫入、compaction 準備都要互斥，但不需要持有 store lock
+        self._io_lock = threading.Lock()
+        self._batches = collections.deque([CommitBatch()])
+        self._batch_ready = threading.Condition()
+        self._local = threading.local()
+        self.commit_stats = {"records": 0, "batches": 0, "largest_batch": 0}
+        # 第一個寫入失敗的例外。batch 失敗時記憶體已經套用了它的 record，之後記憶體
+        # 與磁碟不一致，拒絕所有寫入與 compaction，直到重新啟動從磁碟載入
+        self.error = None
+
+        self._compact_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._committer = threading.Thread(target=self._commit_loop, daemon=True)
+        self._committer.start()
+        self._compactor = threading.Thread(target=self._compact_loop, daemon=True)
+        self._compactor.start()
+
+    def _apply(self, record: dict):
+        name = record["table"]
+        key = record["key"]
+        self._versions[name] += 1
+        if record["op"] == "put":
+            self.tables[name][key] = record["value"]
+            for index in self.indexes[name].values():
+                index.update(key, record["value"])
+        elif record["op"] == "delete":
+            self.tables[name].pop(key, None)
+            for index in self.indexes[name].values():
+                index.remove(key)
+
+    def _write(self, record: dict):
+        with self.lock:
+            if self.error is not None:
+                raise RuntimeError(f"Store is read-only after a failed write: {self.error}")
+            # put 之後 record 不會再被修改，排隊等待寫入時不需要複製
+            self._apply(record)
+            with self._batch_ready:
+                batch = self._batches[-1]
+                batch.records.append(record)
+                if len(batch.records) >= self.max_batch:
+                    self._batches.append(CommitBatch())
+                self._batch_ready.notify()
+        self._local.batch = batch
+
+    def sync(self):
+        """等待目前 thread 寫入的所有 record 都已持久化；寫入失敗時拋出例外"""
+        batch = self._local.__dict__.pop("batch", None)
+        if batch is None:
+            return
+        batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+
+    def _next_batch(self):
+        """取出下一個要寫入的 batch；已經 close 且沒有資料時回傳 None"""
+        with self._batch_ready:
+            while not self._batches[0].records:
+                if self._closed:
+                    return None
+                self._batch_ready.wait()
+            if self.commit_delay > 0 and not self._closed:
+                deadline = time.monotonic() + self.commit_delay
+                while len(self._batches) == 1 and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._batch_ready.wait(remaining)
+            batch = self._batches.popleft()
+            if not self._batches:
+                self._batches.append(CommitBatch())
+            return batch
+
+    def _commit_loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                if self.error is not None:
+                    # 前面的 batch 沒有寫入，這個 batch 的 record 可能建立在它之上
+                    raise self.error
+                with self._io_lock:
+                    self.backend.write(batch.records)
+                    pending = self.backend.pending
+                self.commit_stats["records"] += len(batch.records)
+                self.commit_stats["batches"] += 1
+                self.commit_stats["largest_batch"] = max(
+                    self.commit_stats["largest_batch"], len(batch.records)
+                )
+            except Exception as e:
+                batch.error = e
+                pending = 0
+                if self.error is None:
+                    with self.lock:
+                        self.error = e
+                    if self.logger:
+                        self.logger.error(
+                            f"Failed to persist {len(batch.records)} records, "
+                            f"rejecting writes until restart: {e}"
+                        )
+            batch.done.set()
+            if pending >= self.compact_threshold:
+                self._wakeup.set()
+
+    def commit_metrics(self):
+        """group commit 的統計：每次 fsync 寫入幾筆 record，以及省下的寫入次數"""
+        records = self.commit_stats["records"]
+        batches = self.commit_stats["batches"]
+        return {
+            "records": records,
+            "syncs": batches,
+            "syncs_saved": records - batches,
+            "records_per_sync": records / batches if batches else 0.0,
+            "largest_batch": self.commit_stats["largest_batch"],
+        }
+
+    def get(self, name: str, key: str):
+        """取得一筆資料；回傳的 dict 不可修改，要修改請用 get_for_update"""
+        return self.tables[name].get(key)
+
+    def get_for_update(self, name: str, key: str):
+        """取得一筆資料的私有副本，修改後再 put 回去；呼叫時需持有 lock"""
+        record = self.tables[name].get(key)
+        if record is None:
+            return None
+        return copy.deepcopy(record)
+
+    def version(self, name: str) -> int:
+        """table 的版本號，table 每次改變都會增加；重新啟動後從 0 開始"""
+        return self._versions[name]
+
+    def values(self, name: str):
+        """回傳 table 目前所有資料的 snapshot (tuple)，table 改變前的呼叫共用同一份"""
+        with self.read_lock:
+            version = self._versions[name]
+            cached = self._snapshots.get(name)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            snapshot = tuple(self.tables[name].values())
+            self._snapshots[name] = (version, snapshot)
+            return snapshot
+
+    def find(self, name: str, field: str, value):
+        """透過 secondary index 找出 field 等於 value 的所有資料"""
+        with self.read_lock:
+            table = self.tables[name]
+            return [table[key] for key in self.indexes[name][field].keys(value)]
+
+    def put(self, name: str, value: dict):
+        """新增或覆寫一筆資料，並交給 backend 持久化"""
+        self._write(
+            {"op": "put", "table": name, "key": value[KEYS[name]], "value": value}
+        )
+
+    def delete(self, name: str, key: str):
+        """刪除一筆資料，並交給 backend 持久化"""
+        self._write({"op": "delete", "table": name, "key": key})
+
+    def reserve(self, sequence: str, count: int = 1):
+        """從持久化的 sequence 保留 count 個連續的值並回傳第一個
+
+        保留過的值不會再被發出，即使之後沒有被使用。sequence 的 record 比使用
+        它的 record 先進入 log，所以持久化的資料不可能用到尚未保留的值。
+        """
+        with self.lock:
+            meta = self.get("meta", sequence)
+            last = meta["value"] if meta is not None else 0
+            self.put("meta", {"name": sequence, "value": last + count})
+            return last + 1
+
+    def compact(self):
+        """讓 backend 把目前的資料整理成新的 snapshot"""
+        with self._compact_lock:
+            # 記憶體中還沒寫入 log 的 record 也會進到 snapshot，之後再寫進新的
+            # log segment；record 都是 idempotent，重播時不會出錯
+            with self.lock, self._io_lock:
+                records = self.backend.pending
+                # 寫入失敗後記憶體中有沒有持久化的修改，不能寫進 snapshot
+                if not records or self.error is not None:
+                    return
+                prepared = self.backend.prepare_compaction(self.tables)
+
+            try:
+                self.backend.finish_compaction(prepared)
+            except Exception:
+                with self.lock, self._io_lock:
+                    self.backend.abort_compaction(prepared)
+                raise
+            if self.logger:
+                self.logger.debug(f"Compacted {records} log records")
+
+    def _compact_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.compact_interval)
+            self._wakeup.clear()
+            try:
+                self.compact()
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Background compaction failed: {e}")
+
+    def close(self):
+        if self._closed:
+            return
+        with self._batch_ready:
+            self._closed = True
+            self._batch_ready.notify()
+        # committer 會先把排隊中的 record 都寫完才結束
+        self._committer.join()
+        self._wakeup.set()
+        self._compactor.join()
+        self.compact()
+        self.backend.close()
+        if self.logger:
+            metrics = self.commit_metrics()
+            self.logger.info(
+                f"Group commit: {metrics['records']} records in {metrics['syncs']} "
+                f"syncs ({metrics['records_per_sync']:.1f} per sync, "
+                f"{metrics['syncs_saved']} syncs saved)"
+            )
@@ -0,0 +1,75 @@
+import json
+import os
+
+
+class WriteAheadLog:
+    """append-only 的修改 log，一行一筆 JSON record；snapshot 寫完後才 discard_rotated"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rotated_path = path + ".old"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, records: list[dict]):
+        """一次寫入多筆 record，只做一次 fsync"""
+        self._file.write(
+            "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def replay(self):
+        """依序讀出 rotated segment 與目前 segment 中的所有 record
+
+        crash 時最後一行可能只寫了一半，該行與之後的內容都不可信，讀完後從檔案截掉；
+        否則重啟後 append 的 record 會接在壞掉的那一行後面，下一次 replay 時一起遺失。
+        """
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            good = 0  # 最後一筆完整 record 的結尾
+            with open(path, "rb") as f:
+                for line in f:
+                    # 沒有換行的最後一行也可能只寫了一半，即使能 parse 也不採用
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    good += len(line)
+                    yield record
+            if good < os.path.getsize(path):
+                truncate(path, good)
+
+    def rotate(self):
+        self._file.close()
+        if os.path.exists(self.rotated_path):
+            # 上一次 compaction 沒有完成，把目前的 segment 接在後面
+            with open(self.path, "r", encoding="utf-8") as src, open(
+                self.rotated_path, "a", encoding="utf-8"
+            ) as dst:
+                dst.write(src.read())
+                # 目前 segment 的內容確定寫入 .old 之後才可以刪除
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.rotated_path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def discard_rotated(self):
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def close(self):
+        self._file.close()
+
+
+def truncate(path: str, size: int):
+    """把檔案截到 size bytes 並 fsync"""
+    with open(path, "r+b") as f:
+        f.truncate(size)
+        f.flush()
+        os.fsync(f.fileno())
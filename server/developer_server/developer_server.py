@@ -1,5 +1,7 @@
+from common.context.userContext import UserContext
+from common.context.presenceRegistry import PresenceRegistry
 from common.log_utils import setup_logger
-from common.packet import Packet
+from common.packet import Packet, PacketReader
 from common.type import (
     T_DEVELOPER_LOGIN,
     T_DEVELOPER_REGISTER,
@@ -13,18 +15,30 @@ from common.type import (
     T_UPDATE_GAME_CHUNK,
     T_UPDATE_GAME_FINISH,
     T_DELETE_GAME,
+    T_DATA_FRAME,
 )
-from ..database_server.database_server import DatabaseServer
+from common.Packet.db import DBDeveloperLoginPacket, DBDeveloperLogoutPacket
+from ..database_server.client import DatabaseClient, DatabaseError
+import itertools
 import socket
 
 
 class DeveloperServer:
-    def __init__(self, host: str, port: int):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        db_host: str = "140.113.17.13",
+        db_port: int = 12345,
+    ):
         self.host = host
         self.port = port
         self.logger = setup_logger("developer_server", "logs/developer_server.log")
-        self.user_context = []
-        self.database_server = DatabaseServer()
+        self.presence = PresenceRegistry()  # 線上開發者，只存在記憶體
+        self.database_server = DatabaseClient(db_host, db_port)
+        # 上傳的檔案內容以 DataFrame 傳送，stream id 在 INIT 時分配
+        self.upload_streams = {}  # {stream_id: upload_id}
+        self._stream_ids = itertools.count(1)
 
     def start(self):
         server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -39,37 +53,42 @@ class DeveloperServer:
         finally:
             # 服務器關閉時登出所有開發者
             self.logger.info("Developer server shutting down, logging out all developers...")
-            for user in self.user_context[:]:
-                try:
-                    from common.Packet.developer import DeveloperLogoutPacket
-                    logout_packet = DeveloperLogoutPacket(user.username)
-                    self.database_server.handle_developer_logout(logout_packet)
-                    self.logger.info(f"Logged out developer: {user.username}")
-                except Exception as e:
-                    self.logger.error(f"Failed to logout developer {user.username}: {e}")
-            self.user_context.clear()
+            for user in self.presence.clear():
+                self.logger.info(f"Logged out developer: {user.username}")
+            self.database_server.close()
             server.close()
             self.logger.info("Developer server shutdown complete")
 
     def _handle_client(self, client: socket.socket, addr: tuple[str, int]):
         self.logger.info(f"Client connected: {addr}")
         current_username = None
+        reader = PacketReader(client)
         try:
             while True:
-                packet = Packet.receive(client)
+                packet = reader.receive()
                 if packet is None:
                     self.logger.info(f"Client disconnected: {addr}")
                     break
-                
-                # 記錄當前開發者用戶名（用於斷線時登出）
-                if packet.type == T_DEVELOPER_LOGIN and packet.data.get("username"):
-                    current_username = packet.data["username"]
-                
-                self._handle_packet(client, addr, packet)
+
+                try:
+                    self._handle_packet(client, addr, packet)
+                except DatabaseError as e:
+                    self.logger.error(f"Database request for {packet.type} failed: {e}")
+                    reply = Packet(
+                        packet.type,
+                        {"success": False, "message": "Database server unavailable"},
+                    )
+                    client.sendall(reply.to_bytes())
+
+                # 記錄當前開發者用戶名（用於斷線時登出），只記錄由這個連線登入成功的帳號
+                if packet.type == T_DEVELOPER_LOGIN:
+                    session = self.presence.get(packet.data.get("username"))
+                    if session is not None and session.socket is client:
+                        current_username = session.username
         finally:
             # 開發者斷線時自動登出
             if current_username:
-                self._handle_developer_disconnect(current_username)
+                self._handle_developer_disconnect(current_username, client)
             client.close()
             self.logger.info(f"Client disconnected: {addr}")
 
@@ -77,13 +96,25 @@ class DeveloperServer:
         self, client: socket.socket, addr: tuple[str, int], packet: Packet
     ):
         if packet.type == T_DEVELOPER_LOGIN:
-            reply = self.database_server.handle_developer_login(packet)
+            username = packet.data["username"]
+            reply = self.presence.login(
+                UserContext(username, client),
+                lambda: self.database_server.handle_developer_login(packet),
+            )
+            if reply is None:
+                self.logger.info(f"Developer {username} already logged in")
+                reply = DBDeveloperLoginPacket(
+                    False, "Account already logged in from another session"
+                )
             client.sendall(reply.to_bytes())
         elif packet.type == T_DEVELOPER_REGISTER:
             reply = self.database_server.handle_developer_register(packet)
             client.sendall(reply.to_bytes())
         elif packet.type == T_DEVELOPER_LOGOUT:
-            reply = self.database_server.handle_developer_logout(packet)
+            if self.presence.release(packet.data["username"], client):
+                reply = DBDeveloperLogoutPacket(True, "Logout successful")
+            else:
+                reply = DBDeveloperLogoutPacket(False, "Developer is not logged in")
             client.sendall(reply.to_bytes())
         elif packet.type == T_LIST_DEVELOPER_GAMES:
             reply = self.database_server.handle_list_developer_games(packet)
@@ -105,6 +136,10 @@ class DeveloperServer:
             reply = self._handle_update_game_chunk(client, addr, packet)
             if reply:
                 client.sendall(reply.to_bytes())
+        elif packet.type == T_DATA_FRAME:
+            reply = self._handle_upload_data(client, addr, packet)
+            if reply:
+                client.sendall(reply.to_bytes())
         elif packet.type == T_UPDATE_GAME_FINISH:
             reply = self._handle_update_game_finish(client, addr, packet)
             client.sendall(reply.to_bytes())
@@ -144,13 +179,21 @@ class DeveloperServer:
             "temp_file_path": temp_file_path,
             "received_bytes": 0,
             "is_update": False,
+            "stream_id": self._open_stream(upload_id),
         }
 
         # Create empty file
         with open(temp_file_path, "wb") as f:
             pass
 
-        return Packet(T_UPLOAD_GAME_INIT, {"success": True, "upload_id": upload_id})
+        return Packet(
+            T_UPLOAD_GAME_INIT,
+            {
+                "success": True,
+                "upload_id": upload_id,
+                "stream_id": self.active_uploads[upload_id]["stream_id"],
+            },
+        )
 
     def _handle_upload_game_chunk(self, client, addr, packet):
         import base64
@@ -176,6 +219,39 @@ class DeveloperServer:
             self.logger.error(f"Chunk upload failed: {e}")
             return Packet(T_UPLOAD_GAME_CHUNK, {"success": False, "message": str(e)})
 
+    def _open_stream(self, upload_id: str) -> int:
+        """為上傳分配 DataFrame 使用的 stream id"""
+        stream_id = next(self._stream_ids)
+        self.upload_streams[stream_id] = upload_id
+        return stream_id
+
+    def _handle_upload_data(self, client, addr, frame):
+        """把 DataFrame 的內容直接寫入上傳中的暫存檔，不需要 decode"""
+        upload_id = self.upload_streams.get(frame.stream_id)
+        if upload_id is None:
+            return Packet(
+                T_UPLOAD_GAME_CHUNK, {"success": False, "message": "Invalid stream ID"}
+            )
+
+        context = self.active_uploads[upload_id]
+        if frame.offset != context["received_bytes"]:
+            return Packet(
+                T_UPLOAD_GAME_CHUNK,
+                {
+                    "success": False,
+                    "message": f"Expected offset {context['received_bytes']}, got {frame.offset}",
+                },
+            )
+
+        try:
+            with open(context["temp_file_path"], "ab") as f:
+                f.write(frame.payload)
+            context["received_bytes"] += len(frame.payload)
+            return None
+        except OSError as e:
+            self.logger.error(f"Chunk upload failed: {e}")
+            return Packet(T_UPLOAD_GAME_CHUNK, {"success": False, "message": str(e)})
+
     def _handle_upload_game_finish(self, client, addr, packet):
         import os
         import shutil
@@ -267,18 +343,11 @@ class DeveloperServer:
             game_version = config.get("game_version", "1.0.0")
             max_players = config.get("max_players", 2)
 
-            # 先添加遊戲到數據庫以獲取系統生成的 game_id
-            # 使用上傳者的 username 作為 game_author
+            # 先保留 game_id，檔案放到 storage 之後才寫入遊戲資料，
+            # 避免玩家看到遊戲時檔案還不存在；保留的 ID 不會被重複使用
             try:
-                self.logger.info(f"Adding game metadata to get ID")
-                game_id = self.database_server.add_game_metadata(
-                    context["username"],  # 使用上傳者的 username
-                    game_name,  # 從 config.json 讀取
-                    game_description,  # 從 config.json 讀取
-                    game_version,  # 從 config.json 讀取
-                    max_players,  # 從 config.json 讀取
-                )
-                self.logger.info(f"Generated game_id: {game_id}")
+                game_id = self.database_server.reserve_game_id()
+                self.logger.info(f"Reserved game_id: {game_id}")
             except Exception as e:
                 self.logger.error(f"DB update failed: {e}")
                 shutil.rmtree(temp_extract_dir)
@@ -287,10 +356,9 @@ class DeveloperServer:
                     {"success": False, "message": f"Database error: {str(e)}"},
                 )
 
-            # Storage Path (使用生成的數字 ID)
-            storage_dir = os.path.join(
-                os.path.dirname(__file__), f"../storage/{game_id}/{game_version}"
-            )
+            # Storage Path (使用保留的數字 ID)
+            game_dir = os.path.join(os.path.dirname(__file__), f"../storage/{game_id}")
+            storage_dir = os.path.join(game_dir, game_version)
             if os.path.exists(storage_dir):
                 shutil.rmtree(storage_dir)
             os.makedirs(storage_dir)
@@ -306,11 +374,29 @@ class DeveloperServer:
 
             shutil.rmtree(temp_extract_dir)
 
-            # 元數據已經在上面添加了，這裡不需要再次添加
+            # 使用上傳者的 username 作為 game_author
+            try:
+                self.database_server.add_game_metadata(
+                    context["username"],  # 使用上傳者的 username
+                    game_name,  # 從 config.json 讀取
+                    game_description,  # 從 config.json 讀取
+                    game_version,  # 從 config.json 讀取
+                    max_players,  # 從 config.json 讀取
+                    game_id,
+                )
+            except Exception as e:
+                self.logger.error(f"DB update failed: {e}")
+                shutil.rmtree(game_dir, ignore_errors=True)
+                return Packet(
+                    T_UPLOAD_GAME_FINISH,
+                    {"success": False, "message": f"Database error: {str(e)}"},
+                )
+
             self.logger.info(f"Game uploaded successfully with ID: {game_id}")
 
             # Cleanup
             if upload_id in self.active_uploads:
+                self.upload_streams.pop(self.active_uploads[upload_id].get("stream_id"), None)
                 del self.active_uploads[upload_id]
 
             if os.path.exists(temp_file_path):
@@ -358,12 +444,20 @@ class DeveloperServer:
             "temp_file_path": temp_file_path,
             "received_bytes": 0,
             "is_update": True,
+            "stream_id": self._open_stream(upload_id),
         }
 
         with open(temp_file_path, "wb") as f:
             pass
 
-        return Packet(T_UPDATE_GAME_INIT, {"success": True, "upload_id": upload_id})
+        return Packet(
+            T_UPDATE_GAME_INIT,
+            {
+                "success": True,
+                "upload_id": upload_id,
+                "stream_id": self.active_uploads[upload_id]["stream_id"],
+            },
+        )
 
     def _handle_update_game_chunk(self, client, addr, packet):
         return self._handle_upload_game_chunk(client, addr, packet)  # Reuse logic
@@ -421,6 +515,7 @@ class DeveloperServer:
             )
 
             os.remove(temp_file_path)
+            self.upload_streams.pop(context.get("stream_id"), None)
             del self.active_uploads[upload_id]
 
             return Packet(
@@ -468,18 +563,7 @@ class DeveloperServer:
                 },
             )
 
-    def _handle_developer_disconnect(self, username: str):
+    def _handle_developer_disconnect(self, username: str, client: socket.socket):
         """處理開發者斷線：登出"""
         self.logger.info(f"Handling disconnect for developer: {username}")
-        
-        # 從 user_context 移除
-        self.user_context = [u for u in self.user_context if u.username != username]
-        
-        # 從數據庫登出
-        try:
-            from common.Packet.developer import DeveloperLogoutPacket
-            logout_packet = DeveloperLogoutPacket(username)
-            self.database_server.handle_developer_logout(logout_packet)
-            self.logger.info(f"Developer {username} logged out from database")
-        except Exception as e:
-            self.logger.error(f"Failed to logout developer {username}: {e}")
+        self.presence.release(username, client)
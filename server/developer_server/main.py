@@ -1,8 +1,15 @@
+import os
+
 from .developer_server import DeveloperServer
 
 
 def main():
-    developer_server = DeveloperServer("0.0.0.0", 8081)
+    developer_server = DeveloperServer(
+        "0.0.0.0",
+        8081,
+        os.environ.get("DB_HOST", "140.113.17.13"),
+        int(os.environ.get("DB_PORT", "12345")),
+    )
     developer_server.start()
 
 
@@ -1,8 +1,13 @@
 from common.context.userContext import UserContext
 from common.context.roomContext import RoomContext
+from common.context.presenceRegistry import PresenceRegistry
+from common.context.catalogReplica import CatalogReplica
 from common.log_utils import setup_logger
-from common.packet import Packet
+from common.codec import choose_codec
+from common.compression import CompressionStats, Compressor, negotiate_level
+from common.packet import Packet, Connection, DataFrame, DATA_CHUNK_SIZE
 from common.type import (
+    T_HELLO,
     T_LOGIN,
     T_REGISTER,
     T_LOGOUT,
@@ -10,6 +15,10 @@ from common.type import (
     T_LIST_GAMES,
     T_GET_GAME_DETAIL,
     T_GAME_REVIEW,
+    T_LIST_GAME_REVIEWS,
+    T_SEARCH_GAMES,
+    T_LEADERBOARD,
+    T_CATALOG_CHANGES,
     T_CREATE_ROOM,
     T_JOIN_ROOM,
     T_LEAVE_ROOM,
@@ -21,35 +30,53 @@ from common.type import (
     T_DOWNLOAD_GAME_CHUNK,
     T_DOWNLOAD_GAME_FINISH,
 )
+from common.Packet.connection import HelloPacketReply
 from common.Packet.game import ListRoomsPacketReply, CreateRoomPacketReply
+from common.Packet.db import DBLoginPacket, DBLogoutPacket, DBListOnlineUsersPacket
 from common.Packet.game_extra import (
     DownloadGameInitPacket,
-    DownloadGameChunkPacket,
     DownloadGameFinishPacket,
     StartGamePacket,
     JoinRoomPacket,
     LeaveRoomPacket,
 )
-from ..database_server.database_server import DatabaseServer
+from ..database_server.client import DatabaseClient, DatabaseError
 import socket
 import threading
 import os
 import subprocess
 import json
-import base64
 import hashlib
-import math
+import itertools
+import time
+
+# 閒置超過 SESSION_TTL 秒的連線視為失效；每 SWEEP_INTERVAL 秒檢查一次
+SESSION_TTL = 2 * 60 * 60
+SWEEP_INTERVAL = 60
+
+# 已經取得所有 catalog 事件後，每 CATALOG_POLL_INTERVAL 秒再詢問一次
+CATALOG_POLL_INTERVAL = 1.0
 
 
 class LobbyServer:
-    def __init__(self, host: str, port: int):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        db_host: str = "140.113.17.13",
+        db_port: int = 12345,
+    ):
         self.host = host
         self.port = port
         self.logger = setup_logger("lobby_server", "logs/lobby_server.log")
-        self.user_context = []  # List of UserContext
+        self.presence = PresenceRegistry(SESSION_TTL)  # 線上用戶，只存在記憶體
         self.room_context = []  # List of RoomContext
-        self.database_server = DatabaseServer()
+        self.database_server = DatabaseClient(db_host, db_port)
+        # 遊戲資料的本機 replica，由 change feed 更新，列出房間時不必逐一查詢 database
+        self.catalog = CatalogReplica()
         self.game_servers = {}  # {room_id: subprocess.Popen}
+        self._stream_ids = itertools.count(1)  # 下載時 DataFrame 的 stream id
+        self.compression_stats = CompressionStats()  # 所有連線共用的壓縮統計
 
     def start(self):
         server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -57,6 +84,8 @@ class LobbyServer:
         server.bind((self.host, self.port))
         server.listen()
         self.logger.info(f"Lobby server started on {self.host}:{self.port}")
+        threading.Thread(target=self._sweep_sessions, daemon=True).start()
+        threading.Thread(target=self._follow_catalog, daemon=True).start()
         try:
             while True:
                 client, addr = server.accept()
@@ -64,85 +93,122 @@ class LobbyServer:
         finally:
             # 服務器關閉時登出所有用戶
             self.logger.info("Server shutting down, logging out all users...")
-            for user in self.user_context[:]:
-                try:
-                    from common.Packet.user import LogoutPacket
-                    logout_packet = LogoutPacket(user.username)
-                    self.database_server.handle_logout(logout_packet)
-                    self.logger.info(f"Logged out user: {user.username}")
-                except Exception as e:
-                    self.logger.error(f"Failed to logout user {user.username}: {e}")
-            self.user_context.clear()
+            for user in self.presence.clear():
+                self.logger.info(f"Logged out user: {user.username}")
             self.room_context.clear()
+            self.database_server.close()
             server.close()
+            for type, metrics in self.compression_stats.metrics().items():
+                self.logger.info(
+                    f"Compression {type}: {metrics['frames']} frames, "
+                    f"{metrics['raw_bytes']} -> {metrics['compressed_bytes']} bytes "
+                    f"(ratio {metrics['ratio']:.2f}), {metrics['us_per_frame']:.0f} us CPU per frame"
+                )
             self.logger.info("Server shutdown complete")
 
-    def _handle_client(self, client: socket.socket, addr: tuple[str, int]):
+    def _handle_client(self, sock: socket.socket, addr: tuple[str, int]):
         self.logger.info(f"Client connected: {addr}")
         current_username = None
+        client = Connection(sock)
         try:
             while True:
-                packet = Packet.receive(client)
+                packet = client.receive()
                 if packet is None:
                     self.logger.info(f"Client disconnected: {addr}")
                     break
-                
-                # 記錄當前用戶名（用於斷線時登出）
-                if packet.type == T_LOGIN and packet.data.get("username"):
-                    current_username = packet.data["username"]
-                
-                self._handle_packet(client, addr, packet)
+
+                if current_username:
+                    self.presence.touch(current_username)
+
+                # 這個請求的回覆都帶上它的 request id；client 可以連續送出多個請求，
+                # 依序處理並回覆
+                client.request_id = packet.request_id
+                try:
+                    self._handle_packet(client, addr, packet)
+                except DatabaseError as e:
+                    self.logger.error(f"Database request for {packet.type} failed: {e}")
+                    reply = Packet(
+                        packet.type,
+                        {"success": False, "message": "Database server unavailable"},
+                    )
+                    client.send(reply)
+
+                # 記錄當前用戶名（用於斷線時登出），只記錄由這個連線登入成功的帳號
+                if packet.type == T_LOGIN:
+                    session = self.presence.get(packet.data.get("username"))
+                    if session is not None and session.socket is client:
+                        current_username = session.username
         finally:
             # 用戶斷線時自動登出
             if current_username:
-                self._handle_user_disconnect(current_username)
+                self._handle_user_disconnect(current_username, client)
             client.close()
             self.logger.info(f"Client disconnected: {addr}")
 
     def _handle_packet(
-        self, client: socket.socket, addr: tuple[str, int], packet: Packet
+        self, client: Connection, addr: tuple[str, int], packet: Packet
     ):
-        if packet.type == T_LOGIN:
-            reply = self.database_server.handle_login(packet)
-            if reply.data["success"]:
-                self.user_context.append(UserContext(packet.data["username"], client))
-            client.sendall(reply.to_bytes())
+        if packet.type == T_HELLO:
+            # 回覆仍以 JSON 送出且不壓縮，之後的封包才使用協商出的 codec 與壓縮
+            codec = choose_codec(packet.data.get("codecs", []))
+            level = negotiate_level(packet.data.get("compression_level"))
+            client.send(HelloPacketReply(codec.name, level))
+            client.codec = codec
+            if level:
+                client.compressor = Compressor(level, stats=self.compression_stats)
+                client.reader.accept_compressed = True
+        elif packet.type == T_LOGIN:
+            username = packet.data["username"]
+            reply = self.presence.login(
+                UserContext(username, client),
+                lambda: self.database_server.handle_login(packet),
+            )
+            if reply is None:
+                self.logger.info(f"User {username} already logged in")
+                reply = DBLoginPacket(
+                    False, "Account already logged in from another session"
+                )
+            client.send(reply)
         elif packet.type == T_REGISTER:
             reply = self.database_server.handle_register(packet)
-            client.sendall(reply.to_bytes())
+            client.send(reply)
         elif packet.type == T_LOGOUT:
-            reply = self.database_server.handle_logout(packet)
-            if reply.data["success"]:
-                self.user_context.remove(
-                    next(
-                        (
-                            user
-                            for user in self.user_context
-                            if user.username == packet.data["username"]
-                        ),
-                        None,
-                    )
-                )
-            client.sendall(reply.to_bytes())
+            if self.presence.release(packet.data["username"], client):
+                reply = DBLogoutPacket(True, "Logout successful")
+            else:
+                reply = DBLogoutPacket(False, "User is not logged in")
+            client.send(reply)
         elif packet.type == T_LIST_ONLINE_USERS:
-            reply = self.database_server.handle_list_online_users(packet)
-            client.sendall(reply.to_bytes())
+            reply = DBListOnlineUsersPacket(True, self.presence.online_users())
+            client.send(reply)
         elif packet.type == T_LIST_GAMES:
             reply = self.database_server.handle_list_games(packet)
-            client.sendall(reply.to_bytes())
+            client.send(reply)
         elif packet.type == T_GET_GAME_DETAIL:
             reply = self.database_server.handle_get_game_detail(packet)
             self.logger.info(f"Game detail: {reply.data['game_info']}")
-            client.sendall(reply.to_bytes())
+            client.send(reply)
         elif packet.type == T_GAME_REVIEW:
             reply = self.database_server.handle_game_review(packet)
-            client.sendall(reply.to_bytes())
+            client.send(reply)
+        elif packet.type == T_LIST_GAME_REVIEWS:
+            reply = self.database_server.handle_list_game_reviews(packet)
+            client.send(reply)
+        elif packet.type == T_SEARCH_GAMES:
+            reply = self.database_server.handle_search_games(packet)
+            client.send(reply)
+        elif packet.type == T_LEADERBOARD:
+            reply = self.database_server.handle_leaderboard(packet)
+            client.send(reply)
+        elif packet.type == T_CATALOG_CHANGES:
+            reply = self.database_server.handle_catalog_changes(packet)
+            client.send(reply)
         elif packet.type == T_LIST_ROOMS:
             reply = self._handle_list_rooms(client, addr, packet)
-            client.sendall(reply.to_bytes())
+            client.send(reply)
         elif packet.type == T_CREATE_ROOM:
             reply = self._handle_create_room(client, addr, packet)
-            client.sendall(reply.to_bytes())
+            client.send(reply)
         elif packet.type == T_DOWNLOAD_GAME_INIT:
             self._handle_download_game(client, addr, packet)
         elif packet.type == T_START_GAME:
@@ -153,9 +219,13 @@ class LobbyServer:
             self._handle_leave_room(client, addr, packet)
         else:
             self.logger.info(f"Invalid packet type: {packet.type}")
+            # 一律回覆，client 才不會一直等待這個 request id
+            client.send(
+                Packet(packet.type, {"success": False, "message": "Invalid packet type"})
+            )
 
     def _handle_create_room(
-        self, client: socket.socket, addr: tuple[str, int], packet: Packet
+        self, client: Connection, addr: tuple[str, int], packet: Packet
     ):
         self.logger.info(f"Client {addr} created a room")
         username = packet.data["username"]
@@ -163,25 +233,25 @@ class LobbyServer:
         room_id = (
             str(int(self.room_context[-1].room_id) + 1) if self.room_context else "1"
         )
-        max_players = self.database_server.get_game_max_players(game_id)
+        game = self._catalog_game(game_id)
+        max_players = game["max_players"] if game is not None else 0
         new_room_context = RoomContext(room_id, game_id, max_players, username)
         self.room_context.append(new_room_context)
         reply = CreateRoomPacketReply(True, room_id)
         return reply
 
     def _handle_list_rooms(
-        self, client: socket.socket, addr: tuple[str, int], packet: Packet
+        self, client: Connection, addr: tuple[str, int], packet: Packet
     ):
         self.logger.info(f"Client {addr} listed rooms")
         rooms = []
         for room_context in self.room_context:
+            game = self._catalog_game(room_context.game_id)
             rooms.append(
                 {
                     "room_id": room_context.room_id,
                     "game_id": room_context.game_id,
-                    "game_name": self.database_server.get_game_name(
-                        room_context.game_id
-                    ),
+                    "game_name": game["game_name"] if game is not None else "",
                     "max_players": room_context.max_players,
                     "room_owner": room_context.room_owner,
                     "players": room_context.players,
@@ -208,21 +278,13 @@ class LobbyServer:
         # Accessing DB directly is easier since we have the instance.
 
         # Helper to get game info
-        game_info = None
-        with open(self.database_server.database["game"], "r") as f:
-            import json
-
-            games = json.load(f)
-            for game in games:
-                if game["game_id"] == game_id:
-                    game_info = game
-                    break
+        game_info = self.database_server.get_game(game_id)
 
         if not game_info:
             reply = Packet(
                 T_DOWNLOAD_GAME_INIT, {"success": False, "message": "Game not found"}
             )
-            client.sendall(reply.to_bytes())
+            client.send(reply)
             return
 
         game_version = game_info["game_version"]
@@ -237,7 +299,7 @@ class LobbyServer:
                 T_DOWNLOAD_GAME_INIT,
                 {"success": False, "message": "Game files not found on server"},
             )
-            client.sendall(reply.to_bytes())
+            client.send(reply)
             return
 
         # Zip the folder to send it
@@ -254,6 +316,7 @@ class LobbyServer:
                 pass
 
             file_size = os.path.getsize(temp_zip_path)
+            stream_id = next(self._stream_ids)
 
             # Send Init
             reply = Packet(
@@ -263,33 +326,27 @@ class LobbyServer:
                     "file_size": file_size,
                     "game_version": game_version,
                     "upload_id": "download_session",  # Dummy
+                    "stream_id": stream_id,
                 },
             )
-            client.sendall(reply.to_bytes())
-
-            # Send Chunks
-            chunk_size = 4096
-            total_chunks = math.ceil(file_size / chunk_size)
+            client.send(reply)
 
+            # Send Chunks：檔案內容直接放進 DataFrame，不經過 base64 與 JSON，
+            # checksum 也在傳送時一併計算，不必再讀一次檔案
+            file_hash = hashlib.md5()
+            offset = 0
             with open(temp_zip_path, "rb") as f:
-                for i in range(total_chunks):
-                    chunk = f.read(chunk_size)
-                    encoded_chunk = base64.b64encode(chunk).decode("utf-8")
-                    chunk_packet = DownloadGameChunkPacket(
-                        "download_session", encoded_chunk
-                    )
-                    client.sendall(chunk_packet.to_bytes())
-
-            # Calculate Checksum
-            with open(temp_zip_path, "rb") as f:
-                file_hash = hashlib.md5(f.read()).hexdigest()
+                while chunk := f.read(DATA_CHUNK_SIZE):
+                    file_hash.update(chunk)
+                    client.send(DataFrame(stream_id, offset, chunk))
+                    offset += len(chunk)
 
             # Send Finish
-            finish_packet = DownloadGameFinishPacket("download_session", file_hash)
-            client.sendall(finish_packet.to_bytes())
+            finish_packet = DownloadGameFinishPacket("download_session", file_hash.hexdigest())
+            client.send(finish_packet)
             
             # 增加下載計數
-            self.database_server.increment_download_count(game_id)
+            self.database_server.increment_download_count(game_id, game_version)
             self.logger.info(f"Download count incremented for game {game_id}")
 
         except Exception as e:
@@ -311,7 +368,7 @@ class LobbyServer:
                 T_START_GAME,
                 {"success": False, "message": "Room not found"}
             )
-            client.sendall(error_packet.to_bytes())
+            client.send(error_packet)
             return
 
         if room.room_owner != username:
@@ -320,7 +377,7 @@ class LobbyServer:
                 T_START_GAME,
                 {"success": False, "message": "Only room owner can start the game"}
             )
-            client.sendall(error_packet.to_bytes())
+            client.send(error_packet)
             return
 
         # 檢查玩家人數是否足夠
@@ -332,7 +389,7 @@ class LobbyServer:
                     "message": f"Not enough players. Need {room.max_players} players, currently have {len(room.players)}"
                 }
             )
-            client.sendall(error_packet.to_bytes())
+            client.send(error_packet)
             self.logger.info(f"Game start denied: room {room_id} has {len(room.players)}/{room.max_players} players")
             return
 
@@ -346,12 +403,9 @@ class LobbyServer:
         # It doesn't have version.
         # Let's query DB for latest version.
         game_version = "1.0.0"  # Default
-        with open(self.database_server.database["game"], "r") as f:
-            games = json.load(f)
-            for game in games:
-                if game["game_id"] == game_id:
-                    game_version = game["game_version"]
-                    break
+        game_info = self.database_server.get_game(game_id)
+        if game_info is not None:
+            game_version = game_info["game_version"]
 
         storage_dir = os.path.join(
             os.path.dirname(__file__), f"../storage/{game_id}/{game_version}"
@@ -403,6 +457,12 @@ class LobbyServer:
         else:
             # Fallback or error
             self.logger.error("Game server script not found")
+            client.send(
+                Packet(
+                    T_START_GAME,
+                    {"success": False, "message": "Game server script not found"},
+                )
+            )
             return
 
         try:
@@ -432,22 +492,20 @@ class LobbyServer:
             # 記錄房間玩家資訊
             self.logger.info(f"Room {room_id} has {len(room.players)} players: {room.players}")
 
-            # 發送給房主（使用當前連接的 client socket）
+            # 發送給房主（回覆房主的 START_GAME 請求）
             try:
-                client.sendall(start_packet.to_bytes())
+                client.send(start_packet)
                 self.logger.info(f"Sent start packet to room owner {username}")
             except Exception as e:
                 self.logger.error(f"Failed to send start packet to {username}: {e}")
             
-            # 發送給其他玩家（從 user_context 查找）
+            # 推送給其他玩家（從 presence 查找），不帶 request id
             for player_name in room.players:
                 if player_name != username:  # 跳過房主，已經發送過了
-                    user_ctx = next(
-                        (u for u in self.user_context if u.username == player_name), None
-                    )
+                    user_ctx = self.presence.get(player_name)
                     if user_ctx:
                         try:
-                            user_ctx.socket.sendall(start_packet.to_bytes())
+                            user_ctx.socket.push(start_packet)
                             self.logger.info(f"Sent start packet to player {player_name}")
                         except Exception as e:
                             self.logger.error(
@@ -456,6 +514,13 @@ class LobbyServer:
 
         except Exception as e:
             self.logger.error(f"Failed to launch game server: {e}")
+            # 房主在等待這個請求的回覆
+            client.send(
+                Packet(
+                    T_START_GAME,
+                    {"success": False, "message": "Failed to launch game server"},
+                )
+            )
 
     def _monitor_game_server(self, room_id: str, game_proc):
         """監控遊戲伺服器進程，遊戲結束後刪除房間"""
@@ -484,19 +549,19 @@ class LobbyServer:
         room = next((r for r in self.room_context if r.room_id == room_id), None)
         if not room:
             reply = Packet(T_JOIN_ROOM, {"success": False, "message": "Room not found"})
-            client.sendall(reply.to_bytes())
+            client.send(reply)
             return
 
         if len(room.players) >= room.max_players:
             reply = Packet(T_JOIN_ROOM, {"success": False, "message": "Room full"})
-            client.sendall(reply.to_bytes())
+            client.send(reply)
             return
 
         if username in room.players:
             reply = Packet(
                 T_JOIN_ROOM, {"success": False, "message": "Already in room"}
             )
-            client.sendall(reply.to_bytes())
+            client.send(reply)
             return
 
         room.players.append(username)
@@ -504,7 +569,7 @@ class LobbyServer:
         reply = Packet(
             T_JOIN_ROOM, {"success": True, "message": "Joined room successfully"}
         )
-        client.sendall(reply.to_bytes())
+        client.send(reply)
 
     def _handle_leave_room(self, client, addr, packet):
         """處理玩家離開房間"""
@@ -514,12 +579,12 @@ class LobbyServer:
         room = next((r for r in self.room_context if r.room_id == room_id), None)
         if not room:
             reply = Packet(T_LEAVE_ROOM, {"success": False, "message": "Room not found"})
-            client.sendall(reply.to_bytes())
+            client.send(reply)
             return
 
         if username not in room.players:
             reply = Packet(T_LEAVE_ROOM, {"success": False, "message": "You are not in this room"})
-            client.sendall(reply.to_bytes())
+            client.send(reply)
             return
 
         # 移除玩家
@@ -536,15 +601,51 @@ class LobbyServer:
             self.logger.info(f"Room {room_id} owner changed to {room.room_owner}")
 
         reply = Packet(T_LEAVE_ROOM, {"success": True, "message": "Left room successfully"})
-        client.sendall(reply.to_bytes())
-
-    def _handle_user_disconnect(self, username: str):
+        client.send(reply)
+
+    def _sweep_sessions(self):
+        """定期移除失效的 session，並關閉閒置過久的連線"""
+        while True:
+            time.sleep(SWEEP_INTERVAL)
+            for user in self.presence.sweep():
+                self.logger.info(f"Swept stale session for user: {user.username}")
+                try:
+                    # 讓 _handle_client 的 recv 返回，由它完成斷線處理
+                    user.socket.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _follow_catalog(self):
+        """持續從 database server 的 change feed 更新 catalog replica"""
+        while True:
+            try:
+                more = self.catalog.apply(
+                    self.database_server.handle_catalog_changes(self.catalog.request())
+                )
+            except DatabaseError as e:
+                self.logger.warning(f"Failed to fetch catalog changes: {e}")
+                more = False
+            except Exception as e:
+                # 例如格式錯誤的回覆；thread 結束的話 replica 就不會再更新
+                self.logger.error(f"Failed to apply catalog changes: {e}")
+                more = False
+            if not more:
+                time.sleep(CATALOG_POLL_INTERVAL)
+
+    def _catalog_game(self, game_id: str):
+        """從 replica 取得遊戲資料，replica 還沒收到時改向 database server 查詢"""
+        game = self.catalog.get(game_id)
+        if game is None:
+            game = self.database_server.get_game(game_id)
+        return game
+
+    def _handle_user_disconnect(self, username: str, client: Connection):
         """處理用戶斷線：登出並從所有房間移除"""
         self.logger.info(f"Handling disconnect for user: {username}")
-        
-        # 1. 從 user_context 移除
-        self.user_context = [u for u in self.user_context if u.username != username]
-        
+
+        # 1. 從 presence 移除
+        self.presence.release(username, client)
+
         # 2. 從所有房間移除
         for room in self.room_context[:]:  # 使用副本遍歷，因為可能會刪除房間
             if username in room.players:
@@ -559,12 +660,3 @@ class LobbyServer:
                 elif room.room_owner == username and len(room.players) > 0:
                     room.room_owner = room.players[0]
                     self.logger.info(f"Room {room.room_id} owner changed to {room.room_owner}")
-        
-        # 3. 從數據庫登出
-        try:
-            from common.Packet.user import LogoutPacket
-            logout_packet = LogoutPacket(username)
-            self.database_server.handle_logout(logout_packet)
-            self.logger.info(f"User {username} logged out from database")
-        except Exception as e:
-            self.logger.error(f"Failed to logout user {username}: {e}")
@@ -1,8 +1,15 @@
+import os
+
 from .lobby_server import LobbyServer
 
 
 def main():
-    lobby_server = LobbyServer("0.0.0.0", 12346)
+    lobby_server = LobbyServer(
+        "0.0.0.0",
+        12346,
+        os.environ.get("DB_HOST", "140.113.17.13"),
+        int(os.environ.get("DB_PORT", "12345")),
+    )
     lobby_server.start()
 
 
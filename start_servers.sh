@@ -28,7 +28,7 @@ if [ ! -f "server/database_server/data/users.json" ]; then
 fi
 
 # Start servers in background with logging
-echo -e "${GREEN}Starting Database Server (port 8080)...${NC}"
+echo -e "${GREEN}Starting Database Server (port 12345)...${NC}"
 nohup python3 -m server.database_server.main > logs/database_server.log 2>&1 &
 DB_PID=$!
 sleep 2
@@ -73,7 +73,7 @@ echo -e "${GREEN}  All Servers Started Successfully!    ${NC}"
 echo -e "${GREEN}========================================${NC}"
 echo ""
 echo -e "${CYAN}Server Status:${NC}"
-echo -e "  Database Server: ${GREEN}Running${NC} (PID: $DB_PID, Port: 8080)"
+echo -e "  Database Server: ${GREEN}Running${NC} (PID: $DB_PID, Port: 12345)"
 echo -e "  Developer Server: ${GREEN}Running${NC} (PID: $DEV_PID, Port: 8081)"
 echo -e "  Lobby Server: ${GREEN}Running${NC} (PID: $LOBBY_PID, Port: 12346)"
 echo ""
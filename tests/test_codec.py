@@ -0,0 +1,103 @@
+import unittest
+
+from common.codec import (
+    BINARY_CODEC,
+    JSON_CODEC,
+    PREFERRED_CODECS,
+    BinaryCodec,
+    Schema,
+    choose_codec,
+)
+from common.packet import Packet
+from common.type import T_GAME_REVIEW, T_LIST_GAMES, T_LOGIN, T_START_GAME
+
+
+def round_trip(codec, type: str, data: dict, request_id: int = None) -> dict:
+    return codec.decode(codec.encode(type, data, request_id))
+
+
+class SchemaTest(unittest.TestCase):
+    schema = Schema(("ok", "?"), ("count", "i"), ("name", "s"), ("extra", "j"))
+
+    def test_round_trip(self):
+        data = {"ok": True, "count": -(2**63), "name": "遊戲", "extra": {"a": [1, None]}}
+        self.assertEqual(self.schema.unpack(self.schema.pack(data), 0), data)
+
+    def test_none_values(self):
+        data = {"ok": None, "count": None, "name": None, "extra": None}
+        self.assertEqual(self.schema.unpack(self.schema.pack(data), 0), data)
+
+    def test_mismatched_data_is_not_packed(self):
+        for data in (
+            {"ok": True, "count": 1, "name": "a"},  # 少一個 key
+            {"ok": True, "count": 1, "name": "a", "extra": 0, "more": 1},
+            {"ok": 1, "count": 1, "name": "a", "extra": 0},
+            {"ok": True, "count": True, "name": "a", "extra": 0},
+            {"ok": True, "count": 2**63, "name": "a", "extra": 0},
+            {"ok": True, "count": 1.5, "name": "a", "extra": 0},
+            {"ok": True, "count": 1, "name": b"a", "extra": 0},
+        ):
+            with self.subTest(data=data):
+                self.assertIsNone(self.schema.pack(data))
+
+
+class BinaryCodecTest(unittest.TestCase):
+    def test_schema_packets_round_trip(self):
+        for type, data in (
+            (T_LOGIN, {"username": "alice", "password": "pw"}),
+            (T_LOGIN, {"success": False, "message": "Invalid"}),
+            (T_GAME_REVIEW, {"game_id": "1", "score": 5, "comment": "", "username": "a"}),
+            (T_START_GAME, {"room_id": "1", "game_id": "2", "server_ip": None, "server_port": 9000}),
+        ):
+            with self.subTest(type=type, data=data):
+                self.assertEqual(round_trip(BINARY_CODEC, type, data), {**data, "type": type})
+                # schema 不需要 JSON 的 key，應該比 JSON 小
+                self.assertLess(
+                    len(BINARY_CODEC.encode(type, data)), len(JSON_CODEC.encode(type, data))
+                )
+
+    def test_other_shapes_fall_back_to_json(self):
+        for type, data in (
+            (T_GAME_REVIEW, {"game_id": "1", "score": 4.5, "comment": "", "username": "a"}),
+            (T_LIST_GAMES, {"success": True, "games": [{"game_id": "1"}]}),
+            ("NOT_A_TYPE", {"value": 1}),
+        ):
+            with self.subTest(type=type):
+                self.assertEqual(round_trip(BINARY_CODEC, type, data), {**data, "type": type})
+
+    def test_request_id(self):
+        data = {"username": "alice", "password": "pw"}
+        for request_id in (None, 0, 1, 2**32 - 1):
+            with self.subTest(request_id=request_id):
+                decoded = round_trip(BINARY_CODEC, T_LOGIN, data, request_id)
+                self.assertEqual(decoded.get("request_id"), request_id)
+
+    def test_forwarded_packet_keeps_its_type(self):
+        # 從另一個連線收到後原樣轉送的封包，data 中仍有 type
+        packet = Packet.decode(BINARY_CODEC.encode(T_LIST_GAMES, {"games": []}))
+        decoded = Packet.decode(packet.to_bytes(BINARY_CODEC)[4:])
+        self.assertEqual((decoded.type, decoded.data["games"]), (T_LIST_GAMES, []))
+
+    def test_decode_without_knowing_the_codec(self):
+        data = {"username": "alice", "password": "pw"}
+        for codec in (JSON_CODEC, BINARY_CODEC):
+            with self.subTest(codec=codec.name):
+                packet = Packet.decode(codec.encode(T_LOGIN, data, 7))
+                self.assertEqual((packet.type, packet.request_id), (T_LOGIN, 7))
+                self.assertEqual(packet.data["username"], "alice")
+
+
+class ChooseCodecTest(unittest.TestCase):
+    def test_first_common_codec(self):
+        self.assertIs(choose_codec(PREFERRED_CODECS), BINARY_CODEC)
+        self.assertIs(choose_codec(["unknown", JSON_CODEC.name]), JSON_CODEC)
+        self.assertIs(choose_codec([]), JSON_CODEC)
+
+    def test_name_changes_with_the_schemas(self):
+        other = BinaryCodec(BINARY_CODEC.types, {T_LOGIN: (Schema(("username", "s")),)})
+        self.assertNotEqual(other.name, BINARY_CODEC.name)
+        self.assertIs(choose_codec([other.name]), JSON_CODEC)
+
+
+if __name__ == "__main__":
+    unittest.main()
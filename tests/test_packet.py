@@ -0,0 +1,173 @@
+import random
+import socket
+import struct
+import threading
+import unittest
+import zlib
+
+from common.codec import BINARY_CODEC, JSON_CODEC
+from common.compression import Compressor
+from common.packet import (
+    COMPRESSED_FLAG,
+    DATA_FLAG,
+    DataFrame,
+    FrameError,
+    Packet,
+    PacketReader,
+    decompress,
+)
+from common.type import T_LIST_GAMES, T_LOGIN
+
+
+def frames(seed: int):
+    """混合各種大小的封包與 DataFrame，回傳 [(要送出的 frame, 預期讀到的結果)]"""
+    rng = random.Random(seed)
+    compressor = Compressor(6)
+    result = []
+    for i in range(200):
+        kind = rng.choice(("json", "binary", "data", "compressed"))
+        size = rng.choice((0, 1, 100, 5000, 70000, 300000))
+        if kind == "data":
+            payload = rng.randbytes(size)
+            result.append((DataFrame(i, i * 10, payload).to_bytes(), ("data", i, i * 10, payload)))
+            continue
+        data = {"games": "x" * size, "seq": i}
+        codec = BINARY_CODEC if kind == "binary" else JSON_CODEC
+        frame = Packet(T_LIST_GAMES, data).to_bytes(
+            codec, request_id=i, compressor=compressor if kind == "compressed" else None
+        )
+        result.append((frame, ("packet", i, data)))
+    return result
+
+
+def send_in_pieces(sock: socket.socket, stream: bytes, seed: int):
+    """以隨機大小 (包含 1 byte) 分段送出，讓 header 與 body 都可能被切開"""
+    rng = random.Random(seed)
+    position = 0
+    while position < len(stream):
+        size = rng.choice((1, 2, 3, 7, 100, 4096, 65536, 200000))
+        sock.sendall(stream[position : position + size])
+        position += size
+    sock.shutdown(socket.SHUT_WR)
+
+
+class PacketReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.a, self.b = self.socketpair()
+
+    def socketpair(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        return a, b
+
+    def start_sender(self, a: socket.socket, b: socket.socket, stream: bytes, seed: int):
+        sender = threading.Thread(target=send_in_pieces, args=(a, stream, seed))
+        sender.start()
+        self.addCleanup(sender.join)
+        # 測試失敗時先關閉讀取端，sender 才不會一直卡在 sendall
+        self.addCleanup(b.shutdown, socket.SHUT_RDWR)
+
+    def check(self, expected, item):
+        if expected[0] == "data":
+            _, stream_id, offset, payload = expected
+            self.assertIsInstance(item, DataFrame)
+            self.assertEqual((item.stream_id, item.offset, bytes(item.payload)), (stream_id, offset, payload))
+        else:
+            _, request_id, data = expected
+            self.assertEqual(item.type, T_LIST_GAMES)
+            self.assertEqual(item.request_id, request_id)
+            self.assertEqual({key: item.data[key] for key in data}, data)
+
+    def test_random_splits_read(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                a, b = self.socketpair()
+                expected = frames(seed)
+                self.start_sender(a, b, b"".join(frame for frame, _ in expected), seed)
+                reader = PacketReader(b, buffer_size=64)
+                reader.accept_compressed = True
+                for _, item in expected:
+                    self.check(item, reader.read())
+                self.assertIsNone(reader.read())
+                # 讀完大封包之後 buffer 縮回原本的大小
+                self.assertEqual(len(reader._buffer), 64)
+
+    def test_random_splits_read_frames(self):
+        expected = frames(7)
+        self.start_sender(self.a, self.b, b"".join(frame for frame, _ in expected), 7)
+        reader = PacketReader(self.b, buffer_size=64)
+        reader.accept_compressed = True
+        received = []
+        while True:
+            batch = reader.read_frames()
+            if batch is None:
+                break
+            for item in batch:
+                received.append(item if isinstance(item, DataFrame) else Packet.decode(item))
+        self.assertEqual(len(received), len(expected))
+        for (_, item), frame in zip(expected, received):
+            self.check(item, frame)
+
+    def test_read_frames_copies_data_frame_payload(self):
+        self.a.sendall(DataFrame(1, 0, b"abc").to_bytes() + DataFrame(2, 3, b"def").to_bytes())
+        reader = PacketReader(self.b)
+        first, second = reader.read_frames()
+        self.assertIsInstance(first.payload, bytes)
+        self.assertEqual((first.payload, second.payload), (b"abc", b"def"))
+
+    def test_header_alone_does_not_allocate_the_claimed_size(self):
+        self.a.sendall(struct.pack("!I", 8 * 1024 * 1024) + b"x" * 10)
+        reader = PacketReader(self.b, buffer_size=64)
+        self.assertEqual(reader.read_frames(), [])
+        self.assertEqual(len(reader._buffer), 64)
+        self.assertFalse(reader.has_packet())
+
+    def test_oversized_frame_is_rejected(self):
+        self.a.sendall(struct.pack("!I", 1025))
+        reader = PacketReader(self.b, max_frame_size=1024)
+        with self.assertRaises(FrameError):
+            reader.read()
+
+    def test_short_data_frame_is_rejected(self):
+        self.a.sendall(struct.pack("!I", DATA_FLAG | 3) + b"abc")
+        with self.assertRaises(FrameError):
+            PacketReader(self.b).read()
+
+    def test_compressed_frame_needs_negotiation(self):
+        body = zlib.compress(JSON_CODEC.encode(T_LOGIN, {}))
+        frame = struct.pack("!I", COMPRESSED_FLAG | len(body)) + body
+        self.a.sendall(frame)
+        with self.assertRaises(FrameError):
+            PacketReader(self.b).read()
+        self.a.sendall(frame)
+        with self.assertRaises(FrameError):
+            Packet.read(self.b)
+
+    def test_has_packet(self):
+        frame = Packet(T_LOGIN, {"username": "a"}).to_bytes()
+        self.a.sendall(frame * 2 + frame[:3])
+        reader = PacketReader(self.b)
+        self.assertEqual(reader.read().data["username"], "a")
+        self.assertTrue(reader.has_packet())
+        reader.read()
+        self.assertFalse(reader.has_packet())
+
+
+class DecompressTest(unittest.TestCase):
+    def test_limit_is_inclusive(self):
+        body = zlib.compress(b"a" * 1000)
+        self.assertEqual(decompress(body, 1000), b"a" * 1000)
+        with self.assertRaises(FrameError):
+            decompress(body, 999)
+
+    def test_malformed_bodies(self):
+        body = zlib.compress(b"a" * 1000)
+        for bad in (b"not zlib", body[:-4], body + b"tail"):
+            with self.subTest(bad=bad[:10]):
+                with self.assertRaises(FrameError):
+                    decompress(bad, 4096)
+
+
+if __name__ == "__main__":
+    unittest.main()
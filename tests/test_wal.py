@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from server.database_server import wal
+from server.database_server.wal import WriteAheadLog
+
+
+def put(key: str) -> dict:
+    return {"op": "put", "table": "user", "key": key, "value": {"username": key}}
+
+
+class WriteAheadLogRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._dir.name, "wal.log")
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def reopen(self, log: WriteAheadLog):
+        """模擬重啟：關閉後重新開啟並 replay，回傳讀到的 key"""
+        log.close()
+        log = WriteAheadLog(self.path)
+        return log, [record["key"] for record in log.replay()]
+
+    def test_torn_tail_is_cut_before_new_appends(self):
+        log = WriteAheadLog(self.path)
+        log.append([put("a"), put("b")])
+        log.close()
+        # crash 在寫入 b 的途中
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 5)
+
+        log, keys = self.reopen(log)
+        self.assertEqual(keys, ["a"])
+        log.append([put("c")])
+        log.append([put("d")])
+
+        log, keys = self.reopen(log)
+        self.assertEqual(keys, ["a", "c", "d"])
+        log.close()
+
+    def test_record_without_newline_is_torn(self):
+        log = WriteAheadLog(self.path)
+        log.append([put("a")])
+        log.close()
+        # crash 在寫入換行之前，最後一行是完整的 JSON
+        with open(self.path, "ab") as f:
+            f.write(b'{"op":"put","table":"user","key":"b","value":{}}')
+
+        log, keys = self.reopen(log)
+        self.assertEqual(keys, ["a"])
+        log.append([put("c")])
+
+        log, keys = self.reopen(log)
+        self.assertEqual(keys, ["a", "c"])
+        log.close()
+
+    def test_torn_rotated_segment_is_cut_before_rotate_appends(self):
+        log = WriteAheadLog(self.path)
+        log.append([put("a"), put("b")])
+        log.rotate()
+        log.close()
+        # crash 時 .old 的最後一行不完整，compaction 也沒有完成
+        with open(log.rotated_path, "r+b") as f:
+            f.truncate(os.path.getsize(log.rotated_path) - 5)
+
+        log, keys = self.reopen(log)
+        self.assertEqual(keys, ["a"])
+        log.append([put("c")])
+        log.rotate()
+
+        log, keys = self.reopen(log)
+        self.assertEqual(keys, ["a", "c"])
+        log.close()
+
+    def test_rotate_syncs_old_segment_before_removing_live_one(self):
+        log = WriteAheadLog(self.path)
+        log.append([put("a")])
+        log.rotate()
+        log.append([put("b")])
+
+        events = []
+        real_fsync, real_remove = os.fsync, os.remove
+
+        def fsync(fd):
+            events.append(("fsync", os.readlink(f"/proc/self/fd/{fd}")))
+            real_fsync(fd)
+
+        def remove(path):
+            events.append(("remove", os.path.realpath(path)))
+            real_remove(path)
+
+        with mock.patch.object(wal.os, "fsync", fsync), mock.patch.object(wal.os, "remove", remove):
+            log.rotate()
+
+        rotated = os.path.realpath(log.rotated_path)
+        self.assertIn(("fsync", rotated), events)
+        self.assertLess(
+            events.index(("fsync", rotated)),
+            events.index(("remove", os.path.realpath(self.path))),
+        )
+
+        log, keys = self.reopen(log)
+        self.assertEqual(keys, ["a", "b"])
+        log.close()
+
+
+if __name__ == "__main__":
+    unittest.main()